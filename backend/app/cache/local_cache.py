@@ -0,0 +1,89 @@
+from __future__ import annotations
+import asyncio, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+class ByteLRU:
+    """
+    In-process LRU bounded by total bytes, with per-entry TTL.
+    Size-aware admission: entries larger than `max_item` are never admitted, so
+    one big object can't flush the hot set. Event-loop only (no locking).
+    """
+    def __init__(self, budget: int, max_item: int):
+        self.budget = budget
+        self.max_item = max_item
+        self._data: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.rejected = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, size, expires = item
+        if expires <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: float) -> bool:
+        if self.budget <= 0 or size > self.max_item or ttl <= 0:
+            self.rejected += 1
+            return False
+        if key in self._data:
+            self._drop(key)
+        while self._data and self._bytes + size > self.budget:
+            old, _ = next(iter(self._data.items()))
+            self._drop(old)
+            self.evictions += 1
+        self._data[key] = (value, size, time.monotonic() + ttl)
+        self._bytes += size
+        return True
+
+    def delete(self, key: str) -> None:
+        if key in self._data:
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "rejected": self.rejected, "items": len(self._data), "bytes": self._bytes,
+        }
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls per key: N waiters, one upstream call. The call runs
+    in a task owned by the flight, so cancelling any caller (the first included)
+    leaves the others waiting on it.
+    """
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.leaders = self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._flights)}
@@ -1,10 +1,12 @@
 from __future__ import annotations
-import os, json
+import os, json, logging
 from typing import Optional
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
 _client: Optional[Redis] = None
 _PREFIX = os.getenv("CACHE_PREFIX", "yolo")
+log = logging.getLogger(__name__)
 
 def _key(suffix: str) -> str:
     return f"{_PREFIX}:{suffix}"
@@ -19,10 +21,16 @@ def get_redis() -> Optional[Redis]:
         _client = Redis.from_url(url, decode_responses=False)
     return _client
 
+# The cache is an optimization: a Redis outage degrades to misses, never to 500s.
+
 async def get_json(suffix: str) -> Optional[dict]:
     r = get_redis()
     if not r: return None
-    raw = await r.get(_key(suffix))
+    try:
+        raw = await r.get(_key(suffix))
+    except RedisError as e:
+        log.warning("cache.get.failed", extra={"ctx_reason": type(e).__name__})
+        return None
     if not raw: return None
     try:
         return json.loads(raw)
@@ -32,14 +40,24 @@ async def get_json(suffix: str) -> Optional[dict]:
 async def set_json(suffix: str, value: dict, ttl: int) -> None:
     r = get_redis()
     if not r: return
-    await r.set(_key(suffix), json.dumps(value).encode("utf-8"), ex=max(1, ttl))
+    try:
+        await r.set(_key(suffix), json.dumps(value).encode("utf-8"), ex=max(1, ttl))
+    except RedisError as e:
+        log.warning("cache.set.failed", extra={"ctx_reason": type(e).__name__})
 
 async def get_bytes(suffix: str) -> Optional[bytes]:
     r = get_redis()
     if not r: return None
-    return await r.get(_key(suffix))
+    try:
+        return await r.get(_key(suffix))
+    except RedisError as e:
+        log.warning("cache.get.failed", extra={"ctx_reason": type(e).__name__})
+        return None
 
 async def set_bytes(suffix: str, value: bytes, ttl: int) -> None:
     r = get_redis()
     if not r: return
-    await r.set(_key(suffix), value, ex=max(1, ttl))
+    try:
+        await r.set(_key(suffix), value, ex=max(1, ttl))
+    except RedisError as e:
+        log.warning("cache.set.failed", extra={"ctx_reason": type(e).__name__})
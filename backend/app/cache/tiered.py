@@ -0,0 +1,96 @@
+"""
+Two-tier cache: in-process ByteLRU in front of Redis, with single-flight loads.
+
+    data = await tiered.get_bytes("img:...", loader, ttl=600)
+
+Lookup order is local → Redis → loader(); concurrent misses for the same key
+share one Redis lookup and one loader call. A loader returning None is not cached.
+"""
+from __future__ import annotations
+import json, os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from . import redis_cache
+from .. import metrics
+from .local_cache import ByteLRU, SingleFlight
+
+LOCAL_BYTES    = int(os.getenv("CACHE_LOCAL_BYTES", str(64 * 1024 * 1024)))      # 64 MiB per process
+LOCAL_MAX_ITEM = int(os.getenv("CACHE_LOCAL_MAX_ITEM", str(2 * 1024 * 1024)))     # admission limit
+LOCAL_MAX_TTL  = int(os.getenv("CACHE_LOCAL_MAX_TTL", "300"))                     # cap local staleness
+
+local = ByteLRU(LOCAL_BYTES, LOCAL_MAX_ITEM)
+flights = SingleFlight()
+_redis_stats = {"hits": 0, "misses": 0}
+
+def _local_ttl(ttl: int) -> int:
+    return min(ttl, LOCAL_MAX_TTL)
+
+def _local_get(key: str) -> Any:
+    hit = local.get(key)
+    metrics.cache_lookup(key, "local", hit is not None)
+    return hit
+
+async def single_flight(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    return await flights.do(key, fn)
+
+async def get_bytes(key: str, loader: Callable[[], Awaitable[Optional[bytes]]], *, ttl: int) -> Optional[bytes]:
+    hit = _local_get(key)
+    if hit is not None:
+        return hit
+
+    async def load() -> Optional[bytes]:
+        data = await redis_cache.get_bytes(key)
+        metrics.cache_lookup(key, "redis", data is not None)
+        if data is not None:
+            _redis_stats["hits"] += 1
+        else:
+            _redis_stats["misses"] += 1
+            data = await loader()
+            if data is None:
+                return None
+            await redis_cache.set_bytes(key, data, ttl)
+        local.set(key, data, len(data), _local_ttl(ttl))
+        return data
+
+    return await flights.do(key, load)
+
+async def get_json(key: str, loader: Callable[[], Awaitable[Optional[dict]]], *, ttl: int) -> Optional[dict]:
+    hit = _local_get(key)
+    if hit is not None:
+        return hit
+
+    async def load() -> Optional[dict]:
+        value = await redis_cache.get_json(key)
+        metrics.cache_lookup(key, "redis", value is not None)
+        if value is not None:
+            _redis_stats["hits"] += 1
+        else:
+            _redis_stats["misses"] += 1
+            value = await loader()
+            if value is None:
+                return None
+            await redis_cache.set_json(key, value, ttl)
+        local.set(key, value, len(json.dumps(value)), _local_ttl(ttl))
+        return value
+
+    return await flights.do(key, load)
+
+async def get_local(key: str, loader: Callable[[], Awaitable[Optional[Any]]], *, ttl: int, size: int = 1024) -> Optional[Any]:
+    """Local tier only (values that aren't worth a Redis round trip, e.g. Mongo point reads)."""
+    hit = _local_get(key)
+    if hit is not None:
+        return hit
+
+    async def load() -> Optional[Any]:
+        value = await loader()
+        if value is not None:
+            local.set(key, value, size, _local_ttl(ttl))
+        return value
+
+    return await flights.do(key, load)
+
+def invalidate(key: str) -> None:
+    local.delete(key)
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {"local": local.stats(), "redis": dict(_redis_stats), "single_flight": flights.stats()}
@@ -1,6 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from . import indexes
 from ..config import settings
+from ..metrics import MongoCommandListener
 import asyncio
 
 _client: AsyncIOMotorClient | None = None
@@ -10,7 +11,7 @@ async def connect() -> AsyncIOMotorDatabase:
     global _client, _db
     if _db is not None:
         return _db
-    _client = AsyncIOMotorClient(settings.MONGO_URI)
+    _client = AsyncIOMotorClient(settings.MONGO_URI, event_listeners=[MongoCommandListener()])
     _db = _client[settings.MONGO_DB]
     # Ensure indexes after DB is ready
     await indexes.ensure_indexes(_db)
@@ -3,21 +3,41 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 
 async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
     # Datasets: unique name
-    try:
-        await db.datasets.create_index("name", unique=True, name="uq_dataset_name")
-    except OperationFailure as e:
-        # IndexOptionsConflict (code 85) — drop and recreate with expected name/options
-        if e.code == 85:
-            await _recreate_index(db, "datasets", [("name", 1)], "uq_dataset_name", unique=True)
-        else:
-            raise
+    await _ensure_index(db, "datasets", [("name", 1)], "uq_dataset_name", unique=True)
 
     # Images: unique per dataset+path
+    await _ensure_index(db, "images", [("dataset_id", 1), ("image_path", 1)], "uq_image_path_per_dataset", unique=True)
+
+    # Filename search keys (written by the worker, see services/search.py)
+    await _ensure_index(db, "images", [("dataset_id", 1), ("search.grams", 1)], "ix_images_search_grams")
+    await _ensure_index(db, "images", [("dataset_id", 1), ("search.segments", 1)], "ix_images_search_segments")
+    await _ensure_index(db, "datasets", [("search.grams", 1)], "ix_datasets_search_grams")
+    await _ensure_index(db, "datasets", [("search.segments", 1)], "ix_datasets_search_segments")
+
+    # Label summaries (services/summary.py): class equality in keyset order. The ranges index
+    # walks pages in image_path order and filters on its trailing keys without fetching docs,
+    # but its ranges are never index bounds; counts and selective ranges use the indexes
+    # led by the summary field, which bound the scan to the matching keys.
+    await _ensure_index(db, "images", [("dataset_id", 1), ("summary.classes", 1), ("image_path", 1)], "ix_images_summary_classes")
+    await _ensure_index(
+        db, "images",
+        [("dataset_id", 1), ("image_path", 1), ("summary.box_count", 1), ("summary.min_area", 1), ("summary.max_area", 1)],
+        "ix_images_summary_ranges",
+    )
+    await _ensure_index(db, "images", [("dataset_id", 1), ("summary.box_count", 1)], "ix_images_summary_box_count")
+    await _ensure_index(db, "images", [("dataset_id", 1), ("summary.min_area", 1)], "ix_images_summary_min_area")
+    await _ensure_index(db, "images", [("dataset_id", 1), ("summary.max_area", 1)], "ix_images_summary_max_area")
+
+    # ZIP central-directory index (services/zip_index.py)
+    await _ensure_index(db, "zip_members", [("dataset_id", 1), ("path", 1)], "uq_zip_member_per_dataset", unique=True)
+
+async def _ensure_index(db: AsyncIOMotorDatabase, coll: str, keys, name: str, **kwargs):
     try:
-        await db.images.create_index([("dataset_id", 1), ("image_path", 1)], unique=True, name="uq_image_path_per_dataset")
+        await db[coll].create_index(keys, name=name, **kwargs)
     except OperationFailure as e:
+        # IndexOptionsConflict (code 85) — drop and recreate with expected name/options
         if e.code == 85:
-            await _recreate_index(db, "images", [("dataset_id", 1), ("image_path", 1)], "uq_image_path_per_dataset", unique=True)
+            await _recreate_index(db, coll, keys, name, **kwargs)
         else:
             raise
 
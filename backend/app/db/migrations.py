@@ -0,0 +1,126 @@
+"""
+One-off data migrations. Every step is idempotent, so re-running is safe:
+
+    python -m app.db.migrations
+"""
+from __future__ import annotations
+
+import asyncio, logging
+from typing import Dict, List
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+
+from ..config import settings
+from ..services.search import search_keys
+from ..services.summary import SUMMARY_PIPELINE, dataset_counts_pipeline
+
+log = logging.getLogger(__name__)
+
+BATCH = 1000
+
+async def normalize_image_dataset_ids(db: AsyncIOMotorDatabase) -> int:
+    """
+    Convert legacy string `images.dataset_id` values to ObjectId so queries can
+    match on a single type and use `uq_image_path_per_dataset` directly.
+    A legacy doc whose (dataset_id, image_path) already exists with an ObjectId
+    is a stale duplicate and gets deleted. Returns number of docs converted.
+    """
+    converted = 0
+    ids: List[ObjectId] = []
+    ops: List[UpdateOne] = []
+
+    async def flush() -> int:
+        try:
+            res = await db.images.bulk_write(ops, ordered=False)
+            return res.modified_count
+        except BulkWriteError as e:
+            dupes = [ids[err["index"]] for err in e.details.get("writeErrors", []) if err.get("code") == 11000]
+            if len(dupes) != len(e.details.get("writeErrors", [])):
+                raise
+            if dupes:
+                await db.images.bulk_write([DeleteOne({"_id": _id}) for _id in dupes], ordered=False)
+            return e.details.get("nModified", 0)
+
+    cursor = db.images.find({"dataset_id": {"$type": "string"}}, {"_id": 1, "dataset_id": 1})
+    async for doc in cursor:
+        try:
+            oid = ObjectId(doc["dataset_id"])
+        except (InvalidId, TypeError):
+            log.warning("migrate.dataset_id.skip", extra={"ctx_id": str(doc["_id"])})
+            continue
+        ids.append(doc["_id"])
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"dataset_id": oid}}))
+        if len(ops) >= BATCH:
+            converted += await flush()
+            ids, ops = [], []
+    if ops:
+        converted += await flush()
+    return converted
+
+async def backfill_search_keys(db: AsyncIOMotorDatabase) -> int:
+    """Add `search` keys to image and dataset docs written before the worker stored them."""
+    done = 0
+    for coll, field in (("images", "image_path"), ("datasets", "name")):
+        ops: List[UpdateOne] = []
+        async for doc in db[coll].find({"search": {"$exists": False}}, {"_id": 1, field: 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search": search_keys(doc.get(field) or "")}}))
+            if len(ops) >= BATCH:
+                done += (await db[coll].bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            done += (await db[coll].bulk_write(ops, ordered=False)).modified_count
+    return done
+
+async def backfill_dataset_counts(db: AsyncIOMotorDatabase) -> int:
+    """
+    Seed image_count / labeled_count / class_counts on datasets that predate the
+    worker-maintained counters (the worker's recount_dataset runs the same pipeline).
+    """
+    done = 0
+    async for ds in db.datasets.find({"image_count": {"$exists": False}}, {"_id": 1}):
+        res = await db.images.aggregate(dataset_counts_pipeline(ds["_id"])).to_list(length=1)
+        facet = res[0] if res else {"totals": [], "classes": []}
+        totals = facet["totals"][0] if facet["totals"] else {"image_count": 0, "labeled_count": 0}
+        await db.datasets.update_one({"_id": ds["_id"]}, {"$set": {
+            "image_count": totals["image_count"],
+            "labeled_count": totals["labeled_count"],
+            "class_counts": {str(c["_id"]): c["n"] for c in facet["classes"]},
+        }})
+        done += 1
+    return done
+
+async def backfill_label_summaries(db: AsyncIOMotorDatabase) -> int:
+    """Add `summary` (classes, box_count, min/max box area) to images ingested before the worker stored it."""
+    res = await db.images.update_many({"summary": {"$exists": False}}, SUMMARY_PIPELINE)
+    return res.modified_count
+
+STEPS = [
+    normalize_image_dataset_ids,
+    backfill_search_keys,
+    backfill_dataset_counts,
+    backfill_label_summaries,
+]
+
+async def run_all(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    """Run every step in order; returns the number of docs each one changed."""
+    counts: Dict[str, int] = {}
+    for step in STEPS:
+        counts[step.__name__] = n = await step(db)
+        log.info("migrate.step.done", extra={"ctx_step": step.__name__, "ctx_count": n})
+    return counts
+
+async def _main() -> None:
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    try:
+        counts = await run_all(client[settings.MONGO_DB])
+    finally:
+        client.close()
+    for name, n in counts.items():
+        print(f"{name}: {n}")
+
+if __name__ == "__main__":
+    asyncio.run(_main())
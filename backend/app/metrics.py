@@ -0,0 +1,198 @@
+"""
+In-process metrics in the Prometheus text format (GET /metrics).
+
+A small dependency-free registry: counters and fixed-bucket histograms kept
+in dicts keyed by label values. Recording is a dict lookup plus a bisect,
+cheap enough to leave on in production. Each metric has a lock: pymongo's
+command listener and threadpool code record from other threads while /metrics
+renders. Values are per process, so scrape
+every instance (on Cloud Run, use a sidecar or managed collection).
+
+Labels stay low-cardinality: route templates (not raw paths), cache key
+families (the prefix before the first ':'), GCS operation names and Mongo
+command/collection names.
+"""
+from __future__ import annotations
+import threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional[List["_Metric"]] = None):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._lock = threading.Lock()
+        (_registry if registry is None else registry).append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional[List["_Metric"]] = None):
+        super().__init__(name, help, labelnames, registry)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, n: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        out = super().render()
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, v in values:
+            out.append(f"{self.name}{_labels(self.labelnames, labels)} {v:g}")
+        return out
+
+class Histogram(_Metric):
+    kind = "histogram"
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional[List["_Metric"]] = None,
+    ):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # [bucket counts..., +Inf, sum]
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            s = self._series.get(labels)
+            return int(sum(s[:-1])) if s else 0
+
+    def render(self) -> List[str]:
+        out = super().render()
+        with self._lock:
+            series = sorted((labels, list(s)) for labels, s in self._series.items())
+        for labels, s in series:
+            acc = 0.0
+            for le, n in zip(self.buckets, s):
+                acc += n
+                le_label = 'le="%g"' % le
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le_label)} {acc:g}")
+            acc += s[len(self.buckets)]
+            inf_label = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, inf_label)} {acc:g}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {s[-1]:.6f}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {acc:g}")
+        return out
+
+def render(registry: Optional[List[_Metric]] = None) -> str:
+    lines: List[str] = []
+    for m in (_registry if registry is None else registry):
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+# ------------ metrics ------------
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"))
+CACHE = Counter("cache_requests_total", "Cache lookups by key family, tier and result", ("family", "tier", "result"))
+GCS_LATENCY = Histogram("gcs_operation_duration_seconds", "GCS call latency", ("op",))
+GCS_ERRORS = Counter("gcs_operation_errors_total", "GCS calls that raised", ("op", "error"))
+MONGO_LATENCY = Histogram("mongo_command_duration_seconds", "Mongo command latency", ("command", "collection"))
+MONGO_ERRORS = Counter("mongo_command_failures_total", "Mongo commands that failed", ("command", "collection"))
+
+def key_family(key: str) -> str:
+    return key.split(":", 1)[0] or "other"
+
+def cache_lookup(key: str, tier: str, hit: bool) -> None:
+    CACHE.inc(key_family(key), tier, "hit" if hit else "miss")
+
+@contextmanager
+def gcs(op: str) -> Iterator[None]:
+    """Time one GCS call: `with metrics.gcs("download"): blob.download_as_bytes()`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        GCS_ERRORS.inc(op, type(e).__name__)
+        raise
+    finally:
+        GCS_LATENCY.observe(time.perf_counter() - t0, op)
+
+# ------------ HTTP ------------
+
+class MetricsMiddleware:
+    """Latency per (method, route template, status); unmatched paths share one label."""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+
+        async def wrapped(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - t0, scope["method"], template, str(status))
+
+# ------------ Mongo ------------
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command monitoring → MONGO_LATENCY / MONGO_ERRORS (pass via event_listeners=)."""
+    _SKIP = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+    def __init__(self):
+        self._collections: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in self._SKIP:
+            return
+        coll = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = coll if isinstance(coll, str) else ""
+
+    def _done(self, event, failed: bool) -> None:
+        if event.command_name in self._SKIP:
+            return
+        coll = self._collections.pop((event.connection_id, event.request_id), "")
+        if event.command_name == "getMore":
+            coll = coll or "cursor"
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name, coll)
+        if failed:
+            MONGO_ERRORS.inc(event.command_name, coll)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._done(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._done(event, failed=True)
@@ -0,0 +1,116 @@
+"""
+Fast JSON responses and response compression.
+
+FastJSONResponse serializes with orjson and is meant to be *returned* from
+hot listing endpoints: returning a plain dict sends it through
+jsonable_encoder first, which is where most of the encode time goes.
+
+CompressionMiddleware compresses buffered JSON bodies above
+RESPONSE_COMPRESS_MIN bytes. It uses brotli when the package is installed
+and the client accepts it, and gzip otherwise. Streaming bodies (images,
+exports, multipart) pass through untouched.
+"""
+from __future__ import annotations
+import gzip, os
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional: `pip install brotli`
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESS_MIN   = int(os.getenv("RESPONSE_COMPRESS_MIN", "4096"))  # bytes; smaller bodies go out as-is
+GZIP_LEVEL     = int(os.getenv("RESPONSE_GZIP_LEVEL", "1"))     # ~2x faster than 5, ~10% larger
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+OFFLOAD_MIN    = 64 * 1024  # compress bigger bodies in the threadpool, off the event loop
+
+def _default(o: Any) -> Any:
+    if isinstance(o, ObjectId):
+        return str(o)
+    raise TypeError
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def _pick_encoding(accept: str) -> str | None:
+    offered = set()
+    for part in accept.split(","):
+        coding, _, params = part.partition(";")
+        q = params.replace(" ", "").lower()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        offered.add(coding.strip().lower())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+
+        async def wrapped(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # held until we see the first body chunk
+                return
+            if start is None:  # already flushed: pass the rest of a streamed body through
+                await send(message)
+                return
+            held, start = start, None
+            headers = MutableHeaders(raw=held["headers"])
+            body = message.get("body", b"")
+            eligible = (
+                not message.get("more_body", False)
+                and headers.get("content-type", "").startswith("application/json")
+                and "content-encoding" not in headers
+                and len(body) >= self.minimum_size
+            )
+            if eligible:
+                if len(body) >= OFFLOAD_MIN:
+                    body = await run_in_threadpool(compress, body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            await send(held)
+            await send(message)
+
+        await self.app(scope, receive, wrapped)
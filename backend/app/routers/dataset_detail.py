@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import Optional, Dict, Any
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from ..db.client import get_db
+from ..services.counts import image_total
+from ..services.datasets import load_dataset, dataset_version
+from ..services import list_cache
+from ..responses import FastJSONResponse
 
 router = APIRouter(tags=["datasets"])
 
 @router.get("/datasets/{dataset_id}")
 async def get_dataset(
     dataset_id: str,
-    include_counts: bool = Query(False, description="include image count"),
+    request: Request,
+    include_counts: bool = Query(False, description="include image count (maintained by the worker)"),
     db: AsyncIOMotorDatabase = Depends(get_db),
 ):
     try:
@@ -20,16 +25,22 @@ async def get_dataset(
     except Exception:
         raise HTTPException(404, "invalid id")
 
-    d = await db.datasets.find_one({"_id": oid})
+    d = await load_dataset(db, oid)
     if not d:
         raise HTTPException(404, "not found")
 
-    d["_id"] = str(d["_id"])
-    d["can_preview"] = bool(d.get("source_prefix"))
+    # ZIP preview progress is written by the API itself, outside the version
+    preview = d.get("preview") or {}
+    etag = list_cache.weak_etag(list_cache.version_key(
+        "dataset", oid, dataset_version(d), include_counts, preview.get("state"), preview.get("done"),
+    ))
+    if list_cache.not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
     if include_counts:
-        # Support ObjectId and legacy string dataset_id in images collection
-        total = await db.images.count_documents({"$or": [{"dataset_id": oid}, {"dataset_id": dataset_id}]})
-        d["image_count"] = total
+        d["image_count"] = await image_total(db, d, {"dataset_id": oid})
+
+    d["_id"] = str(d["_id"])
+    d["can_preview"] = bool(d.get("source_prefix"))
 
-    return d
+    return FastJSONResponse(d, headers={"ETag": etag, "Cache-Control": "no-cache"})
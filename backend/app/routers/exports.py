@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio, logging, os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..db.client import get_db
+from ..utils import parse_gs_uri, object_for_path
+from ..services import zip_index
+from ..services.datasets import load_dataset
+from ..services.export import ZipStream, TarStream, CocoWriter, yolo_member_names, yolo_label_text, yolo_data_yaml
+from ..services.search import search_filter
+from ..services.streaming import iter_blob
+from ..services.summary import label_filters
+from .. import metrics
+
+router = APIRouter(tags=["exports"])
+log = logging.getLogger(__name__)
+
+EXPORT_BATCH      = int(os.getenv("EXPORT_BATCH", "500"))                           # Mongo cursor batch
+EXPORT_PREFETCH   = int(os.getenv("EXPORT_PREFETCH", "8"))                          # images fetched ahead
+EXPORT_INLINE_MAX = int(os.getenv("EXPORT_INLINE_MAX", str(8 * 1024 * 1024)))     # larger ones are piped in chunks
+
+_MEDIA = {"zip": "application/zip", "tar": "application/x-tar", "none": "application/json"}
+
+def _norm(p: str) -> str:
+    return (p or "").lstrip("/").replace("\\", "/")
+
+@router.get("/datasets/{dataset_id}/export")
+async def export_dataset(
+    dataset_id: str,
+    format: str = Query("yolo", pattern="^(yolo|coco)$"),
+    archive: str = Query("zip", pattern="^(zip|tar|none)$", description="none = bare COCO JSON"),
+    images: bool = Query(False, description="include image bytes (piped from GCS)"),
+    q: Optional[str] = Query(None, description="filename contains"),
+    label_match: Dict[str, Any] = Depends(label_filters),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+):
+    """
+    Stream the dataset as YOLO (`labels/*.txt` + data.yaml) or COCO
+    (`annotations.json`), optionally with `images/*`, straight from a Mongo
+    cursor. Nothing is built up front: the first bytes go out immediately and
+    memory stays bounded by EXPORT_PREFETCH images.
+    """
+    try:
+        oid = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(404, "invalid id")
+    d = await load_dataset(db, oid)
+    if not d:
+        raise HTTPException(404, "dataset not found")
+    if archive == "none" and (format != "coco" or images):
+        raise HTTPException(400, "archive=none is only for COCO JSON without images")
+    if archive == "tar" and format == "coco":
+        raise HTTPException(400, "COCO exports stream as zip or bare JSON (tar needs sizes up front)")
+    if images and not (d.get("source_prefix") or d.get("source_zip")):
+        raise HTTPException(400, "dataset has neither source_prefix nor source_zip")
+
+    match: Dict[str, Any] = {"dataset_id": oid}
+    if q:
+        match.update(search_filter(q))
+    match.update(label_match)
+    projection = {"_id": 0, "image_path": 1, "labels": 1, "width": 1, "height": 1, "object": 1}
+
+    def docs():
+        return db.images.find(match, projection).sort("image_path", 1).batch_size(EXPORT_BATCH)
+
+    async def coco_json() -> AsyncIterator[bytes]:
+        coco = CocoWriter()
+        yield coco.open()
+        async for doc in docs():
+            yield coco.image(doc)
+        for piece in coco.close():
+            yield piece
+
+    async def body() -> AsyncIterator[bytes]:
+        if archive == "none":
+            async for piece in coco_json():
+                yield piece
+            return
+
+        w = ZipStream() if archive == "zip" else TarStream()
+        if format == "coco":
+            yield w.start("annotations.json")
+            async for piece in coco_json():
+                yield w.chunk(piece)
+            yield w.end()
+        else:
+            classes = [int(c) for c in (d.get("class_counts") or {})]
+            yield w.add("data.yaml", yolo_data_yaml(classes))
+            async for doc in docs():
+                yield w.add(yolo_member_names(doc["image_path"])[1], yolo_label_text(doc.get("labels") or []))
+
+        if images:
+            # YOLO: next to their labels; COCO: file_name is the image_path under images/
+            member = (lambda p: yolo_member_names(p)[0]) if format == "yolo" else (lambda p: "images/" + _norm(p))
+            async for piece in _image_members(db, d, docs(), w, member):
+                yield piece
+        yield w.close()
+
+    ext = {"zip": ".zip", "tar": ".tar", "none": ".json"}[archive]
+    filename = f"{d.get('name') or dataset_id}-{format}{ext}".replace('"', "")
+    return StreamingResponse(
+        body(), media_type=_MEDIA[archive],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
+async def _image_members(db: AsyncIOMotorDatabase, d: dict, cursor, w, member) -> AsyncIterator[bytes]:
+    """
+    Image members (named by `member(image_path)`) in cursor order. Up to EXPORT_PREFETCH small images
+    are fetched ahead concurrently; larger ones are piped chunk by chunk.
+    Images missing from storage are skipped (and logged).
+    """
+    if d.get("source_prefix"):
+        bucket_name, _ = parse_gs_uri(d["source_prefix"])
+    else:
+        bucket_name, zip_name = parse_gs_uri(d["source_zip"])
+    bucket = storage.Client().bucket(bucket_name)
+
+    async def fetch(doc) -> Tuple[Optional[Any], Optional[int], Optional[bytes]]:
+        rel = _norm(doc["image_path"])
+        try:
+            if d.get("source_zip"):
+                hit = await zip_index.extract(db, str(d["_id"]), bucket.blob(zip_name), rel)
+                return (None, len(hit[1]), hit[1]) if hit else (None, None, None)
+            obj = doc.get("object") or {}
+            _, name = object_for_path(d["source_prefix"], rel, obj)
+            blob = bucket.blob(name)
+            if obj.get("name") == name and obj.get("size") is not None:
+                size, gen = int(obj["size"]), obj.get("generation")
+            else:
+                with metrics.gcs("reload"):
+                    await run_in_threadpool(blob.reload)
+                size, gen = int(blob.size or 0), blob.generation
+            if size > EXPORT_INLINE_MAX:
+                return (blob, gen), size, None
+            data = b"".join([c async for c in iter_blob(blob, 0, size - 1, generation=gen)]) if size else b""
+            return None, size, data
+        except Exception as e:
+            if not isinstance(e, NotFound):
+                log.warning("export.image.failed", extra={"ctx_path": rel, "ctx_reason": type(e).__name__})
+            return None, None, None
+
+    window: Deque[Tuple[dict, asyncio.Task]] = deque()
+    try:
+        async for doc in cursor:
+            window.append((doc, asyncio.create_task(fetch(doc))))
+            if len(window) < EXPORT_PREFETCH:
+                continue
+            async for piece in _emit(window.popleft(), w, member):
+                yield piece
+        while window:
+            async for piece in _emit(window.popleft(), w, member):
+                yield piece
+    finally:
+        for _, t in window:
+            t.cancel()
+
+async def _emit(item, w, member) -> AsyncIterator[bytes]:
+    doc, task = item
+    src, size, data = await task
+    if size is None:
+        return
+    name = member(doc["image_path"])
+    if data is not None:
+        yield w.add(name, data, compress=False)
+        return
+    blob, gen = src
+    yield w.start(name, size, compress=False)
+    async for chunk in iter_blob(blob, 0, size - 1, generation=gen):
+        yield w.chunk(chunk)
+    yield w.end()
@@ -1,9 +1,23 @@
 from __future__ import annotations
 
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..cache import tiered
+from .. import metrics
 
 router = APIRouter(tags=["health"])
 
 @router.get("/healthz")
 async def healthz():
-    return {"ok": True}
+    return {"ok": True, "status": "ok"}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Per-tier hit/miss counters for this process (local LRU, Redis, single-flight)."""
+    return tiered.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_text():
+    """Prometheus text exposition: request latency, cache lookups, GCS and Mongo timings."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,26 +1,37 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, Dict, Any, List, Tuple
+from pydantic import BaseModel, Field
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from ..db.client import get_db
-from ..utils import parse_gs_uri
+from ..utils import parse_gs_uri, object_for_path, encode_cursor, decode_cursor
 from ..services.gcs import get_blob
-from ..cache.redis_cache import (
-    get_json as cache_get_json,
-    set_json as cache_set_json,
-    get_bytes as cache_get_bytes,
-    set_bytes as cache_set_bytes,
-)
+from ..services.search import search_filter
+from ..services.summary import summary_filter, label_filters
+from ..services.counts import image_total
+from ..services.datasets import load_dataset, dataset_version
+from ..services import list_cache
+from ..services import zip_index, zip_previews
+from ..services import multipart
+from ..services import variants
+from ..services import columnar
+from ..services.streaming import stream_blob, parse_range, if_range_matches, RangeNotSatisfiable
+from ..cache import tiered
+from ..responses import FastJSONResponse
+from .. import metrics
 
 # GCS + misc
 from google.cloud import storage
+from google.api_core.exceptions import NotFound, PreconditionFailed
 from datetime import datetime, timedelta, timezone
-import mimetypes, tempfile, zipfile, os, hashlib, logging
+import asyncio, mimetypes, tempfile, zipfile, os, hashlib, logging
 import email.utils as eut
-from urllib.parse import quote_plus
+from urllib.parse import quote, quote_plus
 
 router = APIRouter(tags=["images"])
 log = logging.getLogger(__name__)
@@ -30,8 +41,14 @@ IMG_BYTES_TTL   = int(os.getenv("CACHE_IMAGE_BYTES_TTL", "600"))           # 10
 IMG_BYTES_MAX   = int(os.getenv("CACHE_IMAGE_BYTES_MAX", str(1024*1024)))   # 1 MiB
 URL_DEFAULT_TTL = int(os.getenv("IMAGE_URL_TTL", "3600"))                   # 1 hour
 URL_SAFETY      = int(os.getenv("SIGNED_URL_SAFETY", "60"))                 # shave a minute off cache
+OBJ_META_TTL    = int(os.getenv("CACHE_OBJECT_META_TTL", "60"))            # stored GCS metadata per image
 PREVIEW_BASE    = os.getenv("PREVIEW_PREFIX_BASE", "previews").strip("/")
+BULK_MAX_ITEMS  = int(os.getenv("IMAGE_BULK_MAX_ITEMS", "200"))             # paths per bulk request
+BULK_ITEM_MAX   = int(os.getenv("IMAGE_BULK_ITEM_MAX", str(IMG_BYTES_MAX)))  # larger images: client fetches singly
+BULK_MAX_BYTES  = int(os.getenv("IMAGE_BULK_MAX_BYTES", str(32*1024*1024))) # body budget per response
+BULK_CONCURRENCY = int(os.getenv("IMAGE_BULK_CONCURRENCY", "16"))           # parallel fetches per response
 GCS_OVERRIDE    = os.getenv("GCS_BUCKET")  # optional override bucket for zip-caches
+VARIANT_TTL     = int(os.getenv("CACHE_VARIANT_TTL", "3600"))               # keyed by source etag, so only memory bounds it
 
 # How to behave when signing isn't possible:
 #   auto (default): try to sign, else fall back to proxy
@@ -51,19 +68,43 @@ def _httpdate(dt: datetime) -> str:
 def _proxy_url(dataset_id: str, rel_path: str) -> str:
     return f"/datasets/{dataset_id}/image?path={quote_plus(_norm(rel_path))}"
 
-def _blob_from_prefix(prefix_uri: str, rel_path: str):
-    bucket, key_prefix = parse_gs_uri(prefix_uri)
-    key_prefix = (key_prefix or "").rstrip("/")
-    object_name = f"{key_prefix}/{_norm(rel_path)}" if key_prefix else _norm(rel_path)
-    return bucket, object_name, get_blob(bucket, object_name)
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    # Mongo hands back naive UTC datetimes
+    return dt.replace(tzinfo=timezone.utc) if dt is not None and dt.tzinfo is None else dt
+
+def _meta(*, etag, updated, ctype, size, generation, stored: bool) -> Dict[str, Any]:
+    return {
+        "etag": etag,
+        "updated": _utc(updated) or datetime.now(timezone.utc),
+        "ctype": ctype or "application/octet-stream",
+        "size": int(size or 0),
+        "generation": generation,
+        "stored": stored,
+    }
+
+def _live_meta(blob) -> Optional[Dict[str, Any]]:
+    """One GCS metadata round trip; None when the object doesn't exist."""
+    try:
+        with metrics.gcs("reload"):
+            blob.reload()
+    except NotFound:
+        return None
+    return _meta(etag=blob.etag, updated=blob.updated, ctype=blob.content_type,
+                 size=blob.size, generation=blob.generation, stored=False)
 
-def _gcs_meta(blob):
-    blob.reload()
-    etag = blob.etag
-    updated = blob.updated or datetime.now(timezone.utc)
-    ctype = blob.content_type or "application/octet-stream"
-    size = int(blob.size or 0)
-    return etag, updated, ctype, size
+def _meta_from_object(obj: Optional[dict], name: str) -> Optional[Dict[str, Any]]:
+    """Metadata the worker recorded at upload time, if it describes object `name`."""
+    if not obj or obj.get("name") != name or not obj.get("etag"):
+        return None
+    return _meta(etag=obj["etag"], updated=obj.get("updated"), ctype=obj.get("content_type"),
+                 size=obj.get("size"), generation=obj.get("generation"), stored=True)
+
+async def _stored_object(db: AsyncIOMotorDatabase, oid: ObjectId, rel: str) -> Dict[str, Any]:
+    """The `object` the worker recorded on the image doc ({} when none)."""
+    async def fetch():
+        doc = await db.images.find_one({"dataset_id": oid, "image_path": rel}, {"_id": 0, "object": 1})
+        return (doc or {}).get("object") or {}  # {} caches "nothing recorded" too
+    return await tiered.get_local(f"obj:{oid}:{rel}", fetch, ttl=OBJ_META_TTL, size=512)
 
 def _maybe_304(request: Request, etag: str | None, updated: datetime | None):
     inm = request.headers.get("if-none-match")
@@ -83,8 +124,10 @@ def _add_cache_headers(resp: Response, *, etag: str | None, updated: datetime |
     if etag:   resp.headers["ETag"] = etag
     if updated:resp.headers["Last-Modified"] = _httpdate(updated)
     resp.headers["Cache-Control"] = "public, max-age=86400, stale-while-revalidate=600"
+    resp.headers["Accept-Ranges"] = "bytes"
     if size:   resp.headers["Content-Length"] = str(size)
     resp.media_type = ctype
+    resp.headers["Content-Type"] = ctype
 
 def _zip_cache_bucket_and_key(dataset_doc: dict, rel_path: str) -> Tuple[str, str]:
     rel_path = _norm(rel_path)
@@ -98,55 +141,86 @@ def _zip_cache_bucket_and_key(dataset_doc: dict, rel_path: str) -> Tuple[str, st
     name = f"{PREVIEW_BASE}/{dataset_id}/{rel_path}"
     return bucket, name
 
-def _ensure_cached_zip_blob(dataset_doc: dict, rel_path: str) -> Tuple[str, str]:
+async def _ensure_cached_zip_blob(db: AsyncIOMotorDatabase, dataset_doc: dict, rel_path: str) -> Tuple[str, str]:
     rel_path = _norm(rel_path)
     src_zip = dataset_doc.get("source_zip")
     if not src_zip:
         raise HTTPException(400, "dataset missing source_zip")
 
-    cache_bucket, cache_name = _zip_cache_bucket_and_key(dataset_doc, rel_path)
-    client = storage.Client()
-    cblob = client.bucket(cache_bucket).blob(cache_name)
-    if cblob.exists():
+    cache_bucket, _ = _zip_cache_bucket_and_key(dataset_doc, rel_path)
+    # previews are tracked per member in Mongo, no GCS exists() here. Always resolve through
+    # the index: the request path may only match a member by suffix, and a finished pass
+    # can still have skipped members (unreadable ones)
+    oid = dataset_doc["_id"]
+    member = await zip_index.find_member(db, str(oid), rel_path)
+    if member and member.get("preview"):
+        return cache_bucket, f"{PREVIEW_BASE}/{oid}/{member['path']}"
+
+    async def miss() -> Tuple[str, str]:
+        client = storage.Client()
+        cbucket = client.bucket(cache_bucket)
+        zip_bucket, zip_key = parse_gs_uri(src_zip)
+        zblob = client.bucket(zip_bucket).blob(zip_key)
+
+        # materialize the whole archive once in the background; serve this member now
+        await zip_previews.maybe_start(
+            db, dataset_doc, client.bucket(zip_bucket).blob(zip_key), cbucket, f"{PREVIEW_BASE}/{oid}",
+        )
+
+        # one ranged read via the central-directory index; full download only for
+        # members a ranged read can't serve (encrypted / LZMA)
+        try:
+            found = await zip_index.extract(db, str(dataset_doc["_id"]), zblob, rel_path)
+        except NotFound:
+            raise HTTPException(404, "ZIP object not found in GCS")
+        except zip_index.UnsupportedMember:
+            found = await run_in_threadpool(_extract_zip_member_full, zblob, rel_path)
+        if found is None:
+            raise HTTPException(404, f"image '{rel_path}' not found in ZIP")
+        target, data = found
+
+        # store under the member's own path so the background pass and later lookups agree
+        target = _norm(target)
+        cache_name = f"{PREVIEW_BASE}/{oid}/{target}"
+        ctype = mimetypes.guess_type(target)[0] or "application/octet-stream"
+        with metrics.gcs("upload"):
+            await run_in_threadpool(cbucket.blob(cache_name).upload_from_string, data, content_type=ctype)
+        await db.zip_members.update_one({"dataset_id": oid, "path": target}, {"$set": {"preview": True}})
         return cache_bucket, cache_name
 
-    zip_bucket, zip_key = parse_gs_uri(src_zip)
-    zblob = client.bucket(zip_bucket).blob(zip_key)
-    if not zblob.exists():
-        raise HTTPException(404, "ZIP object not found in GCS")
+    # concurrent misses for the same member share one extraction
+    return await tiered.single_flight(f"zipm:{oid}:{rel_path}", miss)
 
+def _extract_zip_member_full(zblob, rel_path: str) -> Optional[Tuple[str, bytes]]:
     with tempfile.NamedTemporaryFile(suffix=".zip") as tf:
-        zblob.download_to_filename(tf.name)
+        with metrics.gcs("download"):
+            zblob.download_to_filename(tf.name)
         with zipfile.ZipFile(tf.name) as zf:
             target = rel_path
             try:
-                data = zf.read(target)
+                return target, zf.read(target)
             except KeyError:
                 matches = [n for n in zf.namelist() if n.replace("\\", "/").endswith(rel_path)]
                 if not matches:
-                    raise HTTPException(404, f"image '{rel_path}' not found in ZIP")
+                    return None
                 target = sorted(matches, key=len)[0]
-                data = zf.read(target)
-
-    ctype = mimetypes.guess_type(target)[0] or "application/octet-stream"
-    cblob.upload_from_string(data, content_type=ctype)
-    return cache_bucket, cache_name
+                return target, zf.read(target)
 
 def _sign_url(bucket: str, name: str, *, ttl_s: int, disposition: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
     """
     Try to produce a V4 signed URL. On failure (e.g. local OAuth creds without private key),
     return (None, None). Caller decides to fall back to proxy depending on SIGNED_URLS_MODE.
+    Callers establish that the object exists (stored metadata or a reload) beforehand.
     """
     try:
         client = storage.Client()
         blob = client.bucket(bucket).blob(name)
-        if not blob.exists():
-            raise HTTPException(404, "object not found in GCS")
         expires = datetime.now(timezone.utc) + timedelta(seconds=max(1, ttl_s - SAFETY_SECONDS))
         params = {"version": "v4", "expiration": expires, "method": "GET"}
         if disposition:
             params["response_disposition"] = disposition
-        url = blob.generate_signed_url(**params)
+        with metrics.gcs("sign"):
+            url = blob.generate_signed_url(**params)
         return url, expires.replace(microsecond=0).isoformat() + "Z"
     except Exception as e:
     # Avoid reserved LogRecord attribute names like "name", "msg", etc.
@@ -170,6 +244,51 @@ def _disp_for_download(as_download: bool, rel_path: str, filename: Optional[str]
 def _hash(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()[:16]
 
+async def _keyset_page(
+    coll,
+    match: Dict[str, Any],
+    projection: Dict[str, Any],
+    *,
+    page: int,
+    page_size: int,
+    after: Optional[str],
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page ordered by image_path on uq_image_path_per_dataset.
+    With `after` the page starts strictly past the cursor (no skip); without it we
+    fall back to skip-based paging so `page=` links keep working.
+    Returns (docs, next_cursor) where next_cursor is None on the last page.
+    """
+    query = dict(match)
+    if after:
+        try:
+            last = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(400, "invalid cursor")
+        query["image_path"] = {**query.get("image_path", {}), "$gt": last}
+
+    cursor = coll.find(query, projection).sort("image_path", 1)
+    if not after:
+        cursor = cursor.skip((page - 1) * page_size)
+    docs = await cursor.limit(page_size + 1).to_list(length=page_size + 1)
+
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1]["image_path"])
+    return docs, next_cursor
+
+
+# fields= for GET /images; image_path is always returned (it is the keyset cursor)
+IMAGE_FIELDS = ("labels", "dataset_id", "summary", "width", "height")
+DEFAULT_IMAGE_FIELDS = ("labels", "dataset_id")
+
+def _image_projection(fields: Optional[str]) -> Dict[str, Any]:
+    wanted = DEFAULT_IMAGE_FIELDS if fields is None else [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in IMAGE_FIELDS and f != "image_path"]
+    if unknown:
+        raise HTTPException(400, f"unknown fields: {', '.join(unknown)} (allowed: {', '.join(IMAGE_FIELDS)})")
+    return {"_id": 0, "image_path": 1, **{f: 1 for f in wanted}}
 
 @router.get("/datasets/{dataset_id}/images")
 async def list_images(
@@ -177,6 +296,10 @@ async def list_images(
     page: int = Query(1, ge=1),
     page_size: int = Query(30, ge=1, le=200),
     q: Optional[str] = Query(None, description="filename contains (case-insensitive)"),
+    after: Optional[str] = Query(None, description="opaque cursor (next_cursor of the previous page)"),
+    fields: Optional[str] = Query(None, description="comma-separated subset of labels,dataset_id,summary,width,height"),
+    label_match: Dict[str, Any] = Depends(label_filters),
+    request: Request = None,
     db: AsyncIOMotorDatabase = Depends(get_db),
 ):
     try:
@@ -184,33 +307,51 @@ async def list_images(
     except Exception:
         raise HTTPException(404, "invalid id")
 
-    match: Dict[str, Any] = {"$or": [{"dataset_id": oid}, {"dataset_id": dataset_id}]}
+    # dataset_id is always ObjectId (see app.db.migrations for legacy string ids)
+    match: Dict[str, Any] = {"dataset_id": oid}
     if q:
-        match["image_path"] = {"$regex": q, "$options": "i"}
-
-    total = await db.images.count_documents(match)
-    cursor = (
-        db.images
-        .find(match, {"_id": 0, "image_path": 1, "labels": 1, "dataset_id": 1})
-        .sort("image_path", 1)
-        .skip((page - 1) * page_size)
-        .limit(page_size)
-    )
+        match.update(search_filter(q))
+    match.update(label_match)
 
-    items: List[Dict[str, Any]] = []
-    async for doc in cursor:
-        if isinstance(doc.get("dataset_id"), ObjectId):
-            doc["dataset_id"] = str(doc["dataset_id"])
-        items.append(doc)
+    projection = _image_projection(fields)
+    d = await load_dataset(db, oid)
 
-    return {"items": items, "page": page, "page_size": page_size, "total": total}
+    async def build() -> Dict[str, Any]:
+        # very large datasets: sorted pages, filters and counts from the mapped columnar catalog
+        table = await columnar.load(d) if columnar.supports(label_match) else None
+        if table is not None:
+            try:
+                last = decode_cursor(after) if after else None
+            except ValueError:
+                raise HTTPException(400, "invalid cursor")
+            fields_out = [f for f in projection if f not in ("_id", "image_path")]
+            docs, total, next_cursor = await run_in_threadpool(
+                columnar.page, table, oid, q=q, label_match=label_match, fields=fields_out,
+                page=page, page_size=page_size, after=last,
+            )
+        else:
+            total = await image_total(db, d, match)
+            docs, next_cursor = await _keyset_page(
+                db.images, match, projection, page=page, page_size=page_size, after=after,
+            )
+        return {"items": docs, "page": page, "page_size": page_size, "total": total, "next_cursor": next_cursor}
+
+    # versioned key: a re-ingest (worker bumps dataset.version) retires every cached page at once
+    key = list_cache.version_key(
+        "images", oid, dataset_version(d), page, page_size, q, after, sorted(projection), label_match,
+    )
+    return await list_cache.respond(request, key, build)
 
-# --------- BYTES (proxy) with Redis cache for small images ---------
+# --------- BYTES (proxy): Redis cache for small images, Range-aware streaming for the rest ---------
 
 @router.get("/datasets/{dataset_id}/image")
 async def get_image_bytes(
     dataset_id: str,
     path: str = Query(..., description="relative image path within dataset"),
+    width: Optional[int] = Query(None, description="fit within this width (resized variant)"),
+    height: Optional[int] = Query(None, description="fit within this height (resized variant)"),
+    format: Optional[str] = Query(None, description="jpeg | webp | png (transcoded variant)"),
+    quality: Optional[int] = Query(None, description="1-100 for jpeg/webp variants"),
     request: Request = None,
     db: AsyncIOMotorDatabase = Depends(get_db),
 ):
@@ -218,46 +359,281 @@ async def get_image_bytes(
         oid = ObjectId(dataset_id)
     except Exception:
         raise HTTPException(404, "invalid id")
-    d = await db.datasets.find_one({"_id": oid})
+    try:
+        spec = variants.parse_spec(width=width, height=height, fmt=format, quality=quality)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    d = await load_dataset(db, oid)
     if not d:
         raise HTTPException(404, "dataset not found")
 
     rel = _norm(path)
+    bucket, name, blob, meta = await _resolve_image(db, oid, d, rel)
+
+    async def send(meta: Dict[str, Any]) -> Response:
+        if spec:
+            return await _send_variant(request, bucket, name, blob, meta, spec)
+        return await _send_image(request, bucket, name, blob, meta)
 
-    # primary: prefix
+    try:
+        return await send(meta)
+    except (PreconditionFailed, NotFound):
+        return await send(await _refresh_meta(oid, rel, blob, meta))
+
+async def _resolve_image(db: AsyncIOMotorDatabase, oid: ObjectId, d: dict, rel: str):
+    """(bucket, name, blob, meta) for one image; 404 when the object is gone."""
+    # primary: prefix (metadata recorded by the worker at ingest, no GCS round trip)
+    meta = None
     if d.get("source_prefix"):
-        bucket, name, blob = _blob_from_prefix(d["source_prefix"], rel)
+        obj = await _stored_object(db, oid, rel)
+        bucket, name = object_for_path(d["source_prefix"], rel, obj)
+        blob = get_blob(bucket, name)
+        meta = _meta_from_object(obj, name)
     elif d.get("source_zip"):
-        bucket, name = _ensure_cached_zip_blob(d, rel)
+        bucket, name = await _ensure_cached_zip_blob(db, d, rel)
         blob = storage.Client().bucket(bucket).blob(name)
     else:
         raise HTTPException(400, "dataset has neither source_prefix nor source_zip")
 
-    if not blob.exists():
+    if meta is None:
+        meta = await run_in_threadpool(_live_meta, blob)
+        if meta is None:
+            raise HTTPException(404, "object not found in GCS")
+    return bucket, name, blob, meta
+
+async def _refresh_meta(oid: ObjectId, rel: str, blob, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """After a generation mismatch: stored metadata no longer matches the object
+    (rewritten outside the worker), so drop it and take one live reload."""
+    if not meta["stored"]:
+        raise HTTPException(404, "object not found in GCS")
+    tiered.invalidate(f"obj:{oid}:{rel}")
+    fresh = await run_in_threadpool(_live_meta, blob)
+    if fresh is None:
         raise HTTPException(404, "object not found in GCS")
+    return fresh
 
-    etag, updated, ctype, size = _gcs_meta(blob)
+async def _cached_bytes(bucket: str, name: str, blob, meta: Dict[str, Any]) -> bytes:
+    """Whole body of a small object through the in-process LRU → Redis → GCS tiers."""
+    def download() -> bytes:
+        with metrics.gcs("download"):
+            return blob.download_as_bytes(if_generation_match=meta["generation"])
+
+    return await tiered.get_bytes(
+        f"img:{bucket}:{name}:{meta['etag']}", lambda: run_in_threadpool(download), ttl=IMG_BYTES_TTL,
+    )
+
+async def _send_image(request: Request, bucket: str, name: str, blob, meta: Dict[str, Any]) -> Response:
+    """
+    304 / 416 / small cached body / streamed body for one object.
+    GCS reads are pinned to meta's generation, so stale metadata raises
+    PreconditionFailed before any byte is sent.
+    """
+    etag, updated, ctype, size, gen = meta["etag"], meta["updated"], meta["ctype"], meta["size"], meta["generation"]
 
     # client cache validation
     pre = _maybe_304(request, etag, updated)
     if pre:
         return pre
 
-    # server-side Redis cache for small images
-    cache_key = f"img:{bucket}:{name}:{etag}"
-    data: Optional[bytes] = None
+    # Range / If-Range (only honored while the validator still matches)
+    rng = None
+    if if_range_matches(request.headers.get("if-range"), etag, updated):
+        try:
+            rng = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    # server-side cache (in-process LRU → Redis) for small images
     if size and size <= IMG_BYTES_MAX:
-        data = await cache_get_bytes(cache_key)
-        if data is None:
-            data = blob.download_as_bytes()
-            await cache_set_bytes(cache_key, data, IMG_BYTES_TTL)
-    else:
-        data = blob.download_as_bytes()
+        data = await _cached_bytes(bucket, name, blob, meta)
+        if rng:
+            start, end = rng
+            resp = Response(content=data[start:end + 1], status_code=206)
+            _add_cache_headers(resp, etag=etag, updated=updated, ctype=ctype, size=end - start + 1)
+            resp.headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return resp
+        resp = Response(content=data)
+        _add_cache_headers(resp, etag=etag, updated=updated, ctype=ctype, size=len(data))
+        return resp
+
+    # large objects: stream straight from GCS, one chunk in memory at a time
+    start, end = rng or (0, size - 1)
+    body = await stream_blob(blob, start, end, generation=gen)
+    resp = StreamingResponse(body, status_code=206 if rng else 200)
+    _add_cache_headers(resp, etag=etag, updated=updated, ctype=ctype, size=end - start + 1)
+    if rng:
+        resp.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return resp
 
+# --------- variants: resized / transcoded copies, rendered once per (source etag, params) ---------
+
+_variant_uploads: set = set()
+
+async def _variant_bytes(bucket: str, name: str, blob, meta: Dict[str, Any], spec: Dict[str, Any]) -> bytes:
+    """
+    Variant body through LRU → Redis → stored GCS object → render. A fresh render is
+    written back under PREVIEW_PREFIX_BASE/variants/ in the background, so other
+    instances (and this one after Redis evicts it) never render it again.
+    """
+    vblob = get_blob(GCS_OVERRIDE or bucket, variants.object_name(PREVIEW_BASE, bucket, name, meta["etag"], spec))
+    ctype = variants.FORMATS[spec["fmt"]]
+
+    def stored() -> Optional[bytes]:
+        try:
+            with metrics.gcs("download"):
+                return vblob.download_as_bytes()
+        except NotFound:
+            return None
+
+    def source() -> bytes:
+        with metrics.gcs("download"):
+            return blob.download_as_bytes(if_generation_match=meta["generation"])
+
+    def store(data: bytes) -> None:
+        with metrics.gcs("upload"):
+            vblob.upload_from_string(data, content_type=ctype)
+
+    async def load() -> bytes:
+        data = await run_in_threadpool(stored)
+        if data is not None:
+            return data
+        if meta["size"] and meta["size"] <= IMG_BYTES_MAX:
+            src = await _cached_bytes(bucket, name, blob, meta)
+        else:
+            src = await run_in_threadpool(source)
+        data = await variants.render_async(src, spec)
+        task = asyncio.create_task(run_in_threadpool(store, data))
+        _variant_uploads.add(task)
+        task.add_done_callback(_variant_stored)
+        return data
+
+    return await tiered.get_bytes(variants.cache_key(bucket, name, meta["etag"], spec), load, ttl=VARIANT_TTL)
+
+def _variant_stored(task: asyncio.Task) -> None:
+    _variant_uploads.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("variant.store_failed", extra={"ctx_reason": type(task.exception()).__name__})
+
+async def _send_variant(request: Request, bucket: str, name: str, blob, meta: Dict[str, Any], spec: Dict[str, Any]) -> Response:
+    spec = variants.with_format(spec, meta["ctype"])
+    etag = variants.variant_etag(meta["etag"], spec)
+    pre = _maybe_304(request, etag, meta["updated"])
+    if pre:
+        return pre
+    if meta["size"] > variants.VARIANT_MAX_SOURCE:
+        raise HTTPException(413, "image too large to resize")
+    try:
+        data = await _variant_bytes(bucket, name, blob, meta, spec)
+    except variants.RenderError:
+        raise HTTPException(415, "image cannot be decoded")
+    except variants.RenderUnavailable:
+        raise HTTPException(503, "image resizing temporarily unavailable")
     resp = Response(content=data)
-    _add_cache_headers(resp, etag=etag, updated=updated, ctype=ctype, size=len(data))
+    _add_cache_headers(resp, etag=etag, updated=meta["updated"], ctype=variants.FORMATS[spec["fmt"]], size=len(data))
+    resp.headers["Accept-Ranges"] = "none"  # variants are small; always sent whole
     return resp
 
+# --------- BULK bytes: one multipart/mixed response for a whole grid page ---------
+
+class BulkImagesIn(BaseModel):
+    # explicit paths, or the same page spec as GET /images
+    paths: Optional[List[str]] = None
+    page: int = Field(1, ge=1)
+    page_size: int = Field(30, ge=1, le=200)
+    q: Optional[str] = None
+    after: Optional[str] = None
+    cls: Optional[List[int]] = None
+    min_boxes: Optional[int] = Field(None, ge=0)
+    max_boxes: Optional[int] = Field(None, ge=0)
+    min_area: Optional[float] = Field(None, ge=0, le=1)
+    max_area: Optional[float] = Field(None, ge=0, le=1)
+
+@router.post("/datasets/{dataset_id}/images/bulk")
+async def get_images_bulk(
+    dataset_id: str,
+    body: BulkImagesIn,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+):
+    """
+    Stream several images as multipart/mixed, parts in completion order.
+    Each part has X-Image-Path (percent-encoded), X-Image-Status, ETag and
+    Content-Type; a non-200 status part has an empty body (404 missing,
+    413 over IMAGE_BULK_ITEM_MAX or past the response byte budget) and the
+    client should fall back to GET /image for it.
+    """
+    try:
+        oid = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(404, "invalid id")
+    d = await load_dataset(db, oid)
+    if not d:
+        raise HTTPException(404, "dataset not found")
+
+    if body.paths is not None:
+        paths = list(dict.fromkeys(_norm(p) for p in body.paths if p))
+        if len(paths) > BULK_MAX_ITEMS:
+            raise HTTPException(400, f"at most {BULK_MAX_ITEMS} paths per request")
+    else:
+        match: Dict[str, Any] = {"dataset_id": oid}
+        if body.q:
+            match.update(search_filter(body.q))
+        match.update(summary_filter(
+            cls=body.cls, min_boxes=body.min_boxes, max_boxes=body.max_boxes,
+            min_area=body.min_area, max_area=body.max_area,
+        ))
+        docs, _ = await _keyset_page(
+            db.images, match, {"_id": 0, "image_path": 1},
+            page=body.page, page_size=min(body.page_size, BULK_MAX_ITEMS), after=body.after,
+        )
+        paths = [doc["image_path"] for doc in docs]
+
+    slots = asyncio.Semaphore(max(1, BULK_CONCURRENCY))
+    budget = BULK_MAX_BYTES
+
+    async def fetch(rel: str) -> Tuple[str, int, Optional[Dict[str, Any]], bytes]:
+        async with slots:
+            try:
+                bucket, name, blob, meta = await _resolve_image(db, oid, d, rel)
+                if meta["size"] > BULK_ITEM_MAX:
+                    return rel, 413, meta, b""
+                try:
+                    data = await _cached_bytes(bucket, name, blob, meta)
+                except (PreconditionFailed, NotFound):
+                    meta = await _refresh_meta(oid, rel, blob, meta)
+                    data = await _cached_bytes(bucket, name, blob, meta)
+                return rel, 200, meta, data
+            except HTTPException as e:
+                return rel, e.status_code, None, b""
+            except Exception as e:
+                log.warning("images.bulk.part_failed", extra={"ctx_path": rel, "ctx_reason": type(e).__name__})
+                return rel, 502, None, b""
+
+    boundary = multipart.new_boundary()
+
+    async def stream():
+        nonlocal budget
+        tasks = [asyncio.create_task(fetch(rel)) for rel in paths]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                rel, status, meta, data = await next_done
+                if status == 200 and len(data) > budget:
+                    status, data = 413, b""
+                budget -= len(data)
+                headers = {"X-Image-Path": quote(rel, safe="/"), "X-Image-Status": str(status)}
+                if meta:
+                    headers["Content-Type"] = meta["ctype"]
+                    headers["ETag"] = meta["etag"]
+                yield multipart.encode_part(boundary, headers, data)
+            yield multipart.closing(boundary)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(
+        stream(), media_type=multipart.content_type(boundary),
+        headers={"Cache-Control": "no-store", "X-Image-Count": str(len(paths))},
+    )
+
 # --------- SINGLE signed URL (with fallback) ---------
 
 @router.get("/datasets/{dataset_id}/image-url")
@@ -273,41 +649,44 @@ async def get_image_signed_url(
         oid = ObjectId(dataset_id)
     except Exception:
         raise HTTPException(404, "invalid id")
-    d = await db.datasets.find_one({"_id": oid})
+    d = await load_dataset(db, oid)
     if not d:
         raise HTTPException(404, "dataset not found")
 
     rel = _norm(path)
 
+    meta = None
     if d.get("source_prefix"):
-        bucket, prefix = parse_gs_uri(d["source_prefix"])
-        key_prefix = (prefix or "").rstrip("/")
-        name = f"{key_prefix}/{rel}" if key_prefix else rel
+        # resolved through the stored object in proxy mode too: `name` is reported either way
+        obj = await _stored_object(db, oid, rel)
+        bucket, name = object_for_path(d["source_prefix"], rel, obj)
+        meta = _meta_from_object(obj, name)
     elif d.get("source_zip"):
-        bucket, name = _ensure_cached_zip_blob(d, rel)
+        bucket, name = await _ensure_cached_zip_blob(db, d, rel)
     else:
         raise HTTPException(400, "dataset has neither source_prefix nor source_zip")
 
     # optional signing (or proxy)
     if SIGNED_URLS_MODE != "proxy":
-        blob = storage.Client().bucket(bucket).blob(name)
-        if not blob.exists():
-            raise HTTPException(404, "object not found in GCS")
-        etag, _, _, _ = _gcs_meta(blob)
+        if meta is None:
+            meta = await run_in_threadpool(_live_meta, storage.Client().bucket(bucket).blob(name))
+            if meta is None:
+                raise HTTPException(404, "object not found in GCS")
+        etag = meta["etag"]
 
         disp = _disp_for_download(as_download, rel, filename)
         disp_hash = _hash(disp or "")
         ttl_eff = max(60, ttl - URL_SAFETY)
         ckey = f"url:{bucket}:{name}:{etag}:{ttl}:{disp_hash}"
 
-        cached = await cache_get_json(ckey)
-        if cached and "url" in cached and "expires_at" in cached:
-            return cached
+        async def sign():
+            url, expires_at = await run_in_threadpool(_sign_url, bucket, name, ttl_s=ttl, disposition=disp)
+            if not url:
+                return None
+            return {"url": url, "expires_at": expires_at, "bucket": bucket, "name": name}
 
-        url, expires_at = _sign_url(bucket, name, ttl_s=ttl, disposition=disp)
-        if url:
-            payload = {"url": url, "expires_at": expires_at, "bucket": bucket, "name": name}
-            await cache_set_json(ckey, payload, ttl_eff)
+        payload = await tiered.get_json(ckey, sign, ttl=ttl_eff)
+        if payload:
             return payload
 
         # signing failed
@@ -325,73 +704,74 @@ async def get_image_signed_urls_batch(
     page: int = Query(1, ge=1),
     page_size: int = Query(30, ge=1, le=200),
     q: Optional[str] = Query(None, description="filename contains"),
+    after: Optional[str] = Query(None, description="opaque cursor (next_cursor of the previous page)"),
     ttl: int = Query(default=URL_DEFAULT_TTL, ge=60, le=60*60*24),
     as_download: bool = Query(False),
+    label_match: Dict[str, Any] = Depends(label_filters),
     db: AsyncIOMotorDatabase = Depends(get_db),
 ):
     """
     Returns signed (or proxy) URLs for all images on the requested page.
-    Response: { items: [{image_path, url, expires_at}], page, page_size, total }
+    Response: { items: [{image_path, url, expires_at}], page, page_size, total, next_cursor }
     """
     try:
         oid = ObjectId(dataset_id)
     except Exception:
         raise HTTPException(404, "invalid id")
-    d = await db.datasets.find_one({"_id": oid})
+    d = await load_dataset(db, oid)
     if not d:
         raise HTTPException(404, "dataset not found")
 
     # fetch the page of images (no labels by default for speed)
-    match: Dict[str, Any] = {"$or": [{"dataset_id": oid}, {"dataset_id": dataset_id}]}
+    match: Dict[str, Any] = {"dataset_id": oid}
     if q:
-        match["image_path"] = {"$regex": q, "$options": "i"}
-
-    total = await db.images.count_documents(match)
-    cursor = (
-        db.images
-        .find(match, {"_id": 0, "image_path": 1})
-        .sort("image_path", 1)
-        .skip((page - 1) * page_size)
-        .limit(page_size)
+        match.update(search_filter(q))
+    match.update(label_match)
+
+    total = await image_total(db, d, match)
+    docs, next_cursor = await _keyset_page(
+        db.images, match, {"_id": 0, "image_path": 1, "object": 1},
+        page=page, page_size=page_size, after=after,
     )
-    paths: List[str] = []
-    async for doc in cursor:
-        paths.append(doc["image_path"])
 
     client = storage.Client()
     disp_hash = _hash(_disp_for_download(as_download, "", None) or "")
     ttl_eff = max(60, ttl - URL_SAFETY)
 
-    async def sign_for(rel: str) -> Dict[str, Any]:
+    async def sign_for(doc: Dict[str, Any]) -> Dict[str, Any]:
+        rel = doc["image_path"]
         reln = _norm(rel)
+        meta = None
 
         # resolve bucket/name
         if d.get("source_prefix"):
-            bkt, prefix = parse_gs_uri(d["source_prefix"])
-            kp = (prefix or "").rstrip("/")
-            name = f"{kp}/{reln}" if kp else reln
-            bucket = bkt
+            bucket, name = object_for_path(d["source_prefix"], reln, doc.get("object"))
+            meta = _meta_from_object(doc.get("object"), name)
         elif d.get("source_zip"):
-            bucket, name = _ensure_cached_zip_blob(d, reln)
+            bucket, name = await _ensure_cached_zip_blob(db, d, reln)
         else:
             # shouldn't happen given earlier branch
             return {"image_path": rel, "url": _proxy_url(dataset_id, reln), "expires_at": None}
 
         # Signing path
         if SIGNED_URLS_MODE != "proxy":
-            blob = client.bucket(bucket).blob(name)
-            if blob.exists():
-                etag, _, _, _ = _gcs_meta(blob)
+            if meta is None:
+                meta = await run_in_threadpool(_live_meta, client.bucket(bucket).blob(name))
+            if meta is not None:
+                etag = meta["etag"]
                 ckey = f"url:{bucket}:{name}:{etag}:{ttl}:{disp_hash}"
-                cached = await cache_get_json(ckey)
-                if cached:
-                    return {"image_path": rel, **cached}
-
-                url, expires_at = _sign_url(bucket, name, ttl_s=ttl,
-                                            disposition=_disp_for_download(as_download, reln, None))
-                if url:
-                    payload = {"url": url, "expires_at": expires_at, "bucket": bucket, "name": name}
-                    await cache_set_json(ckey, payload, ttl_eff)
+
+                async def sign():
+                    url, expires_at = await run_in_threadpool(
+                        _sign_url, bucket, name, ttl_s=ttl,
+                        disposition=_disp_for_download(as_download, reln, None),
+                    )
+                    if not url:
+                        return None
+                    return {"url": url, "expires_at": expires_at, "bucket": bucket, "name": name}
+
+                payload = await tiered.get_json(ckey, sign, ttl=ttl_eff)
+                if payload:
                     return {"image_path": rel, **payload}
 
                 if SIGNED_URLS_MODE == "signed-only":
@@ -401,6 +781,8 @@ async def get_image_signed_urls_batch(
         return {"image_path": rel, "url": _proxy_url(dataset_id, reln), "expires_at": None}
 
     # Sequential is fine for <= 90 items; keeps GCS IAM signing pressure low
-    items = [await sign_for(p) for p in paths]
+    items = [await sign_for(doc) for doc in docs]
 
-    return {"items": items, "page": page, "page_size": page_size, "total": total}
+    return FastJSONResponse(
+        {"items": items, "page": page, "page_size": page_size, "total": total, "next_cursor": next_cursor}
+    )
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import List
-from ..services.uploads import start_resumable_session, new_object_name
+from typing import List, Optional
+from ..services.uploads import start_resumable_session, start_resumable_sessions, new_object_name, INIT_MAX_FILES
 from ..services.pubsub import publish_ingestion_message
 from ..config import settings
 router = APIRouter(prefix="/imports", tags=["imports"])
@@ -14,6 +15,7 @@ class ZipInitOut(BaseModel):
 class FileSpec(BaseModel): path: str; content_type: str
 class FolderInitIn(BaseModel):
     dataset_name: str; files: List[FileSpec]
+    prefix: Optional[str] = None  # continue a paged manifest: the prefix returned by the first page
 class BatchInitOut(BaseModel):
     prefix: str; items: List[dict]
 class CompleteIn(BaseModel):
@@ -23,18 +25,34 @@ class CompleteIn(BaseModel):
 async def initiate_zip_upload(body: ZipInitIn, request: Request):
     origin = request.headers.get("origin")
     object_name = new_object_name(body.dataset_name, body.filename)
-    upload_url = start_resumable_session(object_name, body.content_type, origin=origin)
+    upload_url = await run_in_threadpool(start_resumable_session, object_name, body.content_type, origin=origin)
     return {"upload_url": upload_url, "gcs_uri": f"gs://{settings.GCS_BUCKET}/{object_name}", "object_name": object_name}
 
+def _upload_prefix(body: FolderInitIn) -> str:
+    if not body.prefix:
+        return new_object_name(body.dataset_name)
+    root = f"gs://{settings.GCS_BUCKET}/uploads/{body.dataset_name}/"
+    rest = body.prefix[len(root):].strip("/") if body.prefix.startswith(root) else ""
+    if not rest or "/" in rest:
+        raise HTTPException(400, "prefix must be one returned by an earlier page for this dataset")
+    return f"uploads/{body.dataset_name}/{rest}"
+
 @router.post("/folder/initiate", response_model=BatchInitOut)
 async def initiate_folder_upload(body: FolderInitIn, request: Request):
+    """
+    Resumable session URLs for up to UPLOAD_INIT_MAX_FILES files, created concurrently.
+    Larger manifests are sent in pages: later pages pass the `prefix` of the first.
+    """
+    if len(body.files) > INIT_MAX_FILES:
+        raise HTTPException(413, f"at most {INIT_MAX_FILES} files per request; send the manifest in pages")
     origin = request.headers.get("origin")
-    prefix_object = new_object_name(body.dataset_name)
-    items = []
-    for f in body.files:
-        object_name = f"{prefix_object}/{f.path.lstrip('/')}"
-        upload_url = start_resumable_session(object_name, f.content_type, origin=origin)
-        items.append({"path": f.path, "upload_url": upload_url, "gcs_uri": f"gs://{settings.GCS_BUCKET}/{object_name}", "object_name": object_name})
+    prefix_object = _upload_prefix(body)
+    names = [f"{prefix_object}/{f.path.lstrip('/')}" for f in body.files]
+    urls = await start_resumable_sessions(
+        [{"object_name": n, "content_type": f.content_type} for n, f in zip(names, body.files)], origin=origin,
+    )
+    items = [{"path": f.path, "upload_url": u, "gcs_uri": f"gs://{settings.GCS_BUCKET}/{n}", "object_name": n}
+             for f, n, u in zip(body.files, names, urls)]
     return {"prefix": f"gs://{settings.GCS_BUCKET}/{prefix_object}/", "items": items}
 
 @router.post("/images/initiate", response_model=BatchInitOut)
@@ -43,5 +61,5 @@ async def initiate_images_upload(body: FolderInitIn, request: Request):
 
 @router.post("/complete")
 async def complete_import(body: CompleteIn):
-    msg_id = publish_ingestion_message({"dataset_name": body.dataset_name, "gcs_uri": body.gcs_uri, "format": "yolo"})
+    msg_id = await publish_ingestion_message({"dataset_name": body.dataset_name, "gcs_uri": body.gcs_uri, "format": "yolo"})
     return {"status": "queued", "message_id": msg_id}
@@ -3,39 +3,59 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-import json, os
-from google.cloud import pubsub_v1
+import os
+
+from ..services.pubsub import publish_ingestion_message, publish_many
 
 router = APIRouter(tags=["ingestion"])
 
+BULK_MAX = int(os.getenv("INGESTION_BULK_MAX", "500"))
+
 class IngestNow(BaseModel):
     dataset_name: str
     gcs_uri: Optional[str] = None
     gcs_uris: Optional[List[str]] = None
     format: str = "yolo"
+    size_bytes: Optional[int] = Field(default=None, ge=0)  # optional hint for dispatcher scheduling
 
-def _topic() -> str:
-    project = os.getenv("GCP_PROJECT_ID", "yolo-gcp-470119")
-    topic = os.getenv("INGESTION_TOPIC", "ingestion-tasks")
-    if not project:
-        raise HTTPException(500, "GCP_PROJECT_ID not set")
-    return f"projects/{project}/topics/{topic}"
+class IngestBulk(BaseModel):
+    items: List[IngestNow] = Field(min_length=1)
 
-@router.post("/ingestion/publish")
-async def ingestion_publish(body: IngestNow):
+def _message(body: IngestNow) -> Dict[str, Any]:
     if not body.gcs_uri and not body.gcs_uris:
-        raise HTTPException(400, "Provide gcs_uri or gcs_uris[]")
-
-    msg = {"dataset_name": body.dataset_name, "format": body.format}
+        raise HTTPException(400, f"Provide gcs_uri or gcs_uris[] for '{body.dataset_name}'")
+    msg: Dict[str, Any] = {"dataset_name": body.dataset_name, "format": body.format}
     if body.gcs_uris:
         msg["gcs_uris"] = body.gcs_uris
     else:
         msg["gcs_uri"] = body.gcs_uri
+    if body.size_bytes is not None:
+        msg["size_bytes"] = body.size_bytes
+    return msg
 
-    pub = pubsub_v1.PublisherClient()
+@router.post("/ingestion/publish")
+async def ingestion_publish(body: IngestNow):
+    msg = _message(body)
     try:
-        future = pub.publish(_topic(), data=json.dumps(msg).encode("utf-8"))
-        mid = future.result(timeout=30)
+        mid = await publish_ingestion_message(msg)
         return {"status": "ok", "message_id": mid}
     except Exception as e:
         raise HTTPException(500, f"Pub/Sub publish failed: {e}")
+
+@router.post("/ingestion/publish-bulk")
+async def ingestion_publish_bulk(body: IngestBulk):
+    """One message per item, published concurrently through the shared batching publisher."""
+    if len(body.items) > BULK_MAX:
+        raise HTTPException(413, f"at most {BULK_MAX} items per request")
+    msgs = [_message(item) for item in body.items]
+    try:
+        results = await publish_many(msgs)
+    except Exception as e:
+        raise HTTPException(500, f"Pub/Sub publish failed: {e}")
+    failed = sum(1 for r in results if "error" in r)
+    return {
+        "status": "ok" if not failed else "partial",
+        "published": len(results) - failed,
+        "failed": failed,
+        "items": [{"dataset_name": m["dataset_name"], **r} for m, r in zip(msgs, results)],
+    }
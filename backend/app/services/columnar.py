@@ -0,0 +1,202 @@
+"""
+Listing large datasets from the worker's columnar catalog instead of Mongo.
+
+Datasets of COLUMNAR_MIN_IMAGES+ images get an Arrow IPC file next to their
+run prefix (worker/job/columnar.py), recorded on the dataset doc:
+
+    "columnar": {"uri": "gs://.../images.arrow", "generation": 123, "rows": 2500000, "format": 1}
+
+The file is downloaded once per process into COLUMNAR_CACHE_DIR and memory-mapped
+(on Cloud Run the default temp dir is in-memory, so at most COLUMNAR_OPEN_MAX
+catalogs stay on disk and they count against the instance's memory limit);
+rows are sorted by image_path, so pages are slices and filters are vectorized
+scans over mapped columns. Only the rows of the page being returned are copied.
+
+    table = await columnar.load(d)      # None: serve from Mongo
+    items, total, next_cursor = columnar.page(table, oid, q=q, label_match=..., ...)
+
+The catalog is used only while it describes the dataset exactly: it is replaced
+or dropped together with each ingest's version bump, and its row count must equal
+the dataset's image_count. Needs the optional `pyarrow` package.
+"""
+from __future__ import annotations
+import glob, os, tempfile, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..cache import tiered
+from ..utils import parse_gs_uri, encode_cursor
+from .gcs import get_blob
+from .search import path_patterns
+from .. import metrics
+
+try:  # optional: `pip install pyarrow`
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+CACHE_DIR = os.getenv("COLUMNAR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "columnar"))
+OPEN_MAX  = int(os.getenv("COLUMNAR_OPEN_MAX", "8"))  # mapped catalogs kept open per process
+FORMAT    = 1
+BOX_FIELDS = ("class_id", "x_center", "y_center", "width", "height")
+
+_open: "OrderedDict[str, Any]" = OrderedDict()
+_open_lock = threading.Lock()
+
+def usable(d: Optional[dict]) -> Optional[Dict[str, Any]]:
+    """The dataset's catalog record, if it can serve this dataset's listing."""
+    info = (d or {}).get("columnar")
+    if pa is None or not info or info.get("format") != FORMAT:
+        return None
+    if info.get("rows") != d.get("image_count"):
+        return None  # images written outside the ingest that built the catalog
+    return info
+
+def _download(info: Dict[str, Any], path: str) -> None:
+    bucket, name = parse_gs_uri(info["uri"])
+    tmp = f"{path}.{os.getpid()}.part"
+    with metrics.gcs("download"):
+        get_blob(bucket, name).download_to_filename(tmp, if_generation_match=info["generation"])
+    os.replace(tmp, path)
+
+def _map(path: str):
+    # memory_map + read_all: record batches reference the mapping, nothing is copied
+    return ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def _open_table(key: str, info: Dict[str, Any]):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{key}.arrow")
+    if not os.path.exists(path):
+        _download(info, path)
+        # earlier generations of this dataset's catalog are dead weight now
+        oid = key.rsplit("-", 1)[0]
+        for old in glob.glob(os.path.join(CACHE_DIR, f"{oid}-*.arrow")):
+            if old != path:
+                try: os.remove(old)
+                except OSError: pass
+    return _map(path)
+
+async def load(d: Optional[dict]):
+    """Mapped catalog table for dataset doc `d`, or None to fall back to Mongo."""
+    info = usable(d)
+    if info is None:
+        return None
+    key = f"{d['_id']}-{info['generation']}"
+    with _open_lock:
+        table = _open.get(key)
+        if table is not None:
+            _open.move_to_end(key)
+            return table
+
+    table = await tiered.single_flight(f"columnar:{key}", lambda: run_in_threadpool(_open_table, key, info))
+    with _open_lock:
+        _open[key] = table
+        _open.move_to_end(key)
+        while len(_open) > OPEN_MAX:
+            evicted, _ = _open.popitem(last=False)
+            # the file is RAM on tmpfs; pages still holding the mapping keep it alive until they finish
+            try: os.remove(os.path.join(CACHE_DIR, f"{evicted}.arrow"))
+            except OSError: pass
+    return table
+
+def _and(mask, cond):
+    return cond if mask is None else pc.and_kleene(mask, cond)
+
+def _class_rows(table, cls: int):
+    """Ascending row indices of images containing class `cls` (class lists are distinct per row)."""
+    classes = table["classes"]
+    return pc.filter(pc.list_parent_indices(classes), pc.equal(pc.list_flatten(classes), cls))
+
+def select(table, *, q: Optional[str], label_match: Dict[str, Any]):
+    """
+    Ascending indices of rows matching a filename query and a summary_filter() dict,
+    or None for every row. Mirrors search_filter / summary_filter: images without
+    boxes never match an area bound.
+    """
+    m = None
+    for pattern in path_patterns(q or ""):
+        m = _and(m, pc.match_substring_regex(table["image_path"], pattern, ignore_case=True))
+    boxes = label_match.get("summary.box_count") or {}
+    if "$gte" in boxes:
+        m = _and(m, pc.greater_equal(table["box_count"], boxes["$gte"]))
+    if "$lte" in boxes:
+        m = _and(m, pc.less_equal(table["box_count"], boxes["$lte"]))
+    if "summary.min_area" in label_match:
+        m = _and(m, pc.greater_equal(table["min_area"], label_match["summary.min_area"]["$gte"]))
+    if "summary.max_area" in label_match:
+        m = _and(m, pc.less_equal(table["max_area"], label_match["summary.max_area"]["$lte"]))
+    if m is not None:
+        m = pc.fill_null(m, False)
+
+    idx = None
+    cls = label_match.get("summary.classes")
+    for c in ([cls] if isinstance(cls, int) else (cls or {}).get("$all", [])):
+        rows = _class_rows(table, c)
+        idx = rows if idx is None else pc.filter(idx, pc.is_in(idx, value_set=rows))
+    if idx is None:
+        return None if m is None else pc.cast(pc.indices_nonzero(m), pa.int64())
+    return idx if m is None else pc.filter(idx, pc.take(m, idx))
+
+def supports(label_match: Dict[str, Any]) -> bool:
+    return set(label_match) <= {"summary.classes", "summary.box_count", "summary.min_area", "summary.max_area"}
+
+def _first_after(paths, after: str, idx=None) -> int:
+    """Position of the first path > after, by binary search over the sorted mapping (through idx if given)."""
+    lo, hi = 0, len(paths) if idx is None else len(idx)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        row = mid if idx is None else idx[mid].as_py()
+        if paths[row].as_py() <= after:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def _item(row: Dict[str, Any], fields: List[str], dataset_id) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"image_path": row["image_path"]}
+    if "labels" in fields:
+        b = row["boxes"] or []
+        out["labels"] = [
+            {"class_id": int(b[i]), **dict(zip(BOX_FIELDS[1:], b[i + 1:i + 5]))} for i in range(0, len(b), 5)
+        ]
+    if "dataset_id" in fields:
+        out["dataset_id"] = dataset_id
+    if "summary" in fields:
+        out["summary"] = {k: row[k] for k in ("classes", "box_count", "min_area", "max_area")}
+    for k in ("width", "height"):
+        if k in fields and row[k] is not None:
+            out[k] = row[k]
+    return out
+
+def page(
+    table,
+    dataset_id,
+    *,
+    q: Optional[str],
+    label_match: Dict[str, Any],
+    fields: List[str],
+    page: int,
+    page_size: int,
+    after: Optional[str],
+) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+    """(items, total, next_cursor) with the semantics of the Mongo keyset listing."""
+    idx = select(table, q=q, label_match=label_match)
+    paths = table["image_path"]
+    start = _first_after(paths, after, idx) if after else (page - 1) * page_size
+    if idx is None:
+        total = table.num_rows
+        rows = table.slice(start, page_size + 1)  # zero-copy
+    else:
+        total = len(idx)
+        rows = table.take(idx.slice(start, page_size + 1))
+
+    docs = rows.select(["image_path", "boxes", "classes", "box_count", "min_area", "max_area", "width", "height"]).to_pylist()
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1]["image_path"])
+    return [_item(r, fields, dataset_id) for r in docs], total, next_cursor
@@ -0,0 +1,47 @@
+"""
+Totals for listing endpoints without a count_documents per request.
+
+Unfiltered image totals come from the counters the worker maintains on the
+dataset doc (image_count / labeled_count / class_counts), which also answer a
+single-class filter. Other filtered totals are counted once and cached in Redis
+for COUNT_CACHE_TTL seconds.
+"""
+from __future__ import annotations
+import os, json, hashlib
+from typing import Any, Dict, Optional
+
+from ..cache.redis_cache import get_json as cache_get_json, set_json as cache_set_json
+
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "60"))  # seconds; 0 disables caching
+
+async def cached_count(coll, match: Dict[str, Any], *, version: int = 0) -> int:
+    """
+    count_documents(match), cached per (collection, filter, version) for
+    COUNT_CACHE_TTL; a dataset version bump starts a fresh key.
+    """
+    if COUNT_CACHE_TTL <= 0:
+        return await coll.count_documents(match)
+    digest = hashlib.sha1(json.dumps(match, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    key = f"count:{coll.name}:v{version}:{digest}"
+    cached = await cache_get_json(key)
+    if cached and "n" in cached:
+        return int(cached["n"])
+    n = await coll.count_documents(match)
+    await cache_set_json(key, {"n": n}, COUNT_CACHE_TTL)
+    return n
+
+async def image_total(db, dataset_doc: Optional[dict], match: Dict[str, Any]) -> int:
+    """Total images matching `match` (which always pins dataset_id)."""
+    if dataset_doc and "image_count" in dataset_doc and set(match) == {"dataset_id"}:
+        return int(dataset_doc["image_count"])
+    # single-class filter: class_counts.<id> counts images containing the class
+    cls = match.get("summary.classes")
+    if dataset_doc and "class_counts" in dataset_doc and set(match) == {"dataset_id", "summary.classes"} \
+            and isinstance(cls, int):
+        return int(dataset_doc["class_counts"].get(str(cls), 0))
+    return await cached_count(db.images, match, version=int((dataset_doc or {}).get("version", 0)))
+
+async def dataset_total(db, match: Dict[str, Any], *, version: int = 0) -> int:
+    if not match:
+        return await db.datasets.estimated_document_count()
+    return await cached_count(db.datasets, match, version=version)
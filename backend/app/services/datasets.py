@@ -0,0 +1,30 @@
+from __future__ import annotations
+import os
+from typing import Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..cache import tiered
+
+DATASET_DOC_TTL = int(os.getenv("CACHE_DATASET_DOC_TTL", "5"))  # seconds; worker updates show up after this
+
+async def load_dataset(db: AsyncIOMotorDatabase, oid: ObjectId) -> Optional[dict]:
+    """
+    Dataset doc by id through the in-process cache (short TTL).
+    Returns a shallow copy so callers may decorate it for their response.
+    """
+    async def fetch():
+        return await db.datasets.find_one({"_id": oid})
+    doc = await tiered.get_local(f"ds:{oid}", fetch, ttl=DATASET_DOC_TTL, size=4096)
+    return dict(doc) if doc is not None else None
+
+async def datasets_version(db: AsyncIOMotorDatabase) -> int:
+    """Global version of the /datasets listing (bumped by the worker after each ingest)."""
+    async def fetch():
+        return await db.meta.find_one({"_id": "datasets"}) or {}
+    doc = await tiered.get_local("ds:version", fetch, ttl=DATASET_DOC_TTL, size=64)
+    return int(doc.get("version", 0))
+
+def dataset_version(dataset_doc: Optional[dict]) -> int:
+    return int((dataset_doc or {}).get("version", 0))
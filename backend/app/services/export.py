@@ -0,0 +1,178 @@
+"""
+Streaming archive writers and label serializers for dataset exports.
+
+The writers never hold more than the member currently being written: each
+call returns the archive bytes produced so far, which the caller forwards
+to the client straight away.
+
+  - ZipStream writes to an unseekable sink, so zipfile emits data descriptors
+    and members of unknown size (a COCO JSON being built) are fine.
+  - TarStream needs each member's size up front (ustar/PAX headers).
+"""
+from __future__ import annotations
+import io, json, os, tarfile, time, zipfile
+from tempfile import SpooledTemporaryFile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable buffer drained by the owner after each write."""
+    def __init__(self):
+        self._parts: List[bytes] = []
+    def writable(self) -> bool:
+        return True
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+    def drain(self) -> bytes:
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+class ZipStream:
+    def __init__(self):
+        self._sink = _Sink()
+        self._zf = zipfile.ZipFile(self._sink, "w")
+        self._member = None
+
+    def _info(self, name: str, compress: bool) -> zipfile.ZipInfo:
+        zi = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        zi.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        zi.external_attr = 0o644 << 16
+        return zi
+
+    def add(self, name: str, data: bytes, *, compress: bool = True) -> bytes:
+        self._zf.writestr(self._info(name, compress), data)
+        return self._sink.drain()
+
+    def start(self, name: str, size: Optional[int] = None, *, compress: bool = True) -> bytes:
+        self._member = self._zf.open(
+            self._info(name, compress), "w", force_zip64=size is None or size >= ZIP64_LIMIT,
+        )
+        return self._sink.drain()
+
+    def chunk(self, data: bytes) -> bytes:
+        self._member.write(data)
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        self._member.close()
+        self._member = None
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zf.close()
+        return self._sink.drain()
+
+class TarStream:
+    def __init__(self):
+        self._pad = 0
+
+    def _header(self, name: str, size: int) -> bytes:
+        ti = tarfile.TarInfo(name)
+        ti.size, ti.mode, ti.mtime = size, 0o644, int(time.time())
+        return ti.tobuf(format=tarfile.PAX_FORMAT)
+
+    def add(self, name: str, data: bytes, *, compress: bool = True) -> bytes:
+        return self._header(name, len(data)) + data + b"\0" * (-len(data) % tarfile.BLOCKSIZE)
+
+    def start(self, name: str, size: Optional[int] = None, *, compress: bool = True) -> bytes:
+        if size is None:
+            raise ValueError("tar members need a size up front")
+        self._pad = -size % tarfile.BLOCKSIZE
+        return self._header(name, size)
+
+    def chunk(self, data: bytes) -> bytes:
+        return data
+
+    def end(self) -> bytes:
+        pad, self._pad = self._pad, 0
+        return b"\0" * pad
+
+    def close(self) -> bytes:
+        return b"\0" * (2 * tarfile.BLOCKSIZE)
+
+# ------------ YOLO ------------
+
+def yolo_member_names(image_path: str) -> Tuple[str, str]:
+    """
+    (image, label) archive names for one image. Images go under `images/` (a path
+    that already starts with `images/` isn't nested again); the label path swaps the
+    last `images` segment for `labels`, which is where Ultralytics looks for it.
+    """
+    rel = (image_path or "").lstrip("/").replace("\\", "/")
+    if rel.startswith("images/"):
+        rel = rel[len("images/"):]
+    image = "images/" + rel
+    head, _, tail = ("/" + image).rpartition("/images/")
+    label = f"{head}/labels/{os.path.splitext(tail)[0]}.txt".lstrip("/")
+    return image, label
+
+def yolo_label_path(image_path: str) -> str:
+    return yolo_member_names(image_path)[1]
+
+def yolo_label_text(labels: List[Dict[str, Any]]) -> bytes:
+    lines = [
+        f"{int(l['class_id'])} {l['x_center']:.6f} {l['y_center']:.6f} {l['width']:.6f} {l['height']:.6f}\n"
+        for l in labels
+    ]
+    return "".join(lines).encode("utf-8")
+
+def yolo_data_yaml(class_ids: List[int]) -> bytes:
+    names = "".join(f"  {c}: '{c}'\n" for c in sorted(class_ids))
+    return f"path: .\ntrain: images\nval: images\nnames:\n{names}".encode("utf-8")
+
+# ------------ COCO ------------
+
+class CocoWriter:
+    """
+    COCO JSON built in one pass over the image cursor. `images` entries go
+    out as they come; `annotations` are spooled (memory, then disk past
+    SPOOL_BYTES) and appended once the pass is done, so ids stay consistent
+    without a second query.
+    """
+    SPOOL_BYTES = 8 * 1024 * 1024
+
+    def __init__(self):
+        self._anns = SpooledTemporaryFile(max_size=self.SPOOL_BYTES, mode="w+b")
+        self._n_images = self._n_anns = 0
+        self._classes: set[int] = set()
+        self.skipped = 0  # images without pixel dimensions: boxes can't be converted
+
+    def open(self) -> bytes:
+        return b'{"images":['
+
+    def image(self, doc: Dict[str, Any]) -> bytes:
+        self._n_images += 1
+        image_id = self._n_images
+        w, h = doc.get("width"), doc.get("height")
+        entry = {"id": image_id, "file_name": doc["image_path"], "width": w, "height": h}
+        labels = doc.get("labels") or []
+        if labels and not (w and h):
+            self.skipped += 1
+        elif labels:
+            for l in labels:
+                bw, bh = l["width"] * w, l["height"] * h
+                x, y = l["x_center"] * w - bw / 2, l["y_center"] * h - bh / 2
+                self._n_anns += 1
+                self._classes.add(int(l["class_id"]))
+                ann = {
+                    "id": self._n_anns, "image_id": image_id, "category_id": int(l["class_id"]),
+                    "bbox": [round(x, 2), round(y, 2), round(bw, 2), round(bh, 2)],
+                    "area": round(bw * bh, 2), "iscrowd": 0,
+                }
+                self._anns.write((b"," if self._n_anns > 1 else b"") + json.dumps(ann, separators=(",", ":")).encode())
+        return (b"," if image_id > 1 else b"") + json.dumps(entry, separators=(",", ":")).encode()
+
+    def close(self, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        yield b'],"annotations":['
+        self._anns.seek(0)
+        while True:
+            buf = self._anns.read(chunk_size)
+            if not buf:
+                break
+            yield buf
+        self._anns.close()
+        cats = [{"id": c, "name": str(c)} for c in sorted(self._classes)]
+        info = {"images": self._n_images, "annotations": self._n_anns, "skipped_images": self.skipped}
+        yield b'],"categories":' + json.dumps(cats).encode() + b',"info":' + json.dumps(info).encode() + b"}"
@@ -0,0 +1,59 @@
+"""
+Versioned cache for list responses.
+
+Every dataset carries a `version` the worker bumps at the end of an ingest
+(plus a global one in `meta/datasets` for the /datasets listing). The version
+is part of both the Redis key and the weak ETag of each list response, so a
+re-ingest invalidates every cached page at once, with no key scanning: old
+entries are never read again and simply expire.
+"""
+from __future__ import annotations
+import hashlib, json, os
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import Request, Response
+
+from ..cache import tiered
+from ..responses import dumps
+
+LIST_CACHE_TTL = int(os.getenv("CACHE_LIST_TTL", "300"))  # seconds; 0 = validators only, no body cache
+
+def version_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+def weak_etag(key: str) -> str:
+    return f'W/"{key}"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Weak comparison (RFC 9110 §13.1.2): W/ prefixes are ignored."""
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == tag for t in inm.split(","))
+
+def _with_validators(resp: Response, etag: str) -> Response:
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "no-cache"  # always revalidate; 304s are cheap
+    return resp
+
+async def respond(request: Request, key: str, build: Callable[[], Awaitable[Dict[str, Any]]]) -> Response:
+    """
+    304 when the client's ETag matches `key`, else the rendered body from the
+    local/Redis tiers (or build() on a miss). `key` must include the version.
+    """
+    etag = weak_etag(key)
+    if not_modified(request, etag):
+        return _with_validators(Response(status_code=304), etag)
+
+    async def render() -> bytes:
+        return dumps(await build())
+
+    if LIST_CACHE_TTL > 0:
+        body = await tiered.get_bytes(f"list:{key}", render, ttl=LIST_CACHE_TTL)
+    else:
+        body = await render()
+    return _with_validators(Response(content=body, media_type="application/json"), etag)
@@ -0,0 +1,22 @@
+"""
+Minimal multipart/mixed writer for streamed bulk responses.
+
+Every part carries its own Content-Length, so clients can split the stream
+without scanning bodies for the boundary.
+"""
+from __future__ import annotations
+import secrets
+from typing import Dict
+
+def new_boundary() -> str:
+    return "b" + secrets.token_hex(16)
+
+def content_type(boundary: str) -> str:
+    return f"multipart/mixed; boundary={boundary}"
+
+def encode_part(boundary: str, headers: Dict[str, str], body: bytes = b"") -> bytes:
+    head = "".join(f"{k}: {v}\r\n" for k, v in {**headers, "Content-Length": str(len(body))}.items())
+    return f"--{boundary}\r\n{head}\r\n".encode("latin-1") + body + b"\r\n"
+
+def closing(boundary: str) -> bytes:
+    return f"--{boundary}--\r\n".encode("latin-1")
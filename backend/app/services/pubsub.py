@@ -1,7 +1,23 @@
 # backend/app/services/pubsub.py
+"""
+One process-wide batching PublisherClient for ingestion messages.
+
+The client is created on first publish (so importing the app needs no
+credentials), batches messages from concurrent requests into few RPCs, and
+its futures are awaited through asyncio.wrap_future, so a publish never
+blocks the event loop.
+"""
 from google.cloud import pubsub_v1
 from ..config import settings
-import os, json
+from typing import Dict, List, Optional
+import asyncio, os, json, threading
+
+# Ingestion messages are a few hundred bytes: flush after a short delay or once a
+# batch is full, whichever comes first.
+BATCH_MAX_MESSAGES = int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES", "100"))
+BATCH_MAX_BYTES    = int(os.getenv("PUBSUB_BATCH_MAX_BYTES", str(1024 * 1024)))
+BATCH_MAX_LATENCY  = float(os.getenv("PUBSUB_BATCH_MAX_LATENCY", "0.01"))   # seconds
+PUBLISH_TIMEOUT    = float(os.getenv("PUBSUB_PUBLISH_TIMEOUT", "30"))
 
 def _resolve_project_id() -> str | None:
     # prefer explicit setting; then common env vars used by ADC
@@ -12,22 +28,38 @@ def _resolve_project_id() -> str | None:
         or os.getenv("GCLOUD_PROJECT")
     )
 
-PROJECT_ID = _resolve_project_id()
-TOPIC_NAME = getattr(settings, "PUBSUB_TOPIC", None) or os.getenv("PUBSUB_TOPIC") or "ingestion-tasks"
+TOPIC_NAME = os.getenv("INGESTION_TOPIC") or getattr(settings, "PUBSUB_TOPIC", None) or "ingestion-tasks"
 
-if not PROJECT_ID:
-    # Fail at import time with a clear message
-    raise RuntimeError("GCP Project ID not set. Set env GCP_PROJECT_ID (or GOOGLE_CLOUD_PROJECT / GCLOUD_PROJECT).")
+_publisher: Optional[pubsub_v1.PublisherClient] = None
+_topic_path: Optional[str] = None
+_lock = threading.Lock()
 
-_publisher = pubsub_v1.PublisherClient()
-_TOPIC_PATH = _publisher.topic_path(PROJECT_ID, TOPIC_NAME)
+def publisher() -> pubsub_v1.PublisherClient:
+    global _publisher, _topic_path
+    if _publisher is None:
+        with _lock:
+            if _publisher is None:
+                project = _resolve_project_id()
+                if not project:
+                    raise RuntimeError("GCP Project ID not set. Set env GCP_PROJECT_ID (or GOOGLE_CLOUD_PROJECT / GCLOUD_PROJECT).")
+                client = pubsub_v1.PublisherClient(batch_settings=pubsub_v1.types.BatchSettings(
+                    max_messages=BATCH_MAX_MESSAGES, max_bytes=BATCH_MAX_BYTES, max_latency=BATCH_MAX_LATENCY,
+                ))
+                _topic_path = client.topic_path(project, TOPIC_NAME)
+                _publisher = client
+    return _publisher
 
-def publish_ingestion_message(payload: dict, attributes: dict | None = None) -> str:
+async def publish_ingestion_message(payload: dict, attributes: dict | None = None) -> str:
     """
     Publish to Pub/Sub 'projects/<PROJECT_ID>/topics/<TOPIC_NAME>'.
     Returns the server-assigned message ID.
     """
+    client = publisher()
     data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
-    attrs = attributes or {}
-    future = _publisher.publish(_TOPIC_PATH, data=data, **attrs)
-    return future.result(timeout=30)
+    future = client.publish(_topic_path, data=data, **(attributes or {}))
+    return await asyncio.wait_for(asyncio.wrap_future(future), PUBLISH_TIMEOUT)
+
+async def publish_many(payloads: List[dict]) -> List[Dict[str, str]]:
+    """Publish all at once (they share batches); one {"message_id"} or {"error"} per payload, in order."""
+    results = await asyncio.gather(*(publish_ingestion_message(p) for p in payloads), return_exceptions=True)
+    return [{"error": f"{type(r).__name__}: {r}"} if isinstance(r, BaseException) else {"message_id": r} for r in results]
@@ -0,0 +1,74 @@
+"""
+Indexed filename search. The worker stores `search.{name,segments,grams}` on
+image docs (see worker/job/search.py); these helpers turn a user query into a
+filter that hits the (dataset_id, search.*) indexes instead of a collection scan.
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, List
+
+NGRAM = 3
+
+def ngrams(s: str, n: int = NGRAM) -> List[str]:
+    if len(s) <= n:
+        return [s] if s else []
+    return sorted({s[i:i + n] for i in range(len(s) - n + 1)})
+
+def search_keys(path: str) -> Dict[str, Any]:
+    p = (path or "").replace("\\", "/").lower()
+    segments = [s for s in p.split("/") if s]
+    name = segments[-1] if segments else ""
+    return {"name": name, "segments": segments, "grams": ngrams(name)}
+
+def search_filter(q: str, *, path_field: str = "image_path") -> Dict[str, Any]:
+    """
+    Build a Mongo filter for `q`:
+      - short queries (< NGRAM chars): prefix match on any path segment
+      - longer queries: all n-grams present in the basename (index), then an
+        exact substring check on the narrowed set; or prefix of a directory segment
+      - queries with '/': whole segments must be present, substring checked on the path
+    Returns {} for a blank query.
+    """
+    ql = (q or "").strip().lower().replace("\\", "/")
+    if not ql:
+        return {}
+    esc = re.escape(ql)
+
+    if "/" in ql:
+        parts = ql.split("/")
+        # segments that are bounded by '/' on both sides are complete
+        whole = [s for s in parts[1:-1] if s]
+        residual = {path_field: {"$regex": esc, "$options": "i"}}
+        if whole:
+            return {"search.segments": {"$all": whole}, **residual}
+        # one '/': the text after it starts a segment ("ab/cd": ^cd); with nothing
+        # after it, the text before it ends one ("ab/" also matches crab/x.jpg: ab$)
+        if parts[-1]:
+            return {"search.segments": {"$regex": f"^{re.escape(parts[-1])}"}, **residual}
+        return {"search.segments": {"$regex": f"{re.escape(parts[0])}$"}, **residual}
+
+    if len(ql) < NGRAM:
+        return {"search.segments": {"$regex": f"^{esc}"}}
+
+    return {
+        "$or": [
+            {"search.grams": {"$all": ngrams(ql)}, "search.name": {"$regex": esc}},
+            {"search.segments": {"$regex": f"^{esc}"}},
+        ]
+    }
+
+def path_patterns(q: str) -> List[str]:
+    """
+    Regexes over the (case-folded) image path that together match the same images
+    as search_filter(q), for scans without the search keys (columnar catalogs).
+    Every pattern must match; [] for a blank query.
+    """
+    ql = (q or "").strip().lower().replace("\\", "/")
+    if not ql:
+        return []
+    esc = re.escape(ql)
+    if "/" in ql:
+        return [esc]  # the substring implies search_filter's segment conditions
+    if len(ql) < NGRAM:
+        return [f"(^|/){esc}"]
+    return [f"(^|/){esc}|{esc}[^/]*$"]  # a segment starts with q, or the basename contains it
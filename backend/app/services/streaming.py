@@ -0,0 +1,121 @@
+"""
+Chunked GCS → client streaming with HTTP Range support.
+
+Each response holds at most one IMAGE_STREAM_CHUNK in memory. Chunk reads are
+bounded process-wide by IMAGE_STREAM_CONCURRENCY and, optionally, paced to
+IMAGE_STREAM_MAX_BPS so a burst of large downloads can't starve the instance.
+"""
+from __future__ import annotations
+import asyncio, os, time
+import email.utils as eut
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .. import metrics
+
+STREAM_CHUNK       = int(os.getenv("IMAGE_STREAM_CHUNK", str(1024 * 1024)))  # 1 MiB per GCS read
+STREAM_CONCURRENCY = int(os.getenv("IMAGE_STREAM_CONCURRENCY", "16"))        # in-flight chunk reads
+STREAM_MAX_BPS     = int(os.getenv("IMAGE_STREAM_MAX_BPS", "0"))             # 0 = unlimited
+
+_reads = asyncio.Semaphore(max(1, STREAM_CONCURRENCY))
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+class _Pacer:
+    """Virtual-clock leaky bucket shared by all streams."""
+    def __init__(self, bps: int):
+        self.bps = bps
+        self._next = 0.0
+    async def consume(self, n: int) -> None:
+        if self.bps <= 0:
+            return
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + n / self.bps
+        if start > now:
+            await asyncio.sleep(start - now)
+
+_pacer = _Pacer(STREAM_MAX_BPS)
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end).
+    Returns None when the whole body should be sent (no header, malformed, other
+    unit or multiple ranges); raises RangeNotSatisfiable when it starts past EOF.
+    """
+    if not header or size <= 0:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            n = int(last)
+            if n <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+def if_range_matches(if_range: Optional[str], etag: Optional[str], updated: Optional[datetime]) -> bool:
+    """If-Range: honor Range only when the validator still matches (strong compare)."""
+    if not if_range:
+        return True
+    v = if_range.strip()
+    if v.startswith("W/"):
+        return False
+    if etag and v == etag:
+        return True
+    try:
+        dt = eut.parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return False
+    return bool(updated and dt and int(updated.timestamp()) == int(dt.timestamp()))
+
+def _read_range(blob, start: int, end: int, generation: Optional[int]) -> bytes:
+    with metrics.gcs("download_range"):
+        return blob.download_as_bytes(start=start, end=end, if_generation_match=generation)
+
+async def iter_blob(blob, start: int, end: int, *, generation: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yield blob bytes [start, end] (inclusive) in STREAM_CHUNK pieces, pinned to `generation`."""
+    pos = start
+    while pos <= end:
+        stop = min(pos + STREAM_CHUNK - 1, end)
+        await _pacer.consume(stop - pos + 1)
+        async with _reads:
+            chunk = await run_in_threadpool(_read_range, blob, pos, stop, generation)
+        if not chunk:
+            break
+        yield chunk
+        pos += len(chunk)
+
+async def stream_blob(blob, start: int, end: int, *, generation: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Like iter_blob, but reads the first chunk up front so a missing object or a
+    generation mismatch raises here, before any response headers go out.
+    """
+    chunks = iter_blob(blob, start, end, generation=generation)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def body() -> AsyncIterator[bytes]:
+        if first:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    return body()
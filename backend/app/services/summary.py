@@ -0,0 +1,97 @@
+"""
+Label-aware image filters. The worker stores a per-image `summary`
+(see worker/job/parsing.py label_summary):
+
+    {"classes": [int, ...], "box_count": int, "min_area": float|None, "max_area": float|None}
+
+Areas are normalized box areas (width * height, 0..1). The filters below are
+served by ix_images_summary_classes (class equality, ordered by image_path)
+and ix_images_summary_ranges (range checks evaluated on index keys while
+walking dataset_id + image_path in keyset order).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+
+from fastapi import Query
+
+def summary_filter(
+    *,
+    cls: Optional[List[int]] = None,
+    min_boxes: Optional[int] = None,
+    max_boxes: Optional[int] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Mongo filter on `summary.*`:
+      - cls: image contains every listed class
+      - min_boxes / max_boxes: inclusive bounds on the number of boxes
+      - min_area: every box is at least this large (smallest box >= min_area)
+      - max_area: every box is at most this large (largest box <= max_area)
+    Images without boxes never match an area bound. Returns {} when unset.
+    """
+    f: Dict[str, Any] = {}
+    if cls:
+        classes = sorted(set(cls))
+        f["summary.classes"] = classes[0] if len(classes) == 1 else {"$all": classes}
+    boxes: Dict[str, Any] = {}
+    if min_boxes is not None:
+        boxes["$gte"] = min_boxes
+    if max_boxes is not None:
+        boxes["$lte"] = max_boxes
+    if boxes:
+        f["summary.box_count"] = boxes
+    if min_area is not None:
+        f["summary.min_area"] = {"$gte": min_area}
+    if max_area is not None:
+        f["summary.max_area"] = {"$lte": max_area}
+    return f
+
+def label_filters(
+    cls: Optional[List[int]] = Query(None, description="image contains every listed class id (repeatable)"),
+    min_boxes: Optional[int] = Query(None, ge=0),
+    max_boxes: Optional[int] = Query(None, ge=0),
+    min_area: Optional[float] = Query(None, ge=0, le=1, description="smallest box area >= (normalized w*h)"),
+    max_area: Optional[float] = Query(None, ge=0, le=1, description="largest box area <= (normalized w*h)"),
+) -> Dict[str, Any]:
+    """Query-string dependency for endpoints that list images."""
+    return summary_filter(cls=cls, min_boxes=min_boxes, max_boxes=max_boxes, min_area=min_area, max_area=max_area)
+
+# same result as label_summary(), as an update pipeline (migrations backfill)
+_LABELS = {"$ifNull": ["$labels", []]}
+_AREAS = {"$map": {"input": _LABELS, "in": {"$multiply": [
+    {"$ifNull": ["$$this.width", 0]}, {"$ifNull": ["$$this.height", 0]},
+]}}}
+SUMMARY_PIPELINE: List[Dict[str, Any]] = [{"$set": {"summary": {
+    "classes": {"$sortArray": {
+        "input": {"$setUnion": [{"$filter": {
+            "input": {"$ifNull": ["$labels.class_id", []]}, "cond": {"$ne": ["$$this", None]},
+        }}, []]},
+        "sortBy": 1,
+    }},
+    "box_count": {"$size": _LABELS},
+    "min_area": {"$min": _AREAS},
+    "max_area": {"$max": _AREAS},
+}}}]
+
+def dataset_counts_pipeline(oid) -> List[Dict[str, Any]]:
+    """
+    Aggregation over one dataset's images giving image_count, labeled_count and
+    per-class image counts. Null class ids are dropped, as in the worker's
+    incremental counters. The worker image can't import this module, so it
+    carries the same pipeline as mongo_io.counts_pipeline (tests compare them).
+    """
+    return [
+        {"$match": {"dataset_id": oid}},
+        {"$project": {"classes": {"$setUnion": [{"$filter": {
+            "input": {"$ifNull": ["$labels.class_id", []]}, "cond": {"$ne": ["$$this", None]},
+        }}, []]}}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "image_count": {"$sum": 1},
+                "labeled_count": {"$sum": {"$cond": [{"$gt": [{"$size": "$classes"}, 0]}, 1, 0]}},
+            }}],
+            "classes": [{"$unwind": "$classes"}, {"$group": {"_id": "$classes", "n": {"$sum": 1}}}],
+        }},
+    ]
@@ -1,9 +1,30 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from google.cloud import storage
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from ..config import settings
 from uuid import uuid4
+import asyncio, os, threading
+
+# Resumable sessions are one GCS round trip each; a folder's sessions are created
+# this many at a time, on one shared client whose connection pool matches.
+INIT_CONCURRENCY = int(os.getenv("UPLOAD_INIT_CONCURRENCY", "32"))
+INIT_MAX_FILES   = int(os.getenv("UPLOAD_INIT_MAX_FILES", "1000"))   # files per initiate call (page)
+
+_client_obj: Optional[storage.Client] = None
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=INIT_CONCURRENCY, thread_name_prefix="upload-init")
+
 def _client() -> storage.Client:
-    return storage.Client(project=settings.GCP_PROJECT_ID)
+    global _client_obj
+    if _client_obj is None:
+        with _lock:
+            if _client_obj is None:
+                client = storage.Client(project=settings.GCP_PROJECT_ID)
+                adapter = HTTPAdapter(pool_connections=INIT_CONCURRENCY, pool_maxsize=INIT_CONCURRENCY)
+                client._http.mount("https://", adapter)
+                _client_obj = client
+    return _client_obj
 def _bucket():
     return _client().bucket(settings.GCS_BUCKET)
 def new_object_name(dataset_name: str, relpath: str | None = None) -> str:
@@ -12,3 +33,11 @@ def new_object_name(dataset_name: str, relpath: str | None = None) -> str:
 def start_resumable_session(object_name: str, content_type: str, origin: Optional[str] = None) -> str:
     blob = _bucket().blob(object_name)
     return blob.create_resumable_upload_session(content_type=content_type, origin=origin)
+
+async def start_resumable_sessions(specs: List[Dict[str, str]], origin: Optional[str] = None) -> List[str]:
+    """Session URLs for [{"object_name", "content_type"}], in order; at most INIT_CONCURRENCY in flight."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_pool, start_resumable_session, s["object_name"], s["content_type"], origin)
+        for s in specs
+    ))
@@ -0,0 +1,132 @@
+"""
+Derived image variants (resize / transcode) rendered in a process pool.
+
+    spec = parse_spec(width=256, height=None, fmt="webp", quality=None)
+    data = await render_async(original_bytes, with_format(spec, "image/png"))
+
+Rendering is CPU-bound Pillow work, so it runs in a small spawn-started
+ProcessPoolExecutor (this module keeps its imports light for that reason); at
+most VARIANT_WORKERS * 2 renders are queued or running per API process.
+Caching (local LRU → Redis → GCS object) is the caller's job; `cache_key` and
+`object_name` give stable names derived from the source etag and the spec.
+"""
+from __future__ import annotations
+import asyncio, hashlib, io, multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+VARIANT_MAX_DIM     = int(os.getenv("VARIANT_MAX_DIM", "2048"))
+VARIANT_MAX_SOURCE  = int(os.getenv("VARIANT_MAX_SOURCE_BYTES", str(50 * 1024 * 1024)))
+VARIANT_WORKERS     = int(os.getenv("VARIANT_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_QUALITY     = int(os.getenv("VARIANT_QUALITY", "80"))
+
+FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+_PIL_FORMAT = {"jpeg": "JPEG", "webp": "WEBP", "png": "PNG"}
+
+class RenderError(Exception):
+    """The source isn't an image Pillow can decode (or is too large to decode safely)."""
+
+class RenderUnavailable(Exception):
+    """The render pool died under this call (a worker crashed or was OOM-killed); it is replaced for the next one."""
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+def parse_spec(*, width: Optional[int], height: Optional[int], fmt: Optional[str], quality: Optional[int]) -> Optional[Dict]:
+    """Normalized variant spec, or None when the request asks for the original. Raises ValueError."""
+    if width is None and height is None and fmt is None and quality is None:
+        return None
+    for v in (width, height):
+        if v is not None and not 1 <= v <= VARIANT_MAX_DIM:
+            raise ValueError(f"width/height must be 1..{VARIANT_MAX_DIM}")
+    if fmt is not None:
+        fmt = fmt.lower().replace("jpg", "jpeg")
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError("quality must be 1..100")
+    return {
+        "w": width or VARIANT_MAX_DIM,
+        "h": height or VARIANT_MAX_DIM,
+        "fmt": fmt,  # None until with_format(): keep the source format
+        "q": quality or DEFAULT_QUALITY,
+    }
+
+def with_format(spec: Dict, src_ctype: str) -> Dict:
+    """
+    Pin the output format: the requested one, else the source's if we can encode it, else webp.
+    PNG is lossless, so its quality is dropped and doesn't split cache keys or stored objects.
+    """
+    fmt = spec["fmt"]
+    if not fmt:
+        src = next((f for f, ct in FORMATS.items() if ct == (src_ctype or "").split(";")[0].strip()), None)
+        fmt = src or "webp"
+    return {**spec, "fmt": fmt, "q": None if fmt == "png" else spec["q"]}
+
+def spec_tag(spec: Dict) -> str:
+    q = "" if spec["q"] is None else f"-q{spec['q']}"
+    return f"{spec['w']}x{spec['h']}{q}.{spec['fmt']}"
+
+def cache_key(bucket: str, name: str, etag: str, spec: Dict) -> str:
+    return f"var:{bucket}:{name}:{etag}:{spec_tag(spec)}"
+
+def object_name(base: str, bucket: str, name: str, etag: str, spec: Dict) -> str:
+    digest = hashlib.sha1(f"{bucket}/{name}\0{etag}".encode()).hexdigest()
+    return f"{base}/variants/{digest[:2]}/{digest}-{spec_tag(spec)}"
+
+def variant_etag(etag: str, spec: Dict) -> str:
+    return '"' + hashlib.sha1(f"{etag}\0{spec_tag(spec)}".encode()).hexdigest() + '"'
+
+def render(data: bytes, w: int, h: int, fmt: str, quality: int) -> bytes:
+    """Fit within w×h (never upscale) and encode as `fmt`. Runs in a pool process."""
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            if im.format == "JPEG":
+                im.draft("RGB", (w, h))  # decode at a reduced scale when possible
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((w, h), Image.Resampling.LANCZOS)
+            if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            elif im.mode not in ("RGB", "RGBA", "L", "LA"):
+                im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+            buf = io.BytesIO()
+            opts = {"quality": quality} if fmt in ("jpeg", "webp") else {"optimize": True}
+            im.save(buf, _PIL_FORMAT[fmt], **opts)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise RenderError(f"{type(e).__name__}: {e}") from None
+    return buf.getvalue()
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=VARIANT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def _discard(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def render_async(data: bytes, spec: Dict) -> bytes:
+    """render() in the pool. Raises RenderError, or RenderUnavailable if the pool broke."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(VARIANT_WORKERS * 2)
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        pool = _executor()
+        try:
+            return await loop.run_in_executor(pool, render, data, spec["w"], spec["h"], spec["fmt"], spec["q"])
+        except BrokenProcessPool as e:
+            # a broken executor fails every later submit; start a fresh one on the next call
+            _discard(pool)
+            raise RenderUnavailable(str(e)) from None
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
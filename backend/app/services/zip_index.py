@@ -0,0 +1,175 @@
+"""
+Central-directory index for ZIP-backed datasets.
+
+The first request for a ZIP dataset reads only the archive's central directory
+(a couple of ranged GCS reads) and records every member's local-header offset,
+compressed size and method in `zip_members`. After that a single member is one
+ranged read plus decompression, instead of downloading the whole archive.
+"""
+from __future__ import annotations
+import asyncio, bz2, re, struct, zipfile, zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+from google.api_core.exceptions import PreconditionFailed
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from .. import metrics
+
+READ_CHUNK = 256 * 1024       # BlobReader buffer while scanning the central directory
+EXTRA_SLACK = 1024            # guess for the local extra field so most members are one read
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")  # zipfile.structFileHeader
+_SUPPORTED = {zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2}
+
+_locks: Dict[str, list] = {}  # dataset -> [lock, callers]; dropped when the last caller leaves
+
+class UnsupportedMember(Exception):
+    """Member can't be served from a ranged read (encrypted, LZMA, ...)."""
+
+def _norm(p: str) -> str:
+    return (p or "").lstrip("/").replace("\\", "/")
+
+def scan_central_directory(zblob) -> List[Dict[str, Any]]:
+    """Read the central directory via ranged reads; returns one entry per file member."""
+    entries: Dict[str, Dict[str, Any]] = {}
+    with zblob.open("rb", chunk_size=READ_CHUNK) as fh:
+        with zipfile.ZipFile(fh) as zf:
+            for zi in zf.infolist():
+                if zi.is_dir():
+                    continue
+                # duplicate names: the last one wins, as in ZipFile.read()
+                entries[_norm(zi.filename)] = {
+                    "path": _norm(zi.filename),
+                    "name": zi.filename,
+                    "offset": zi.header_offset,
+                    "csize": zi.compress_size,
+                    "size": zi.file_size,
+                    "method": zi.compress_type,
+                    "crc": zi.CRC,
+                    "encrypted": bool(zi.flag_bits & 0x1),
+                }
+    return list(entries.values())
+
+def read_member(zblob, entry: Dict[str, Any], *, generation: Optional[int]) -> bytes:
+    """
+    Fetch and decompress one member with a ranged read pinned to `generation`.
+    Raises PreconditionFailed if the archive changed since it was indexed.
+    """
+    if entry.get("encrypted") or entry["method"] not in _SUPPORTED:
+        raise UnsupportedMember(entry["path"])
+
+    offset, csize = entry["offset"], entry["csize"]
+    guess = _LOCAL_HEADER.size + len(entry["name"].encode("utf-8")) + EXTRA_SLACK + csize
+    with metrics.gcs("download_range"):
+        buf = zblob.download_as_bytes(start=offset, end=offset + guess - 1, if_generation_match=generation)
+
+    fields = _LOCAL_HEADER.unpack(buf[:_LOCAL_HEADER.size])
+    if fields[0] != zipfile.stringFileHeader:
+        raise UnsupportedMember(f"bad local header for {entry['path']}")
+    data_start = _LOCAL_HEADER.size + fields[10] + fields[11]  # name length + extra length
+    if data_start + csize > len(buf):
+        with metrics.gcs("download_range"):
+            buf = zblob.download_as_bytes(
+                start=offset, end=offset + data_start + csize - 1, if_generation_match=generation,
+            )
+    raw = buf[data_start:data_start + csize]
+
+    if entry["method"] == zipfile.ZIP_STORED:
+        data = raw
+    elif entry["method"] == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(raw, -15)
+    else:
+        data = bz2.decompress(raw)
+    if zlib.crc32(data) & 0xFFFFFFFF != entry["crc"]:
+        raise UnsupportedMember(f"CRC mismatch for {entry['path']}")
+    return data
+
+async def _upsert_members(db: AsyncIOMotorDatabase, ops: List[ReplaceOne]) -> None:
+    try:
+        await db.zip_members.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # concurrent upserts of one new key: the loser hits the unique index. Another
+        # instance is indexing the same archive, so retry those members as plain replaces.
+        errors = e.details.get("writeErrors", [])
+        if not errors or any(err.get("code") != 11000 for err in errors):
+            raise
+        await db.zip_members.bulk_write([ops[err["index"]] for err in errors], ordered=False)
+
+async def ensure_index(db: AsyncIOMotorDatabase, dataset_id: str, zblob, *, rebuild: bool = False) -> dict:
+    """
+    Return the dataset's zip_index marker, building it on first use.
+    One build per dataset at a time in this process; concurrent callers wait for it.
+    Other instances may build the same index concurrently: members are upserted by
+    (dataset_id, path) and tagged with the archive generation, and only members of
+    other generations are deleted afterwards, so the builds converge.
+    """
+    oid = ObjectId(dataset_id)
+    entry = _locks.setdefault(dataset_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            return await _build(db, oid, zblob, rebuild)
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _locks[dataset_id]
+
+async def _build(db: AsyncIOMotorDatabase, oid: ObjectId, zblob, rebuild: bool) -> dict:
+    d = await db.datasets.find_one({"_id": oid}, {"zip_index": 1})
+    marker = (d or {}).get("zip_index")
+    if marker and not rebuild:
+        return marker
+
+    def scan():
+        with metrics.gcs("reload"):
+            zblob.reload()
+        with metrics.gcs("scan"):
+            return zblob.generation, scan_central_directory(zblob)
+
+    generation, entries = await run_in_threadpool(scan)
+    if marker and marker.get("generation") == generation:
+        return marker  # another caller already indexed this archive
+    for i in range(0, len(entries), 1000):
+        await _upsert_members(db, [
+            ReplaceOne({"dataset_id": oid, "path": e["path"]}, {"dataset_id": oid, "generation": generation, **e}, upsert=True)
+            for e in entries[i:i + 1000]
+        ])
+    await db.zip_members.delete_many({"dataset_id": oid, "generation": {"$ne": generation}})
+    marker = {"generation": generation, "members": len(entries), "built_at": datetime.now(timezone.utc)}
+    await db.datasets.update_one({"_id": oid}, {"$set": {"zip_index": marker}})
+    return marker
+
+async def find_member(db: AsyncIOMotorDatabase, dataset_id: str, rel_path: str) -> Optional[Dict[str, Any]]:
+    """Exact member path first, then the shortest member whose path ends with rel_path."""
+    oid = ObjectId(dataset_id)
+    rel = _norm(rel_path)
+    hit = await db.zip_members.find_one({"dataset_id": oid, "path": rel})
+    if hit:
+        return hit
+    cands = await db.zip_members.find(
+        {"dataset_id": oid, "path": {"$regex": re.escape(rel) + "$"}}
+    ).to_list(length=50)
+    return min(cands, key=lambda e: len(e["path"])) if cands else None
+
+async def extract(db: AsyncIOMotorDatabase, dataset_id: str, zblob, rel_path: str) -> Optional[tuple[str, bytes]]:
+    """
+    (member_path, bytes) for rel_path, or None when it isn't in the archive.
+    Rebuilds the index once if the archive was replaced since it was indexed.
+    """
+    marker = await ensure_index(db, dataset_id, zblob)
+    for attempt in range(2):
+        entry = await find_member(db, dataset_id, rel_path)
+        if entry is None:
+            return None
+        try:
+            data = await run_in_threadpool(read_member, zblob, entry, generation=marker.get("generation"))
+            return entry["path"], data
+        except PreconditionFailed:
+            if attempt:
+                raise
+            marker = await ensure_index(db, dataset_id, zblob, rebuild=True)
+    return None
@@ -0,0 +1,140 @@
+"""
+One-pass background materialization of ZIP previews.
+
+The first request for a ZIP-backed dataset claims a lease on the dataset doc
+(`preview.state = running`) and starts a task that walks the archive once in
+header-offset order (sequential, large buffered reads) and uploads every member
+to `<PREVIEW_PREFIX_BASE>/<dataset_id>/<path>` with bounded parallelism.
+Progress lands on the dataset doc and per member (`zip_members.preview`), so the
+hot path can tell from Mongo whether a preview exists instead of asking GCS.
+
+Runs inside the API process: on Cloud Run this needs CPU allocated outside
+requests, otherwise the task only progresses while requests are in flight.
+"""
+from __future__ import annotations
+import asyncio, logging, mimetypes, os, zipfile, zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Set
+
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from . import zip_index
+from .. import metrics
+
+PREVIEW_WORKERS  = int(os.getenv("ZIP_PREVIEW_WORKERS", "8"))                 # parallel uploads
+PREVIEW_LEASE_S  = int(os.getenv("ZIP_PREVIEW_LEASE", "600"))                 # stale 'running' is retaken
+PREVIEW_RETRY_S  = int(os.getenv("ZIP_PREVIEW_RETRY", "900"))                 # 'failed' is retaken after this
+PREVIEW_READ_BUF = int(os.getenv("ZIP_PREVIEW_READ_BUF", str(8 * 1024 * 1024)))
+PROGRESS_EVERY   = 200
+
+log = logging.getLogger(__name__)
+_tasks: Set[asyncio.Task] = set()
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def is_done(dataset_doc: dict) -> bool:
+    return (dataset_doc.get("preview") or {}).get("state") == "done"
+
+async def maybe_start(db: AsyncIOMotorDatabase, dataset_doc: dict, zblob, cache_bucket, cache_prefix: str) -> bool:
+    """Claim the dataset and start materializing in the background. False if already done/running."""
+    if is_done(dataset_doc):
+        return False
+    oid = dataset_doc["_id"]
+    now = _utcnow()
+    claimed = await db.datasets.find_one_and_update(
+        {
+            "_id": oid,
+            "$or": [
+                {"preview.state": {"$exists": False}},
+                {"preview.state": "failed", "preview.failed_at": {"$lt": now - timedelta(seconds=PREVIEW_RETRY_S)}},
+                {"preview.state": "running", "preview.heartbeat_at": {"$lt": now - timedelta(seconds=PREVIEW_LEASE_S)}},
+            ],
+        },
+        {"$set": {"preview": {"state": "running", "done": 0, "started_at": now, "heartbeat_at": now}}},
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not claimed:
+        return False
+    task = asyncio.create_task(_materialize(db, str(oid), zblob, cache_bucket, cache_prefix))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+async def _materialize(db: AsyncIOMotorDatabase, dataset_id: str, zblob, cache_bucket, cache_prefix: str) -> None:
+    oid = ObjectId(dataset_id)
+    try:
+        marker = await zip_index.ensure_index(db, dataset_id, zblob)
+        members: List[Dict[str, Any]] = await db.zip_members.find(
+            {"dataset_id": oid, "preview": {"$ne": True}}, {"path": 1, "name": 1, "offset": 1},
+        ).sort("offset", 1).to_list(length=None)
+        await db.datasets.update_one({"_id": oid}, {"$set": {"preview.total": marker.get("members", len(members))}})
+
+        fh = await run_in_threadpool(zblob.open, "rb", chunk_size=PREVIEW_READ_BUF)
+        zf = await run_in_threadpool(zipfile.ZipFile, fh)
+        slots = asyncio.Semaphore(PREVIEW_WORKERS)
+        pending: List[str] = []
+        uploads: List[asyncio.Task] = []
+        done = skipped = 0
+
+        async def upload(path: str, data: bytes):
+            try:
+                ctype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                blob = cache_bucket.blob(f"{cache_prefix}/{path}")
+                with metrics.gcs("upload"):
+                    await run_in_threadpool(blob.upload_from_string, data, content_type=ctype)
+                pending.append(path)
+            finally:
+                slots.release()
+
+        async def flush():
+            nonlocal done
+            batch, pending[:] = pending[:], []
+            if not batch:
+                return
+            done += len(batch)
+            await db.zip_members.update_many({"dataset_id": oid, "path": {"$in": batch}}, {"$set": {"preview": True}})
+            await db.datasets.update_one({"_id": oid}, {"$set": {"preview.done": done, "preview.heartbeat_at": _utcnow()}})
+
+        try:
+            # read sequentially (offset order keeps the BlobReader buffer hot); upload in parallel
+            for m in members:
+                await slots.acquire()
+                try:
+                    data = await run_in_threadpool(zf.read, m["name"])
+                except (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error) as e:
+                    # encrypted / unsupported / corrupt member: leave it to the per-request path
+                    slots.release()
+                    skipped += 1
+                    log.warning("zip_previews.member_skipped",
+                                extra={"ctx_dataset_id": dataset_id, "ctx_path": m["path"], "ctx_reason": type(e).__name__})
+                    continue
+                uploads.append(asyncio.create_task(upload(m["path"], data)))
+                if len(pending) >= PROGRESS_EVERY:
+                    await flush()
+            results = await asyncio.gather(*uploads, return_exceptions=True)
+            await flush()
+        finally:
+            for t in uploads:
+                t.cancel()
+            await run_in_threadpool(zf.close)
+            await run_in_threadpool(fh.close)
+
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if failed:
+            # uploaded members are flagged already; the retried pass only redoes the rest
+            raise RuntimeError(f"{len(failed)} preview uploads failed (first: {type(failed[0]).__name__}: {failed[0]})")
+
+        await db.datasets.update_one(
+            {"_id": oid}, {"$set": {"preview.state": "done", "preview.finished_at": _utcnow()}},
+        )
+        log.info("zip_previews.done", extra={"ctx_dataset_id": dataset_id, "ctx_count": done, "ctx_skipped": skipped})
+    except Exception as e:
+        log.exception("zip_previews.failed", extra={"ctx_dataset_id": dataset_id, "ctx_reason": type(e).__name__})
+        await db.datasets.update_one({"_id": oid}, {"$set": {
+            "preview.state": "failed", "preview.failed_at": _utcnow(), "preview.error": str(e)[:500],
+        }})
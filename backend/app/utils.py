@@ -1,7 +1,32 @@
-from typing import Tuple
+from typing import Optional, Tuple
+import base64, binascii
 def parse_gs_uri(gcs_uri: str) -> Tuple[str, str]:
     assert gcs_uri.startswith("gs://"), "must be gs://"
     path = gcs_uri[len("gs://"):]
     if "/" in path: bucket, key = path.split("/", 1)
     else: bucket, key = path, ""
     return bucket, key
+
+def object_for_path(prefix_uri: str, rel_path: str, obj: Optional[dict] = None) -> Tuple[str, str]:
+    """
+    (bucket, object name) of a file in a prefix dataset. Content-addressed ingests
+    record the cas/ object (with its sha256) on the image doc; otherwise the file
+    sits at <prefix>/<rel_path>.
+    """
+    bucket, key_prefix = parse_gs_uri(prefix_uri)
+    if obj and obj.get("sha256") and obj.get("name"):
+        return bucket, obj["name"]
+    key_prefix = (key_prefix or "").rstrip("/")
+    return bucket, f"{key_prefix}/{rel_path}" if key_prefix else rel_path
+
+def encode_cursor(value: str) -> str:
+    """Opaque, URL-safe keyset cursor for the last value of a page."""
+    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> str:
+    """Inverse of encode_cursor; raises ValueError on garbage."""
+    try:
+        pad = "=" * (-len(token) % 4)
+        return base64.b64decode(token + pad, altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
@@ -0,0 +1,81 @@
+"""
+Encode time and payload size of a GET /datasets/{id}/images page, before/after:
+
+  baseline   dict returned from the route -> jsonable_encoder + JSONResponse
+  fast       FastJSONResponse (orjson, no jsonable_encoder)
+  fields     fast + fields=labels (no dataset_id)
+
+plus the compressed size of each body (gzip, and brotli if installed).
+
+    cd backend && python -m benchmarks.bench_listing --items 200 --boxes 40
+"""
+from __future__ import annotations
+import argparse, random, statistics, time
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.responses import FastJSONResponse, brotli, compress
+
+def make_page(items: int, boxes: int) -> dict:
+    rnd = random.Random(0)
+    ds = ObjectId()
+    docs = [{
+        "image_path": f"images/train/{i:06d}.jpg",
+        "dataset_id": ds,
+        "labels": [{
+            "class_id": rnd.randrange(80),
+            "x_center": rnd.random(), "y_center": rnd.random(),
+            "width": rnd.random() / 4, "height": rnd.random() / 4,
+        } for _ in range(boxes)],
+    } for i in range(items)]
+    return {"items": docs, "page": 1, "page_size": items, "total": 10**6, "next_cursor": "aW1hZ2Vz",
+            "generated_at": datetime.utcnow()}
+
+def baseline_items(page: dict) -> dict:
+    # what the route did before: stringify dataset_id per doc, then return the dict
+    items = []
+    for doc in page["items"]:
+        doc = dict(doc)
+        doc["dataset_id"] = str(doc["dataset_id"])
+        items.append(doc)
+    return {**page, "items": items}
+
+def timed(fn, repeat: int) -> tuple[float, bytes]:
+    samples, out = [], b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000, out
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=200)
+    ap.add_argument("--boxes", type=int, default=40, help="labels per image")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    page = make_page(args.items, args.boxes)
+    slim = {**page, "items": [{k: v for k, v in d.items() if k != "dataset_id"} for d in page["items"]]}
+    cases = {
+        "baseline": lambda: JSONResponse(jsonable_encoder(baseline_items(page))).body,
+        "fast": lambda: FastJSONResponse(page).body,
+        "fields": lambda: FastJSONResponse(slim).body,
+    }
+
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    print(f"{args.items} items x {args.boxes} boxes, median of {args.repeat}")
+    print(f"{'case':<10}{'encode ms':>11}{'bytes':>12}" + "".join(f"{e + ' bytes':>12}{e + ' ms':>9}" for e in encodings))
+    for name, fn in cases.items():
+        ms, body = timed(fn, args.repeat)
+        row = f"{name:<10}{ms:>11.2f}{len(body):>12,}"
+        for enc in encodings:
+            cms, packed = timed(lambda: compress(body, enc), max(3, args.repeat // 4))
+            row += f"{len(packed):>12,}{cms:>9.2f}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare two load-test result files route by route:
+
+    python -m benchmarks.loadtest.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+    python -m benchmarks.loadtest.compare --latest      # two newest files in benchmarks/results
+"""
+from __future__ import annotations
+import argparse, glob, json, os
+
+from .run import RESULTS_DIR
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+def compare(old: dict, new: dict) -> str:
+    head = f"{old.get('commit') or '?'} -> {new.get('commit') or '?'}"
+    lines = [head, f"{'route':<15}" + "".join(f"{m:>24}" for m in METRICS)]
+    for route in sorted(set(old["routes"]) | set(new["routes"])):
+        a, b = old["routes"].get(route), new["routes"].get(route)
+        if not a or not b:
+            lines.append(f"{route:<15}  only in {'new' if b else 'old'}")
+            continue
+        cells = "".join(f"{f'{a[m]} -> {b[m]} ({_delta(a[m], b[m])})':>24}" for m in METRICS)
+        lines.append(f"{route:<15}{cells}")
+    if old.get("config") != new.get("config"):
+        lines.append("\nnote: runs used different configs")
+    return "\n".join(lines)
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="*")
+    ap.add_argument("--latest", action="store_true", help="compare the two newest results")
+    args = ap.parse_args()
+    files = args.files
+    if args.latest:
+        files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))[-2:]
+    if len(files) != 2:
+        ap.error("need exactly two result files")
+    with open(files[0]) as f1, open(files[1]) as f2:
+        print(compare(json.load(f1), json.load(f2)))
+
+if __name__ == "__main__":
+    main()
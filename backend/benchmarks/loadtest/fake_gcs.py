@@ -0,0 +1,116 @@
+"""
+Filesystem-backed stand-in for the parts of google.cloud.storage the API uses.
+
+Objects live at <root>/<bucket>/<name>. generation is the file's mtime in ns,
+so rewriting a file behaves like a new GCS generation (if_generation_match
+raises PreconditionFailed). install() swaps storage.Client (and the Pub/Sub
+publisher) before app.main loads.
+"""
+from __future__ import annotations
+import base64, concurrent.futures, mimetypes, os
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.generation: Optional[int] = None
+        self.etag: Optional[str] = None
+        self.size: Optional[int] = None
+        self.content_type: Optional[str] = None
+        self.updated: Optional[datetime] = None
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.bucket._root, self.name)
+
+    def _load(self) -> None:
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            raise NotFound(f"{self.bucket.name}/{self.name}")
+        self.generation = st.st_mtime_ns
+        self.size = st.st_size
+        self.etag = base64.b64encode(st.st_mtime_ns.to_bytes(8, "big")).decode().rstrip("=")
+        self.content_type = mimetypes.guess_type(self.name)[0] or "application/octet-stream"
+        self.updated = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+
+    def reload(self, **_) -> None:
+        self._load()
+
+    def exists(self, **_) -> bool:
+        return os.path.exists(self._path)
+
+    def download_as_bytes(self, start: Optional[int] = None, end: Optional[int] = None,
+                          if_generation_match: Optional[int] = None, **_) -> bytes:
+        self._load()
+        if if_generation_match is not None and if_generation_match != self.generation:
+            raise PreconditionFailed(f"{self.name}: generation {self.generation} != {if_generation_match}")
+        with open(self._path, "rb") as f:
+            f.seek(start or 0)
+            n = -1 if end is None else end - (start or 0) + 1
+            return f.read(n)
+
+    def download_to_filename(self, filename: str, **_) -> None:
+        with open(filename, "wb") as f:
+            f.write(self.download_as_bytes())
+
+    def open(self, mode: str = "rb", chunk_size: Optional[int] = None, **_):
+        if "r" not in mode:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        return open(self._path, mode)
+
+    def upload_from_string(self, data, content_type: Optional[str] = None, **_) -> None:
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(self._path, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        self._load()
+
+    def upload_from_filename(self, filename: str, content_type: Optional[str] = None, **_) -> None:
+        with open(filename, "rb") as f:
+            self.upload_from_string(f.read(), content_type=content_type)
+
+    def generate_signed_url(self, expiration=None, **_) -> str:
+        return f"file://{quote(self._path)}"
+
+    def create_resumable_upload_session(self, **_) -> str:
+        return f"file://{quote(self._path)}?upload"
+
+class FakeBucket:
+    def __init__(self, client: "FakeClient", name: str):
+        self.client = client
+        self.name = name
+        self._root = os.path.join(client.root, name)
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+class FakeClient:
+    root = os.getenv("LOADTEST_GCS_ROOT", "/tmp/loadtest-gcs")
+
+    def __init__(self, *_, **__):
+        pass
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self, name)
+
+class FakePublisher:
+    def __init__(self, *_, **__):
+        pass
+    def topic_path(self, project: str, topic: str) -> str:
+        return f"projects/{project}/topics/{topic}"
+    def publish(self, topic: str, data: bytes, **attrs) -> concurrent.futures.Future:
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        fut.set_result("loadtest")
+        return fut
+
+def install(root: Optional[str] = None) -> None:
+    from google.cloud import pubsub_v1, storage
+    if root:
+        FakeClient.root = root
+    storage.Client = FakeClient
+    pubsub_v1.PublisherClient = FakePublisher
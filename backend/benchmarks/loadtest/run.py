@@ -0,0 +1,207 @@
+"""
+Load test for the read API against local stand-ins.
+
+Starts the app (serve.py) against a local Mongo, no/fake/local Redis and a
+filesystem GCS, seeds a synthetic dataset, drives a weighted mix of requests
+from --concurrency closed-loop clients, and writes per-route throughput and
+p50/p95/p99 latency to benchmarks/results/<timestamp>-<commit>.json.
+
+    docker run -d -p 27017:27017 mongo:7
+    cd backend && python -m benchmarks.loadtest.run --images 20000 --concurrency 32 --duration 30
+    python -m benchmarks.loadtest.compare benchmarks/results/A.json benchmarks/results/B.json
+
+Routes in --mix: list, list_deep (keyset pages), list_filtered, image, urls, bulk, datasets.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, platform, random, socket, subprocess, sys, time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .seed import seed_dataset
+from .stats import summarize
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "results")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.check_output(["git", *args], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def _parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        mix[name.strip()] = int(w or 1)
+    return mix
+
+class Workload:
+    """Builds one request per call; hot-set skew for image paths so caches see realistic reuse."""
+    def __init__(self, dataset_id: str, images: int, page_size: int, hot_fraction: float, rnd: random.Random):
+        self.ds = dataset_id
+        self.images = images
+        self.page_size = page_size
+        self.hot = max(1, int(images * hot_fraction))
+        self.rnd = rnd
+        self.cursors: List[str] = []
+
+    def _path(self) -> str:
+        i = self.rnd.randrange(self.hot) if self.rnd.random() < 0.8 else self.rnd.randrange(self.images)
+        return f"images/{'train' if i % 10 else 'val'}/{i:07d}.jpg"
+
+    def _page(self) -> int:
+        return self.rnd.randint(1, max(1, min(50, self.images // self.page_size)))
+
+    def request(self, route: str) -> Tuple[str, str, Dict[str, Any]]:
+        base = f"/datasets/{self.ds}"
+        ps = self.page_size
+        if route == "list":
+            return "GET", f"{base}/images", {"params": {"page": self._page(), "page_size": ps}}
+        if route == "list_deep":
+            after = self.rnd.choice(self.cursors) if self.cursors else None
+            return "GET", f"{base}/images", {"params": {"page_size": ps, **({"after": after} if after else {})}}
+        if route == "list_filtered":
+            return "GET", f"{base}/images", {"params": {
+                "page_size": ps, "cls": self.rnd.randrange(80), "min_boxes": self.rnd.randint(0, 5),
+            }}
+        if route == "image":
+            return "GET", f"{base}/image", {"params": {"path": self._path()}}
+        if route == "urls":
+            return "GET", f"{base}/image-urls", {"params": {"page": self._page(), "page_size": ps}}
+        if route == "bulk":
+            return "POST", f"{base}/images/bulk", {"json": {"page": self._page(), "page_size": ps}}
+        if route == "datasets":
+            return "GET", "/datasets", {}
+        raise ValueError(f"unknown route {route!r}")
+
+    def observe(self, route: str, resp: httpx.Response) -> None:
+        if route in ("list", "list_deep") and resp.status_code == 200 and len(self.cursors) < 500:
+            nxt = resp.json().get("next_cursor")
+            if nxt:
+                self.cursors.append(nxt)
+
+async def _drive(base_url: str, wl: Workload, mix: Dict[str, int], *, concurrency: int,
+                 duration: float, warmup: float) -> Dict[str, List[Tuple[float, int]]]:
+    routes, weights = zip(*mix.items())
+    samples: Dict[str, List[Tuple[float, int]]] = {r: [] for r in routes}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        record_from = start + warmup
+        stop = record_from + duration
+
+        async def worker() -> None:
+            while (now := time.perf_counter()) < stop:
+                route = wl.rnd.choices(routes, weights)[0]
+                method, url, kw = wl.request(route)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.request(method, url, **kw)
+                    await resp.aread()
+                    status = resp.status_code
+                    wl.observe(route, resp)
+                except httpx.HTTPError:
+                    status = 0
+                if t0 >= record_from:
+                    samples[route].append((time.perf_counter() - t0, status))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+async def _wait_ready(base_url: str, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as c:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError("API process exited during startup")
+            try:
+                if (await c.get("/healthz")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready")
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ["LOADTEST_GCS_ROOT"] = args.gcs_root
+    mongo = AsyncIOMotorClient(args.mongo_uri)
+    db = mongo[args.mongo_db]
+    t0 = time.perf_counter()
+    ds = await seed_dataset(
+        db, f"loadtest-{args.images}", images=args.images, image_kb=args.image_kb,
+        large_every=args.large_every, large_kb=args.large_kb, boxes=args.boxes,
+    )
+    seed_s = time.perf_counter() - t0
+    mongo.close()
+
+    port = _free_port()
+    env = {**os.environ, "MONGO_URI": args.mongo_uri, "MONGO_DB": args.mongo_db,
+           "LOADTEST_GCS_ROOT": args.gcs_root, "SIGNED_URLS_MODE": args.signed_urls}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.loadtest.serve", "--port", str(port),
+         "--redis", args.redis, "--gcs-root", args.gcs_root],
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await _wait_ready(base_url, proc)
+        wl = Workload(ds, args.images, args.page_size, args.hot_fraction, random.Random(args.seed))
+        samples = await _drive(base_url, wl, _parse_mix(args.mix), concurrency=args.concurrency,
+                               duration=args.duration, warmup=args.warmup)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "seed_seconds": round(seed_s, 2),
+        "routes": {route: summarize(s, args.duration) for route, s in samples.items()},
+    }
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", type=int, default=10_000)
+    ap.add_argument("--boxes", type=int, default=8, help="mean boxes per image")
+    ap.add_argument("--image-kb", type=int, default=48)
+    ap.add_argument("--large-every", type=int, default=100, help="every Nth image is large (0 = none)")
+    ap.add_argument("--large-kb", type=int, default=4096)
+    ap.add_argument("--page-size", type=int, default=60)
+    ap.add_argument("--hot-fraction", type=float, default=0.05, help="share of images that get 80%% of image hits")
+    ap.add_argument("--mix", default="list=4,list_deep=2,list_filtered=1,image=10,urls=2,bulk=1,datasets=1")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--warmup", type=float, default=5)
+    ap.add_argument("--redis", default="none", help="redis URL, 'fake' (needs fakeredis) or 'none'")
+    ap.add_argument("--signed-urls", default="proxy", choices=["proxy", "auto"])
+    ap.add_argument("--mongo-uri", default=os.getenv("LOADTEST_MONGO_URI", "mongodb://localhost:27017"))
+    ap.add_argument("--mongo-db", default="yolo_loadtest")
+    ap.add_argument("--gcs-root", default=os.getenv("LOADTEST_GCS_ROOT", "/tmp/loadtest-gcs"))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=RESULTS_DIR)
+    args = ap.parse_args()
+
+    result = asyncio.run(main_async(args))
+    os.makedirs(args.out, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(args.out, f"{stamp}-{result['commit'] or 'nogit'}{'-dirty' if result['dirty'] else ''}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    from .stats import format_table
+    print(format_table(result["routes"]))
+    print(f"\nwrote {path}")
+
+if __name__ == "__main__":
+    main()
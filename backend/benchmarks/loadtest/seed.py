@@ -0,0 +1,95 @@
+"""
+Synthetic datasets for the load test: image docs shaped like the worker's
+(labels, summary, search keys, stored object metadata, counters) plus the
+bytes in the fake GCS root. Seeding is idempotent per (name, size) so
+repeated runs reuse the data.
+"""
+from __future__ import annotations
+import os, random
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne
+
+from app.services.search import search_keys
+from .fake_gcs import FakeClient
+
+BUCKET = "loadtest"
+
+def _labels(rnd: random.Random, n: int, classes: int) -> List[Dict[str, Any]]:
+    return [{
+        "class_id": rnd.randrange(classes),
+        "x_center": round(rnd.random(), 6), "y_center": round(rnd.random(), 6),
+        "width": round(rnd.uniform(0.01, 0.4), 6), "height": round(rnd.uniform(0.01, 0.4), 6),
+    } for _ in range(n)]
+
+def _summary(labels: List[Dict[str, Any]]) -> Dict[str, Any]:
+    areas = [l["width"] * l["height"] for l in labels]
+    return {
+        "classes": sorted({l["class_id"] for l in labels}), "box_count": len(labels),
+        "min_area": min(areas) if areas else None, "max_area": max(areas) if areas else None,
+    }
+
+async def seed_dataset(
+    db: AsyncIOMotorDatabase,
+    name: str,
+    *,
+    images: int,
+    image_kb: int,
+    large_every: int,
+    large_kb: int,
+    boxes: int,
+    classes: int = 80,
+    seed: int = 0,
+) -> str:
+    """Create (or reuse) one dataset; returns its id."""
+    existing = await db.datasets.find_one({"name": name, "image_count": images})
+    if existing:
+        return str(existing["_id"])
+    async for old in db.datasets.find({"name": name}, {"_id": 1}):
+        await db.images.delete_many({"dataset_id": old["_id"]})
+    await db.datasets.delete_many({"name": name})
+
+    rnd = random.Random(seed)
+    prefix = f"datasets/{name}"
+    bucket = FakeClient().bucket(BUCKET)
+    small = os.urandom(image_kb * 1024)
+    large = os.urandom(large_kb * 1024)
+    now = datetime.now(timezone.utc)
+
+    oid = ObjectId()
+    class_counts: Dict[str, int] = {}
+    labeled = 0
+    ops: List[InsertOne] = []
+    for i in range(images):
+        path = f"images/{'train' if i % 10 else 'val'}/{i:07d}.jpg"
+        blob = bucket.blob(f"{prefix}/{path}")
+        blob.upload_from_string(large if large_every and i % large_every == 0 else small, content_type="image/jpeg")
+        labels = _labels(rnd, rnd.randint(0, boxes * 2), classes)
+        summary = _summary(labels)
+        labeled += bool(labels)
+        for c in summary["classes"]:
+            class_counts[str(c)] = class_counts.get(str(c), 0) + 1
+        ops.append(InsertOne({
+            "dataset_id": oid, "image_path": path, "labels": labels, "summary": summary,
+            "search": search_keys(path), "width": 640, "height": 480, "created_at": now, "updated_at": now,
+            "object": {
+                "name": blob.name, "generation": blob.generation, "etag": blob.etag, "size": blob.size,
+                "content_type": blob.content_type, "updated": blob.updated,
+            },
+        }))
+        if len(ops) >= 1000:
+            await db.images.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        await db.images.bulk_write(ops, ordered=False)
+
+    await db.datasets.insert_one({
+        "_id": oid, "name": name, "source_prefix": f"gs://{BUCKET}/{prefix}/",
+        "created_at": now, "updated_at": now, "search": search_keys(name), "version": 1,
+        "image_count": images, "labeled_count": labeled, "class_counts": class_counts,
+    })
+    await db.meta.update_one({"_id": "datasets"}, {"$inc": {"version": 1}}, upsert=True)
+    return str(oid)
@@ -0,0 +1,36 @@
+"""
+API process for the load test: installs the stand-ins, then runs app.main
+under uvicorn. Started by run.py; usable on its own for manual poking:
+
+    python -m benchmarks.loadtest.serve --port 8099 --redis fake
+"""
+from __future__ import annotations
+import argparse, os
+
+from . import fake_gcs
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--redis", default="none", help="redis URL, 'fake' (needs fakeredis) or 'none'")
+    ap.add_argument("--gcs-root", default=os.getenv("LOADTEST_GCS_ROOT", "/tmp/loadtest-gcs"))
+    args = ap.parse_args()
+
+    fake_gcs.install(args.gcs_root)
+    if args.redis == "none":
+        os.environ["REDIS_URL"] = ""  # redis_cache then behaves as an always-miss tier
+    elif args.redis != "fake":
+        os.environ["REDIS_URL"] = args.redis
+
+    import uvicorn
+    from app.main import app
+    if args.redis == "fake":
+        from fakeredis import aioredis
+        from app.cache import redis_cache
+        fake = aioredis.FakeRedis()
+        redis_cache.get_redis = lambda: fake
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+if __name__ == "__main__":
+    main()
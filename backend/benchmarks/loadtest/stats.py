@@ -0,0 +1,35 @@
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending sequence (0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+def summarize(samples: List[Tuple[float, int]], duration: float) -> Dict[str, Any]:
+    """(latency seconds, status) samples of one route -> counts, rps and ms percentiles."""
+    lat = sorted(s for s, _ in samples)
+    errors = sum(1 for _, status in samples if status == 0 or status >= 500)
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "status": {str(c): sum(1 for _, s in samples if s == c) for c in sorted({s for _, s in samples})},
+        "rps": round(len(samples) / duration, 1) if duration else 0.0,
+        "mean_ms": ms(sum(lat) / len(lat)) if lat else 0.0,
+        "p50_ms": ms(percentile(lat, 50)),
+        "p95_ms": ms(percentile(lat, 95)),
+        "p99_ms": ms(percentile(lat, 99)),
+        "max_ms": ms(lat[-1]) if lat else 0.0,
+    }
+
+COLUMNS = ("requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms")
+
+def format_table(routes: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'route':<15}" + "".join(f"{c:>10}" for c in COLUMNS)]
+    for route, row in routes.items():
+        lines.append(f"{route:<15}" + "".join(f"{row[c]:>10}" for c in COLUMNS))
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+import asyncio, os, shutil
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc as ipc
+
+from app.services import columnar
+from app.services.summary import summary_filter
+from app.utils import decode_cursor
+
+SCHEMA = pa.schema([
+    ("image_path", pa.string()), ("width", pa.int32()), ("height", pa.int32()),
+    ("classes", pa.list_(pa.int32())), ("box_count", pa.int32()),
+    ("min_area", pa.float64()), ("max_area", pa.float64()), ("boxes", pa.list_(pa.float64())),
+])
+
+def _row(path, boxes, size=(640, 480)):
+    areas = [w * h for _, _, _, w, h in boxes]
+    return {
+        "image_path": path, "width": size and size[0], "height": size and size[1],
+        "classes": sorted({c for c, *_ in boxes}), "box_count": len(boxes),
+        "min_area": min(areas) if areas else None, "max_area": max(areas) if areas else None,
+        "boxes": [float(v) for b in boxes for v in b],
+    }
+
+ROWS = sorted([
+    _row("images/train/cat_001.jpg", [(0, .5, .5, .2, .2)]),
+    _row("images/train/cat_002.jpg", [(0, .5, .5, .4, .4), (2, .1, .1, .1, .1)]),
+    _row("images/train/dog_001.jpg", [(1, .5, .5, .5, .5)], size=None),
+    _row("images/val/cat_003.jpg", []),
+    _row("images/val/bird.png", [(2, .3, .3, .3, .3), (0, .6, .6, .05, .05)]),
+    _row("misc/Catalog.jpg", [(3, .5, .5, .9, .9)]),
+], key=lambda r: r["image_path"])
+
+@pytest.fixture
+def table(tmp_path):
+    path = str(tmp_path / "images.arrow")
+    t = pa.Table.from_pylist(ROWS, schema=SCHEMA)
+    with pa.OSFile(path, "wb") as sink, ipc.new_file(sink, SCHEMA) as w:
+        for batch in t.to_batches(max_chunksize=4):  # several record batches, like a big catalog
+            w.write_batch(batch)
+    return columnar._map(path)
+
+def _paths(table, *, q=None, page=1, page_size=50, after=None, **filters):
+    items, total, cursor = columnar.page(
+        table, "oid", q=q, label_match=summary_filter(**filters), fields=["labels", "summary", "width"],
+        page=page, page_size=page_size, after=after,
+    )
+    return [i["image_path"] for i in items], total, cursor
+
+def test_pages_and_cursor(table):
+    paths, total, cursor = _paths(table, page_size=4)
+    assert total == 6 and paths == [r["image_path"] for r in ROWS[:4]]
+    rest, _, end = _paths(table, page_size=4, after=decode_cursor(cursor))
+    assert rest == [r["image_path"] for r in ROWS[4:]] and end is None
+    assert _paths(table, page=2, page_size=4)[0] == rest
+
+def test_filters_match_summary_filter(table):
+    assert _paths(table, cls=[0])[0] == ["images/train/cat_001.jpg", "images/train/cat_002.jpg", "images/val/bird.png"]
+    assert _paths(table, cls=[0, 2])[1] == 2
+    assert _paths(table, min_boxes=2)[0] == ["images/train/cat_002.jpg", "images/val/bird.png"]
+    # images without boxes never match an area bound
+    assert "images/val/cat_003.jpg" not in _paths(table, max_area=0.5)[0]
+    assert _paths(table, min_area=0.04, max_area=0.2)[0] == ["images/train/cat_001.jpg"]
+    paths, total, cursor = _paths(table, cls=[0], page_size=1, after="images/train/cat_001.jpg")
+    assert paths == ["images/train/cat_002.jpg"] and total == 3 and cursor
+
+def test_filename_query(table):
+    # longer queries: basename contains q, or a segment starts with it (case-insensitive)
+    assert _paths(table, q="cat")[0] == [
+        "images/train/cat_001.jpg", "images/train/cat_002.jpg", "images/val/cat_003.jpg", "misc/Catalog.jpg",
+    ]
+    assert _paths(table, q="tra")[0] == ["images/train/cat_001.jpg", "images/train/cat_002.jpg", "images/train/dog_001.jpg"]
+    assert _paths(table, q="al")[1] == 0  # short queries: segment prefix only
+    assert _paths(table, q="val/")[0] == ["images/val/bird.png", "images/val/cat_003.jpg"]
+    assert _paths(table, q="train/dog")[0] == ["images/train/dog_001.jpg"]
+
+def test_items_rebuild_labels(table):
+    items, _, _ = columnar.page(
+        table, "oid", q="cat_002", label_match={}, fields=["labels", "dataset_id", "summary", "width", "height"],
+        page=1, page_size=5, after=None,
+    )
+    assert items == [{
+        "image_path": "images/train/cat_002.jpg",
+        "labels": [
+            {"class_id": 0, "x_center": .5, "y_center": .5, "width": .4, "height": .4},
+            {"class_id": 2, "x_center": .1, "y_center": .1, "width": .1, "height": .1},
+        ],
+        "dataset_id": "oid",
+        "summary": {"classes": [0, 2], "box_count": 2, "min_area": pytest.approx(.01), "max_area": pytest.approx(.16)},
+        "width": 640, "height": 480,
+    }]
+    dog, _, _ = columnar.page(table, "oid", q="dog", label_match={}, fields=["width"], page=1, page_size=5, after=None)
+    assert dog == [{"image_path": "images/train/dog_001.jpg"}]  # no size recorded, like a Mongo projection
+
+def test_load_downloads_once_and_checks_counts(tmp_path, monkeypatch, table):
+    src = tmp_path / "src.arrow"
+    with pa.OSFile(str(src), "wb") as sink, ipc.new_file(sink, SCHEMA) as w:
+        w.write_table(table)
+    downloads = []
+
+    class _Blob:
+        def download_to_filename(self, dst, if_generation_match=None):
+            downloads.append(if_generation_match)
+            shutil.copy(src, dst)
+
+    monkeypatch.setattr(columnar, "get_blob", lambda bucket, name: _Blob())
+    monkeypatch.setattr(columnar, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(columnar, "_open", type(columnar._open)())
+    info = {"uri": "gs://b/datasets/ds/run/images.arrow", "generation": 7, "rows": 6, "format": 1}
+    d = {"_id": "abc", "image_count": 6, "columnar": info}
+
+    async def twice():
+        return await columnar.load(d), await columnar.load(d)
+    first, second = asyncio.run(twice())
+    assert first is second and first.num_rows == 6 and downloads == [7]
+    assert os.listdir(tmp_path / "cache") == ["abc-7.arrow"]
+
+    assert columnar.usable({**d, "image_count": 7}) is None  # written outside the catalog's ingest
+    assert columnar.usable({"_id": "abc", "image_count": 6}) is None
+    assert not columnar.supports({"summary.other": 1})
+
+def test_worker_catalog_round_trips(tmp_path, monkeypatch):
+    # the file the worker writes is the file page() reads
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), "..", "..", "worker"))
+    worker = pytest.importorskip("job.columnar")
+    out = tmp_path / "images.arrow"
+
+    class _Blob:
+        size, generation = None, 3
+        def upload_from_filename(self, src, content_type=None):
+            shutil.copy(src, out)
+            self.size = os.path.getsize(out)
+
+    class _Bucket:
+        def blob(self, key): return _Blob()
+
+    class _Client:
+        def bucket(self, name): return _Bucket()
+
+    class _Log:
+        def info(self, *a, **kw): pass
+
+    monkeypatch.setattr(worker, "storage_client", _Client)
+    monkeypatch.setattr(worker, "log", _Log())  # the backend configures structlog for bytes output
+    monkeypatch.setattr(worker, "COLUMNAR_MIN_IMAGES", 1)
+    box = lambda c, x, y, w, h: {"class_id": c, "x_center": x, "y_center": y, "width": w, "height": h}
+    docs = [
+        {"image_path": "images/b.jpg", "width": 640, "height": 480, "labels": [box(1, .5, .5, .2, .4), box(0, .1, .1, .1, .1)]},
+        {"path": "images/a.jpg", "labels": []},
+        {"image_path": "images/b.jpg", "labels": []},  # duplicate: the first doc wins, like the upsert
+        {"filename": "images/c.png", "width": 10, "height": 0, "labels": [box(2, .3, .3, .3, .3)]},
+    ]
+    info = worker.write_catalog(docs, "gs://bucket/datasets/ds/run1")
+    assert info == {"uri": "gs://bucket/datasets/ds/run1/images.arrow", "generation": 3, "rows": 3, "format": columnar.FORMAT}
+
+    table = columnar._map(str(out))
+    items, total, cursor = columnar.page(
+        table, "oid", q=None, label_match={}, fields=["labels", "summary", "width", "height"],
+        page=1, page_size=2, after=None,
+    )
+    assert total == 3 and [i["image_path"] for i in items] == ["images/a.jpg", "images/b.jpg"]
+    assert items[0] == {"image_path": "images/a.jpg", "labels": [], "summary": {"classes": [], "box_count": 0, "min_area": None, "max_area": None}}
+    assert items[1]["labels"] == docs[0]["labels"] and (items[1]["width"], items[1]["height"]) == (640, 480)
+    assert items[1]["summary"] == {"classes": [0, 1], "box_count": 2, "min_area": pytest.approx(.01), "max_area": pytest.approx(.08)}
+    rest, _, end = columnar.page(
+        table, "oid", q=None, label_match=summary_filter(cls=[2]), fields=["width"],
+        page=1, page_size=2, after=decode_cursor(cursor),
+    )
+    assert rest == [{"image_path": "images/c.png"}] and end is None  # 10x0 is "unknown size"
@@ -0,0 +1,50 @@
+import io, json, tarfile, zipfile
+
+from app.services.export import ZipStream, TarStream, CocoWriter, yolo_label_path, yolo_label_text, yolo_member_names
+
+BOX = {"class_id": 2, "x_center": 0.5, "y_center": 0.5, "width": 0.2, "height": 0.2}
+
+def test_zip_stream_with_unsized_member():
+    z, coco = ZipStream(), CocoWriter()
+    out = z.add(yolo_label_path("train/a.jpg"), yolo_label_text([BOX]))
+    out += z.start("annotations.json")
+    out += z.chunk(coco.open())
+    out += z.chunk(coco.image({"image_path": "train/a.jpg", "width": 100, "height": 50, "labels": [BOX]}))
+    out += z.chunk(coco.image({"image_path": "train/b.jpg", "labels": [BOX]}))  # no dimensions
+    for piece in coco.close():
+        out += z.chunk(piece)
+    out += z.end() + z.close()
+
+    zf = zipfile.ZipFile(io.BytesIO(out))
+    assert zf.testzip() is None
+    assert zf.read("labels/train/a.txt") == b"2 0.500000 0.500000 0.200000 0.200000\n"
+    doc = json.loads(zf.read("annotations.json"))
+    assert [i["id"] for i in doc["images"]] == [1, 2]
+    assert doc["annotations"] == [
+        {"id": 1, "image_id": 1, "category_id": 2, "bbox": [40.0, 20.0, 20.0, 10.0], "area": 200.0, "iscrowd": 0},
+    ]
+    assert doc["categories"] == [{"id": 2, "name": "2"}]
+    assert doc["info"]["skipped_images"] == 1
+
+def test_tar_stream_members():
+    t = TarStream()
+    long_name = "images/" + "x" * 150 + ".jpg"
+    out = t.add(long_name, b"abc") + t.start("images/big.bin", 5) + t.chunk(b"12") + t.chunk(b"345") + t.end() + t.close()
+    tf = tarfile.open(fileobj=io.BytesIO(out))
+    assert [m.name for m in tf] == [long_name, "images/big.bin"]
+    assert tf.extractfile("images/big.bin").read() == b"12345"
+
+def test_yolo_labels_sit_where_ultralytics_looks():
+    def trainer_label(image):  # ultralytics img2label_paths: last /images/ -> /labels/, suffix -> .txt
+        a, _, b = ("/" + image).rpartition("/images/")
+        return (a + "/labels/" + b.rsplit(".", 1)[0] + ".txt").lstrip("/")
+    for path, image in [
+        ("images/train/x.jpg", "images/train/x.jpg"),  # standard YOLO layout: not nested again
+        ("train/x.jpg", "images/train/x.jpg"),
+        ("/x.png", "images/x.png"),
+        ("ds\\images\\val\\y.jpeg", "images/ds/images/val/y.jpeg"),
+    ]:
+        got_image, got_label = yolo_member_names(path)
+        assert got_image == image and got_label == trainer_label(image) == yolo_label_path(path)
+    assert yolo_member_names("images/train/x.jpg") == ("images/train/x.jpg", "labels/train/x.txt")
+    assert yolo_member_names("ds/images/val/y.jpeg")[1] == "images/ds/labels/val/y.txt"
@@ -0,0 +1,39 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.cache import redis_cache
+from app.services import list_cache
+
+def _client(monkeypatch, state):
+    async def miss(*a, **k):
+        return None
+    monkeypatch.setattr(redis_cache, "get_bytes", miss)
+    monkeypatch.setattr(redis_cache, "set_bytes", miss)
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items(request: Request):
+        async def build():
+            state["builds"] += 1
+            return {"items": [1, 2, 3], "version": state["version"]}
+        key = list_cache.version_key("items", state["version"])
+        return await list_cache.respond(request, key, build)
+    return TestClient(app)
+
+def test_etag_304_and_version_bump(monkeypatch):
+    state = {"version": 1, "builds": 0}
+    c = _client(monkeypatch, state)
+
+    r = c.get("/items")
+    etag = r.headers["etag"]
+    assert r.status_code == 200 and etag.startswith('W/"')
+    assert c.get("/items").json() == r.json() and state["builds"] == 1  # served from cache
+
+    r304 = c.get("/items", headers={"If-None-Match": etag})
+    assert r304.status_code == 304 and r304.headers["etag"] == etag
+    assert c.get("/items", headers={"If-None-Match": etag.removeprefix("W/")}).status_code == 304
+
+    state["version"] = 2
+    r2 = c.get("/items", headers={"If-None-Match": etag})
+    assert r2.status_code == 200 and r2.json()["version"] == 2
+    assert r2.headers["etag"] != etag and state["builds"] == 2
@@ -0,0 +1,27 @@
+import pytest
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+from benchmarks.loadtest.fake_gcs import FakeClient
+from benchmarks.loadtest.stats import percentile, summarize
+
+def test_percentile_nearest_rank():
+    vals = list(range(1, 101))
+    assert percentile(vals, 50) == 50
+    assert percentile(vals, 99) == 99
+    assert percentile([], 95) == 0.0
+
+def test_summarize_counts_errors():
+    s = summarize([(0.010, 200), (0.020, 304), (0.300, 500), (0.040, 0)], duration=2)
+    assert s["requests"] == 4 and s["errors"] == 2 and s["rps"] == 2.0
+    assert s["p50_ms"] == 20.0 and s["max_ms"] == 300.0
+
+def test_fake_gcs_ranges_and_generations(tmp_path, monkeypatch):
+    monkeypatch.setattr(FakeClient, "root", str(tmp_path))
+    blob = FakeClient().bucket("b").blob("d/x.jpg")
+    with pytest.raises(NotFound):
+        blob.reload()
+    blob.upload_from_string(b"0123456789")
+    assert blob.size == 10 and blob.content_type == "image/jpeg"
+    assert blob.download_as_bytes(start=3, end=5, if_generation_match=blob.generation) == b"345"
+    with pytest.raises(PreconditionFailed):
+        blob.download_as_bytes(if_generation_match=blob.generation + 1)
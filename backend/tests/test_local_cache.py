@@ -0,0 +1,56 @@
+import asyncio
+from app.cache.local_cache import ByteLRU, SingleFlight
+
+def test_lru_budget_and_admission():
+    c = ByteLRU(budget=10, max_item=6)
+    assert c.set("a", b"aaaa", 4, ttl=60)
+    assert c.set("b", b"bbbb", 4, ttl=60)
+    assert c.get("a") == b"aaaa"          # a is now most recent
+    assert c.set("c", b"cccc", 4, ttl=60)  # evicts b
+    assert c.get("b") is None and c.get("a") == b"aaaa"
+    assert not c.set("big", b"x" * 7, 7, ttl=60)
+    s = c.stats()
+    assert s["evictions"] == 1 and s["rejected"] == 1 and s["bytes"] == 8
+
+def test_lru_ttl():
+    c = ByteLRU(budget=10, max_item=10)
+    c.set("a", 1, 1, ttl=-1)
+    assert c.get("a") is None
+
+def test_single_flight_coalesces():
+    sf = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "v"
+
+    async def main():
+        return await asyncio.gather(*(sf.do("k", load) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["v"] * 10
+    assert calls == 1 and sf.stats()["coalesced"] == 9
+
+def test_single_flight_survives_leader_cancel():
+    sf = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "v"
+
+    async def main():
+        leader = asyncio.create_task(sf.do("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(sf.do("k", load))
+        await asyncio.sleep(0.005)
+        leader.cancel()  # e.g. the first client disconnected
+        result = await follower
+        return leader.cancelled(), result, sf.stats()["in_flight"]
+
+    assert asyncio.run(main()) == (True, "v", 0)
+    assert calls == 1
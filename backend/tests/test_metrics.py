@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.metrics import Counter, Histogram, MetricsMiddleware
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/things/{tid}")
+    def thing(tid: str):
+        return {"id": tid}
+    return app
+
+def test_histogram_buckets_are_cumulative():
+    registry = []  # private: nothing leaks into the process-wide /metrics output
+    h = Histogram("test_latency_seconds", "t", ("op",), buckets=(0.1, 1.0), registry=registry)
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v, "read")
+    text = "\n".join(h.render())
+    assert 'test_latency_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{op="read",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{op="read"} 3' in text
+    assert h.count("read") == 3
+    assert metrics.render(registry) == text + "\n" and h not in metrics._registry
+
+def test_counter_escapes_label_values():
+    c = Counter("test_things_total", "t", ("name",), registry=[])
+    c.inc('a"b')
+    assert 'test_things_total{name="a\\"b"} 1' in c.render()
+
+def test_middleware_labels_by_route_template(monkeypatch):
+    h = Histogram("http_request_duration_seconds", "t", ("method", "route", "status"), registry=[])
+    monkeypatch.setattr(metrics, "HTTP_LATENCY", h)
+    c = TestClient(_app())
+    c.get("/things/1")
+    c.get("/things/2")
+    assert h.count("GET", "/things/{tid}", "200") == 2
+    c.get("/nope")
+    assert h.count("GET", "unmatched", "404") == 1
+
+def test_gcs_timer_counts_errors(monkeypatch):
+    registry = []
+    monkeypatch.setattr(metrics, "GCS_ERRORS", Counter("gcs_operation_errors_total", "t", ("op", "error"), registry=registry))
+    monkeypatch.setattr(metrics, "GCS_LATENCY", Histogram("gcs_operation_duration_seconds", "t", ("op",), registry=registry))
+    with pytest.raises(KeyError):
+        with metrics.gcs("test_op"):
+            raise KeyError("x")
+    assert metrics.GCS_ERRORS.value("test_op", "KeyError") == 1
+    assert metrics.GCS_LATENCY.count("test_op") == 1
+    assert "test_op" not in metrics.render()
+
+def test_cache_lookup_uses_key_family(monkeypatch):
+    registry = []
+    monkeypatch.setattr(metrics, "CACHE", Counter("cache_requests_total", "t", ("family", "tier", "result"), registry=registry))
+    metrics.cache_lookup("img:bucket:name:etag", "local", True)
+    assert metrics.CACHE.value("img", "local", "hit") == 1
+    assert 'cache_requests_total{family="img",tier="local",result="hit"} 1' in metrics.render(registry)
+
+def test_concurrent_recording_loses_nothing():
+    registry = []
+    c = Counter("test_hits_total", "t", registry=registry)
+    h = Histogram("test_hit_seconds", "t", registry=registry)
+
+    def work():
+        for _ in range(2000):
+            c.inc()
+            h.observe(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert c.value() == 16000 and h.count() == 16000
@@ -0,0 +1,20 @@
+from email.parser import BytesParser
+from email.policy import HTTP
+
+from app.services import multipart
+
+def test_parts_parse_as_multipart_mixed():
+    b = multipart.new_boundary()
+    body = (
+        multipart.encode_part(b, {"Content-Type": "image/png", "X-Image-Path": "a%20b.png"}, b"\x89PNG\r\n--x")
+        + multipart.encode_part(b, {"X-Image-Path": "gone.jpg", "X-Image-Status": "404"})
+        + multipart.closing(b)
+    )
+    msg = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {multipart.content_type(b)}\r\n\r\n".encode() + body
+    )
+    parts = list(msg.iter_parts())
+    assert [p["X-Image-Path"] for p in parts] == ["a%20b.png", "gone.jpg"]
+    assert parts[0].get_payload(decode=True) == b"\x89PNG\r\n--x"
+    assert parts[0]["Content-Length"] == "9"
+    assert parts[1]["Content-Length"] == "0"
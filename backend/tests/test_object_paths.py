@@ -0,0 +1,40 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.routers import images
+from app.utils import object_for_path
+
+CAS = {"name": "cas/sha256/ab/abcd", "sha256": "abcd", "etag": "e", "generation": 1, "size": 3}
+
+def test_prefix_layout():
+    assert object_for_path("gs://b/datasets/ds/run1/", "images/a.jpg") == ("b", "datasets/ds/run1/images/a.jpg")
+    assert object_for_path("gs://b", "images/a.jpg") == ("b", "images/a.jpg")
+    # copy-layout metadata is only a cache of the object at the prefix path
+    legacy = {**CAS, "name": "datasets/ds/run0/images/a.jpg", "sha256": None}
+    assert object_for_path("gs://b/datasets/ds/run1/", "images/a.jpg", legacy)[1] == "datasets/ds/run1/images/a.jpg"
+
+def test_content_addressed_object_wins():
+    assert object_for_path("gs://b/datasets/ds/run1/", "images/a.jpg", CAS) == ("b", "cas/sha256/ab/abcd")
+
+def test_proxy_url_reports_the_stored_object(monkeypatch):
+    oid = ObjectId()
+
+    class _Images:
+        async def find_one(self, query, projection=None):
+            assert query == {"dataset_id": oid, "image_path": "images/a.jpg"}
+            return {"object": CAS}
+
+    class _Db:
+        images = _Images()
+
+    async def load(db, _oid):
+        return {"_id": oid, "source_prefix": "gs://b/datasets/ds/run1/"}
+
+    monkeypatch.setattr(images, "load_dataset", load)
+    monkeypatch.setattr(images, "SIGNED_URLS_MODE", "proxy")
+    out = asyncio.run(images.get_image_signed_url(
+        str(oid), path="images/a.jpg", ttl=600, as_download=False, filename=None, db=_Db(),
+    ))
+    assert (out["bucket"], out["name"]) == ("b", "cas/sha256/ab/abcd")
+    assert out["url"] == f"/datasets/{oid}/image?path=images%2Fa.jpg" and out["expires_at"] is None
@@ -0,0 +1,12 @@
+import pytest
+from app.utils import encode_cursor, decode_cursor
+
+def test_cursor_roundtrip():
+    for p in ["images/a.jpg", "ünïcode/ß.png", "x"]:
+        token = encode_cursor(p)
+        assert "=" not in token and "/" not in token
+        assert decode_cursor(token) == p
+
+def test_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor("%%%")
@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import pubsub
+
+class _Publisher:
+    """Resolves publish futures from another thread after a delay, like the batching client."""
+    def __init__(self, delay=0.05, fail_on=None):
+        self.delay, self.fail_on, self.sent = delay, fail_on, []
+
+    def publish(self, topic, data, **attrs):
+        fut = concurrent.futures.Future()
+        msg = json.loads(data)
+        self.sent.append(msg)
+        mid = f"id-{len(self.sent)}"
+        def finish():
+            if msg.get("dataset_name") == self.fail_on:
+                fut.set_exception(RuntimeError("boom"))
+            else:
+                fut.set_result(mid)
+        threading.Timer(self.delay, finish).start()
+        return fut
+
+def _install(monkeypatch, **kw):
+    pub = _Publisher(**kw)
+    monkeypatch.setattr(pubsub, "_publisher", pub)
+    monkeypatch.setattr(pubsub, "_topic_path", "projects/p/topics/t")
+    return pub
+
+def test_publish_does_not_block_the_loop(monkeypatch):
+    _install(monkeypatch, delay=0.2)
+
+    async def main():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        t = asyncio.create_task(ticker())
+        ids = await asyncio.gather(*(pubsub.publish_ingestion_message({"dataset_name": f"d{i}"}) for i in range(20)))
+        t.cancel()
+        return ids, ticks
+
+    ids, ticks = asyncio.run(main())
+    assert len(set(ids)) == 20
+    assert ticks >= 10  # the loop kept running while 20 publishes were in flight
+
+def test_bulk_publish_reports_per_item(monkeypatch):
+    pub = _install(monkeypatch, delay=0, fail_on="bad")
+    c = TestClient(app)
+    r = c.post("/ingestion/publish-bulk", json={"items": [
+        {"dataset_name": "a", "gcs_uri": "gs://b/a.zip", "size_bytes": 10},
+        {"dataset_name": "bad", "gcs_uris": ["gs://b/x", "gs://b/y"]},
+    ]})
+    body = r.json()
+    assert r.status_code == 200 and body["status"] == "partial"
+    assert body["published"] == 1 and body["failed"] == 1
+    assert body["items"][0]["message_id"].startswith("id-") and "boom" in body["items"][1]["error"]
+    assert pub.sent[0] == {"dataset_name": "a", "format": "yolo", "gcs_uri": "gs://b/a.zip", "size_bytes": 10}
+
+def test_publish_requires_a_uri(monkeypatch):
+    pub = _install(monkeypatch)
+    c = TestClient(app)
+    assert c.post("/ingestion/publish", json={"dataset_name": "a"}).status_code == 400
+    assert c.post("/ingestion/publish-bulk", json={"items": [{"dataset_name": "a"}]}).status_code == 400
+    assert pub.sent == []
@@ -0,0 +1,41 @@
+import gzip
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.responses import CompressionMiddleware, FastJSONResponse, _pick_encoding
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return FastJSONResponse({"items": [{"id": ObjectId("0" * 24), "at": datetime(2024, 1, 2)}] * 50})
+
+    @app.get("/small")
+    def small():
+        return FastJSONResponse({"ok": True})
+    return app
+
+def test_fast_json_handles_objectid_and_datetime():
+    body = FastJSONResponse({"id": ObjectId("0" * 24), "at": datetime(2024, 1, 2, 3, 4, 5)}).body
+    assert body == b'{"id":"000000000000000000000000","at":"2024-01-02T03:04:05"}'
+
+def test_large_json_is_compressed_small_is_not():
+    c = TestClient(_app())
+    r = c.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert len(r.json()["items"]) == 50  # httpx decodes transparently
+    raw = c.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert int(r.headers["content-length"]) < int(raw.headers["content-length"])
+    small = c.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+def test_pick_encoding_respects_q_zero():
+    assert _pick_encoding("gzip;q=0, deflate") is None
+    assert _pick_encoding("deflate, gzip;q=0.5") == "gzip"
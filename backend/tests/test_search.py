@@ -0,0 +1,58 @@
+import re
+
+from app.services.search import search_filter, search_keys, ngrams, path_patterns
+
+def _matches(f, path):
+    """Evaluate a search_filter() dict against one image doc, like Mongo would."""
+    doc = {"image_path": path, **{f"search.{k}": v for k, v in search_keys(path).items()}}
+    def cond(field, c):
+        values = doc[field] if isinstance(doc[field], list) else [doc[field]]
+        if "$all" in c:
+            return all(v in values for v in c["$all"])
+        flags = re.I if c.get("$options") == "i" else 0
+        return any(re.search(c["$regex"], v, flags) for v in values)
+    return all(
+        any(_matches(sub, path) for sub in c) if k == "$or" else cond(k, c)
+        for k, c in f.items()
+    )
+
+def _hits(q, paths):
+    hits = [p for p in paths if _matches(search_filter(q), p)]
+    # the columnar scan patterns select the same images
+    assert hits == [p for p in paths if all(re.search(r, p.lower()) for r in path_patterns(q))]
+    return hits
+
+PATHS = ["crab/x.jpg", "ab/y.jpg", "images/train/dog_01.jpg", "images/val/cat.jpg", "lab.jpg"]
+
+def test_search_keys_normalize_path():
+    keys = search_keys("Images\\Train/Cat_01.JPG")
+    assert keys["name"] == "cat_01.jpg"
+    assert keys["segments"] == ["images", "train", "cat_01.jpg"]
+    assert "cat" in keys["grams"] and ".jp" in keys["grams"]
+
+def test_short_query_is_segment_prefix():
+    assert search_filter("Ca") == {"search.segments": {"$regex": "^ca"}}
+
+def test_substring_query_uses_grams():
+    f = search_filter("at_0")
+    grams_branch = f["$or"][0]
+    assert grams_branch["search.grams"] == {"$all": ngrams("at_0")}
+    assert grams_branch["search.name"] == {"$regex": "at_0"}
+
+def test_path_query_requires_whole_segments():
+    f = search_filter("images/train/cat")
+    assert f["search.segments"] == {"$all": ["train"]}
+    assert f["image_path"]["$regex"] == "images/train/cat"
+
+def test_blank_query():
+    assert search_filter("  ") == {}
+
+def test_trailing_slash_matches_segment_suffix():
+    assert search_filter("ab/")["search.segments"] == {"$regex": "ab$"}
+    assert _hits("ab/", PATHS) == ["crab/x.jpg", "ab/y.jpg"]
+
+def test_slash_queries_match_mid_segment():
+    assert _hits("rain/do", PATHS) == ["images/train/dog_01.jpg"]
+    assert _hits("ges/val/c", PATHS) == ["images/val/cat.jpg"]
+    assert _hits("/x.j", PATHS) == ["crab/x.jpg"]
+    assert _hits("al/dog", PATHS) == []
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from app.services.streaming import parse_range, if_range_matches, iter_blob, stream_blob, RangeNotSatisfiable
+import app.services.streaming as streaming
+
+def test_parse_range_forms():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    # ignored: other unit, multi-range, malformed, reversed
+    assert parse_range("items=0-1", 100) is None
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=abc", 100) is None
+    assert parse_range("bytes=9-3", 100) is None
+
+def test_parse_range_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+
+def test_if_range():
+    updated = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert if_range_matches(None, "abc", updated)
+    assert if_range_matches("abc", "abc", updated)
+    assert not if_range_matches("W/abc", "abc", updated)
+    assert if_range_matches("Tue, 02 Jan 2024 03:04:05 GMT", "abc", updated)
+    assert not if_range_matches("Tue, 02 Jan 2024 03:04:06 GMT", "abc", updated)
+
+class _Blob:
+    def __init__(self, data): self.data = data; self.reads = []
+    def download_as_bytes(self, start, end, if_generation_match=None):
+        self.reads.append((start, end))
+        return self.data[start:end + 1]
+
+def test_iter_blob_chunks(monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK", 4)
+    blob = _Blob(bytes(range(10)))
+    async def collect():
+        return [c async for c in iter_blob(blob, 1, 9)]
+    chunks = asyncio.run(collect())
+    assert b"".join(chunks) == bytes(range(1, 10))
+    assert blob.reads == [(1, 4), (5, 8), (9, 9)]
+
+class _GoneBlob:
+    def download_as_bytes(self, start, end, if_generation_match=None):
+        raise LookupError("gone")
+
+def test_stream_blob_reads_first_chunk_eagerly(monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK", 4)
+    blob = _Blob(bytes(range(10)))
+    async def run():
+        body = await stream_blob(blob, 0, 9)
+        assert blob.reads == [(0, 3)]
+        return b"".join([c async for c in body])
+    assert asyncio.run(run()) == bytes(range(10))
+
+def test_stream_blob_raises_before_body():
+    async def run():
+        await stream_blob(_GoneBlob(), 0, 9)
+    try:
+        asyncio.run(run())
+    except LookupError:
+        pass
+    else:
+        raise AssertionError("expected the read error up front")
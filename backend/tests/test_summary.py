@@ -0,0 +1,34 @@
+import os
+
+import pytest
+from bson import ObjectId
+
+from app.services.summary import dataset_counts_pipeline, summary_filter
+
+def test_empty_filter():
+    assert summary_filter() == {}
+
+def test_single_class_is_equality():
+    # plain equality keeps the (dataset_id, summary.classes, image_path) index usable for sort
+    assert summary_filter(cls=[3]) == {"summary.classes": 3}
+    assert summary_filter(cls=[5, 3, 5]) == {"summary.classes": {"$all": [3, 5]}}
+
+def test_ranges():
+    f = summary_filter(min_boxes=50, max_boxes=100, min_area=0.01, max_area=0.5)
+    assert f == {
+        "summary.box_count": {"$gte": 50, "$lte": 100},
+        "summary.min_area": {"$gte": 0.01},
+        "summary.max_area": {"$lte": 0.5},
+    }
+    assert summary_filter(min_boxes=0) == {"summary.box_count": {"$gte": 0}}
+
+def test_counts_pipeline_matches_worker(monkeypatch):
+    # backend migrations and the worker's recount_dataset must count the same way
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), "..", "..", "worker"))
+    mongo_io = pytest.importorskip("job.mongo_io")
+    oid = ObjectId()
+    assert dataset_counts_pipeline(oid) == mongo_io.counts_pipeline(oid)
+    # null class ids are dropped, like the worker's incremental _class_set
+    classes = dataset_counts_pipeline(oid)[1]["$project"]["classes"]["$setUnion"][0]["$filter"]
+    assert classes["cond"] == {"$ne": ["$$this", None]}
+    assert mongo_io._class_set([{"class_id": None}, {"class_id": 2}]) == {2}
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import uploads
+
+def _fake_sessions(monkeypatch, delay=0.02):
+    state = {"in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def start(object_name, content_type, origin=None):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(delay)
+        with lock:
+            state["in_flight"] -= 1
+        return f"https://upload/{object_name}"
+    monkeypatch.setattr(uploads, "start_resumable_session", start)
+    return state
+
+def test_folder_sessions_are_created_concurrently_in_order(monkeypatch):
+    state = _fake_sessions(monkeypatch)
+    c = TestClient(app)
+    files = [{"path": f"images/{i}.jpg", "content_type": "image/jpeg"} for i in range(100)]
+    r = c.post("/imports/folder/initiate", json={"dataset_name": "ds", "files": files})
+    body = r.json()
+    assert r.status_code == 200
+    assert [i["path"] for i in body["items"]] == [f["path"] for f in files]
+    assert all(i["upload_url"] == f"https://upload/{i['object_name']}" for i in body["items"])
+    assert 1 < state["peak"] <= uploads.INIT_CONCURRENCY  # overlapping, and bounded
+
+def test_paged_manifest_reuses_prefix(monkeypatch):
+    _fake_sessions(monkeypatch, delay=0)
+    c = TestClient(app)
+    first = c.post("/imports/folder/initiate", json={"dataset_name": "ds", "files": [{"path": "a.jpg", "content_type": "image/jpeg"}]}).json()
+    second = c.post("/imports/folder/initiate", json={
+        "dataset_name": "ds", "prefix": first["prefix"], "files": [{"path": "b.jpg", "content_type": "image/jpeg"}],
+    }).json()
+    assert second["prefix"] == first["prefix"]
+    assert second["items"][0]["gcs_uri"] == first["prefix"] + "b.jpg"
+
+def test_foreign_prefix_and_oversized_page_are_rejected(monkeypatch):
+    _fake_sessions(monkeypatch, delay=0)
+    c = TestClient(app)
+    spec = {"path": "a.jpg", "content_type": "image/jpeg"}
+    other = f"gs://{settings.GCS_BUCKET}/uploads/other/abc/"
+    assert c.post("/imports/folder/initiate", json={"dataset_name": "ds", "prefix": other, "files": [spec]}).status_code == 400
+    monkeypatch.setattr("app.routers.imports.INIT_MAX_FILES", 2)
+    assert c.post("/imports/folder/initiate", json={"dataset_name": "ds", "files": [spec] * 3}).status_code == 413
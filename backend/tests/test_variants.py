@@ -0,0 +1,111 @@
+import asyncio, concurrent.futures, io
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+import pytest
+from google.api_core.exceptions import NotFound
+from PIL import Image
+
+from app.cache import redis_cache, tiered
+from app.routers import images
+from app.services import variants
+
+def _png(w=400, h=200, mode="RGBA"):
+    buf = io.BytesIO()
+    Image.new(mode, (w, h), (200, 10, 10, 128) if mode == "RGBA" else (200, 10, 10)).save(buf, "PNG")
+    return buf.getvalue()
+
+def test_parse_spec():
+    assert variants.parse_spec(width=None, height=None, fmt=None, quality=None) is None
+    spec = variants.parse_spec(width=256, height=None, fmt="JPG", quality=None)
+    assert spec == {"w": 256, "h": variants.VARIANT_MAX_DIM, "fmt": "jpeg", "q": variants.DEFAULT_QUALITY}
+    for bad in ({"width": 0}, {"height": variants.VARIANT_MAX_DIM + 1}, {"fmt": "gif"}, {"quality": 101}):
+        args = {"width": None, "height": None, "fmt": None, "quality": None, **bad}
+        with pytest.raises(ValueError):
+            variants.parse_spec(**args)
+
+def test_with_format_keeps_encodable_source():
+    spec = variants.parse_spec(width=64, height=None, fmt=None, quality=None)
+    assert variants.with_format(spec, "image/png")["fmt"] == "png"
+    assert variants.with_format(spec, "image/bmp")["fmt"] == "webp"
+    assert variants.with_format({**spec, "fmt": "jpeg"}, "image/png")["fmt"] == "jpeg"
+
+def test_png_quality_does_not_split_the_cache():
+    specs = [variants.with_format(variants.parse_spec(width=64, height=None, fmt=None, quality=q), "image/png") for q in (None, 10, 90)]
+    assert {variants.cache_key("b", "a.png", "e", s) for s in specs} == {"var:b:a.png:e:64x2048.png"}
+    webp = [variants.with_format(variants.parse_spec(width=64, height=None, fmt="webp", quality=q), "image/png") for q in (10, 90)]
+    assert len({variants.object_name("p", "b", "a.png", "e", s) for s in webp}) == 2
+
+def test_render_fits_box_without_upscaling():
+    out = Image.open(io.BytesIO(variants.render(_png(), 100, 100, "jpeg", 70)))
+    assert (out.format, out.size, out.mode) == ("JPEG", (100, 50), "RGB")
+    out = Image.open(io.BytesIO(variants.render(_png(), 2000, 2000, "webp", 70)))
+    assert (out.format, out.size) == ("WEBP", (400, 200))
+    with pytest.raises(variants.RenderError):
+        variants.render(b"not an image", 100, 100, "png", 80)
+
+def test_render_async_uses_the_pool():
+    spec = variants.with_format(variants.parse_spec(width=50, height=None, fmt="png", quality=None), "")
+    try:
+        data = asyncio.run(variants.render_async(_png(mode="RGB"), spec))
+    finally:
+        variants.shutdown()
+    assert Image.open(io.BytesIO(data)).size == (50, 25)
+
+def test_broken_pool_is_replaced(monkeypatch):
+    class _Broken(concurrent.futures.Executor):
+        def submit(self, fn, *args, **kwargs):
+            raise BrokenProcessPool("worker died")
+    broken = _Broken()
+    monkeypatch.setattr(variants, "_pool", broken)
+    spec = variants.with_format(variants.parse_spec(width=50, height=None, fmt="png", quality=None), "")
+    with pytest.raises(variants.RenderUnavailable):
+        asyncio.run(variants.render_async(_png(mode="RGB"), spec))
+    assert variants._pool is None  # the next call spawns a fresh pool
+
+class _Blob:
+    def __init__(self, store, name, data=None):
+        self.store, self.name = store, name
+        if data is not None:
+            store[name] = data
+    def download_as_bytes(self, if_generation_match=None):
+        self.store.setdefault("reads", []).append(self.name)
+        if self.name not in self.store:
+            raise NotFound(self.name)
+        return self.store[self.name]
+    def upload_from_string(self, data, content_type=None):
+        self.store[self.name] = data
+
+def test_variant_rendered_once_then_served_from_gcs(monkeypatch):
+    async def miss(*a, **k): return None
+    monkeypatch.setattr(redis_cache, "get_bytes", miss)
+    monkeypatch.setattr(redis_cache, "set_bytes", miss)
+    store = {}
+    monkeypatch.setattr(images, "get_blob", lambda bucket, name: _Blob(store, name))
+    renders = []
+    async def render(data, spec):
+        renders.append(spec)
+        return variants.render(data, spec["w"], spec["h"], spec["fmt"], spec["q"])
+    monkeypatch.setattr(variants, "render_async", render)
+
+    src = _Blob(store, "ds/a.png", _png())
+    meta = {"etag": "e1", "generation": 1, "size": len(store["ds/a.png"]), "ctype": "image/png",
+            "updated": datetime.now(timezone.utc), "stored": True}
+    spec = variants.with_format(variants.parse_spec(width=40, height=None, fmt="webp", quality=None), meta["ctype"])
+    key = variants.cache_key("b", "ds/a.png", "e1", spec)
+
+    async def fetch():
+        data = await images._variant_bytes("b", "ds/a.png", src, meta, spec)
+        await asyncio.gather(*images._variant_uploads)
+        return data
+
+    first = asyncio.run(fetch())
+    assert len(renders) == 1 and Image.open(io.BytesIO(first)).size == (40, 20)
+    stored = variants.object_name(images.PREVIEW_BASE, "b", "ds/a.png", "e1", spec)
+    assert store[stored] == first
+
+    tiered.invalidate(key)  # another instance: nothing local, nothing in Redis
+    store["reads"].clear()
+    assert asyncio.run(fetch()) == first
+    assert len(renders) == 1 and store["reads"] == [stored]
+    tiered.invalidate(key)
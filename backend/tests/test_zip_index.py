@@ -0,0 +1,85 @@
+import asyncio, io, zipfile
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.services import zip_index
+from app.services.zip_index import scan_central_directory, read_member, UnsupportedMember
+
+class _Blob:
+    """Just enough of google.cloud.storage.Blob for ranged reads."""
+    def __init__(self, data: bytes):
+        self.data = data
+        self.ranges = []
+    def open(self, mode, chunk_size=None):
+        return io.BytesIO(self.data)
+    def download_as_bytes(self, start, end, if_generation_match=None):
+        self.ranges.append((start, end))
+        return self.data[start:end + 1]
+
+def _archive():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("ds/images/a.jpg", b"A" * 5000, compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("ds/images/b.png", b"PNGDATA", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("ds/labels/", b"")
+        zf.writestr("ds/labels/a.txt", b"0 0.5 0.5 0.1 0.1\n", compress_type=zipfile.ZIP_BZIP2)
+    return buf.getvalue()
+
+def test_scan_and_read_members_with_one_range_each():
+    blob = _Blob(_archive())
+    entries = {e["path"]: e for e in scan_central_directory(blob)}
+    assert set(entries) == {"ds/images/a.jpg", "ds/images/b.png", "ds/labels/a.txt"}
+    assert read_member(blob, entries["ds/images/a.jpg"], generation=None) == b"A" * 5000
+    assert read_member(blob, entries["ds/images/b.png"], generation=None) == b"PNGDATA"
+    assert read_member(blob, entries["ds/labels/a.txt"], generation=None).startswith(b"0 0.5")
+    assert len(blob.ranges) == 3
+
+def test_unsupported_method():
+    blob = _Blob(_archive())
+    entry = scan_central_directory(blob)[0]
+    with pytest.raises(UnsupportedMember):
+        read_member(blob, {**entry, "method": zipfile.ZIP_LZMA}, generation=None)
+
+class _Members:
+    """zip_members with the unique (dataset_id, path) index; the first upsert batch loses a race."""
+    def __init__(self, docs):
+        self.docs = {(d["dataset_id"], d["path"]): d for d in docs}
+        self.raced = False
+    async def bulk_write(self, ops, ordered=True):
+        dupes = []
+        for i, op in enumerate(ops):
+            if not self.raced:
+                dupes.append({"index": i, "code": 11000})  # another instance inserted it first
+                continue
+            self.docs[(op._filter["dataset_id"], op._filter["path"])] = op._doc
+        self.raced = True
+        if dupes:
+            raise BulkWriteError({"writeErrors": dupes})
+    async def delete_many(self, query):
+        for key, d in list(self.docs.items()):
+            if d["dataset_id"] == query["dataset_id"] and d.get("generation") != query["generation"]["$ne"]:
+                del self.docs[key]
+
+class _Datasets:
+    def __init__(self): self.marker = None
+    async def find_one(self, query, projection=None):
+        return {"zip_index": self.marker} if self.marker else {}
+    async def update_one(self, query, update):
+        self.marker = update["$set"]["zip_index"]
+
+class _Db:
+    def __init__(self, members):
+        self.zip_members, self.datasets = _Members(members), _Datasets()
+
+def test_index_build_tolerates_concurrent_builders():
+    blob = _Blob(_archive())
+    blob.generation = 7
+    blob.reload = lambda: None
+    oid = ObjectId()
+    db = _Db([{"dataset_id": oid, "path": "ds/images/old.jpg", "generation": 6}])
+
+    marker = asyncio.run(zip_index.ensure_index(db, str(oid), blob))
+    assert marker["generation"] == 7 and marker["members"] == 3
+    assert sorted(p for _, p in db.zip_members.docs) == ["ds/images/a.jpg", "ds/images/b.png", "ds/labels/a.txt"]
+    assert str(oid) not in zip_index._locks
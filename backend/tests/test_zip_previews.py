@@ -0,0 +1,83 @@
+import asyncio, io, zipfile
+
+from bson import ObjectId
+
+from app.services import zip_previews
+
+def _archive():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name in ("images/a.jpg", "images/locked.jpg", "images/b.jpg"):
+            zf.writestr(name, name.encode())
+        offset = zf.getinfo("images/locked.jpg").header_offset
+    data = bytearray(buf.getvalue())
+    # mark the member encrypted (zf.read then raises without a password): local + central header flags
+    data[offset + 6] |= 0x1
+    central = data.index(b"PK\x01\x02")
+    while data[central + 46:central + 46 + 17] != b"images/locked.jpg":
+        central = data.index(b"PK\x01\x02", central + 4)
+    data[central + 8] |= 0x1
+    return bytes(data)
+
+class _ZipBlob:
+    def __init__(self, data): self.data = data
+    def open(self, mode, chunk_size=None): return io.BytesIO(self.data)
+
+class _Bucket:
+    def __init__(self, fail=()): self.objects, self.fail = {}, set(fail)
+    def blob(self, name):
+        bucket = self
+        class _B:
+            def upload_from_string(self, data, content_type=None):
+                if name in bucket.fail:
+                    raise ConnectionError(name)
+                bucket.objects[name] = data
+        return _B()
+
+class _Cursor:
+    def __init__(self, docs): self.docs = docs
+    def sort(self, *a): return self
+    async def to_list(self, length=None): return self.docs
+
+class _Members:
+    def __init__(self, docs): self.docs = docs
+    def find(self, query, projection=None):
+        return _Cursor([d for d in self.docs if not d.get("preview")])
+    async def update_many(self, query, update):
+        for d in self.docs:
+            if d["path"] in query["path"]["$in"]:
+                d["preview"] = True
+
+class _Datasets:
+    def __init__(self): self.doc = {}
+    async def update_one(self, query, update):
+        for k, v in update["$set"].items():
+            self.doc[k] = v
+
+class _Db:
+    def __init__(self, members):
+        self.zip_members, self.datasets = _Members(members), _Datasets()
+
+def _members():
+    return [{"path": p, "name": p, "offset": i} for i, p in enumerate(["images/a.jpg", "images/locked.jpg", "images/b.jpg"])]
+
+def _run(db, bucket, monkeypatch):
+    async def index(db, dataset_id, zblob):
+        return {"members": 3}
+    monkeypatch.setattr(zip_previews.zip_index, "ensure_index", index)
+    asyncio.run(zip_previews._materialize(db, str(ObjectId()), _ZipBlob(_archive()), bucket, "previews/ds"))
+
+def test_unreadable_member_is_skipped(monkeypatch):
+    db, bucket = _Db(_members()), _Bucket()
+    _run(db, bucket, monkeypatch)
+    assert db.datasets.doc["preview.state"] == "done"
+    assert sorted(bucket.objects) == ["previews/ds/images/a.jpg", "previews/ds/images/b.jpg"]
+    assert [m.get("preview", False) for m in db.zip_members.docs] == [True, False, True]
+
+def test_failed_upload_fails_the_pass(monkeypatch):
+    db, bucket = _Db(_members()), _Bucket(fail={"previews/ds/images/b.jpg"})
+    _run(db, bucket, monkeypatch)
+    assert db.datasets.doc["preview.state"] == "failed" and "preview.failed_at" in db.datasets.doc
+    assert "1 preview uploads failed" in db.datasets.doc["preview.error"]
+    # the member that made it is flagged, so a retried pass only redoes the rest
+    assert [m.get("preview", False) for m in db.zip_members.docs] == [True, False, False]
@@ -1,4 +1,7 @@
-import base64, json, os, structlog, requests
+import asyncio, base64, json, os, random, time, structlog, httpx
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
 from fastapi import FastAPI, Header, HTTPException, Request
 from google.auth import default
 from google.auth.transport.requests import Request as GARequest
@@ -8,25 +11,323 @@ REGION  = os.getenv("GCP_REGION")
 JOB_NAME= os.getenv("JOB_NAME")
 DISPATCHER_TOKEN = os.getenv("DISPATCHER_TOKEN")
 RUN_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
-RUN_ENDPOINT = f"https://run.googleapis.com/v2/projects/{PROJECT}/locations/{REGION}/jobs/{JOB_NAME}:run"
-def _auth_headers():
-    creds, _ = default(scopes=[RUN_SCOPE])
-    if creds.requires_scopes: creds = creds.with_scopes([RUN_SCOPE])
-    authed = GARequest(); creds.refresh(authed)
-    return {"Authorization": f"Bearer {creds.token}"}
+RUN_API = os.getenv("RUN_API_BASE", "https://run.googleapis.com").rstrip("/")
+RUN_ENDPOINT = f"{RUN_API}/v2/projects/{PROJECT}/locations/{REGION}/jobs/{JOB_NAME}:run"
+# Run Admin API calls: per-attempt timeouts, retries for rejected/unreachable calls
+# within an overall budget, pooled keep-alive connections
+RUN_CONNECT_TIMEOUT = float(os.getenv("RUN_CONNECT_TIMEOUT", "5"))
+RUN_TIMEOUT         = float(os.getenv("RUN_TIMEOUT", "30"))
+RUN_RETRIES         = int(os.getenv("RUN_RETRIES", "3"))
+RUN_RETRY_BUDGET    = float(os.getenv("RUN_RETRY_BUDGET", "20"))   # seconds across all attempts
+RUN_MAX_CONNECTIONS = int(os.getenv("RUN_MAX_CONNECTIONS", "32"))
+TOKEN_REFRESH_MARGIN= int(os.getenv("TOKEN_REFRESH_MARGIN", "300")) # refresh this long before expiry
+# A push is held open until its execution is launched; the whole hold (coalescing, admission
+# queue, Run API attempts) must end before the subscription's ack deadline, or Pub/Sub
+# redelivers while the first delivery is still in flight. Every batch gets one deadline,
+# ACK_DEADLINE - ACK_MARGIN seconds after its first push, and each stage stops at it.
+ACK_DEADLINE = float(os.getenv("ACK_DEADLINE", "60"))   # ack_deadline_seconds of ingestion-push (run.tf)
+ACK_MARGIN   = float(os.getenv("ACK_MARGIN", "5"))      # reply this long before it
+# Pushes for the same dataset within COALESCE_WINDOW seconds of each other become one
+# execution (capped at COALESCE_MAX_WAIT after the first and COALESCE_MAX_URIS URIs).
+COALESCE_WINDOW   = float(os.getenv("COALESCE_WINDOW", "2"))      # 0 = dispatch without waiting
+COALESCE_MAX_WAIT = float(os.getenv("COALESCE_MAX_WAIT", "10"))
+COALESCE_MAX_URIS = int(os.getenv("COALESCE_MAX_URIS", "200"))
+# Admission: at most MAX_CONCURRENT_EXECUTIONS running executions (held until the run's
+# operation is done, polled every EXEC_POLL_SECONDS, released after EXEC_MAX_SECONDS at the
+# latest); queued work is picked cheapest-first, with cost divided by (1 + age/QUEUE_AGING_SECONDS)
+# so big imports still get through. A push not admitted within QUEUE_MAX_WAIT gets 503 and is
+# redelivered; its age counts from publishTime, so it keeps its place. The queue wait also
+# ends early enough to leave one full RUN_TIMEOUT attempt before the batch deadline.
+MAX_CONCURRENT_EXECUTIONS = int(os.getenv("MAX_CONCURRENT_EXECUTIONS", "4"))
+QUEUE_MAX_WAIT     = float(os.getenv("QUEUE_MAX_WAIT", "25"))
+QUEUE_AGING_SECONDS= float(os.getenv("QUEUE_AGING_SECONDS", "60"))
+UNKNOWN_URI_BYTES  = int(os.getenv("UNKNOWN_URI_BYTES", str(256 * 1024 * 1024)))  # cost of a URI without size_bytes
+EXEC_POLL_SECONDS  = float(os.getenv("EXEC_POLL_SECONDS", "15"))
+EXEC_MAX_SECONDS   = float(os.getenv("EXEC_MAX_SECONDS", "3600"))
+# Message ids already dispatched (redeliveries are answered without a new execution)
+LEDGER_TTL         = float(os.getenv("LEDGER_TTL", "86400"))
+LEDGER_MAX         = int(os.getenv("LEDGER_MAX", "100000"))
+# 429 and gateway errors mean the run was not started, so retrying can't launch a
+# duplicate job; a read timeout might have, so it is not retried
+RETRY_STATUS = {429, 502, 503, 504}
 
-@app.post("/pubsub/push")
-async def pubsub_push(request: Request):
+class TokenCache:
+    """ADC credentials loaded once, refreshed off the event loop shortly before expiry."""
+    def __init__(self, margin: int = TOKEN_REFRESH_MARGIN):
+        self.creds = None; self.margin = margin; self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        c = self.creds
+        if c is None or not c.token: return False
+        if c.expiry is None: return True
+        return (c.expiry.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds() > self.margin
+
+    def _refresh(self) -> None:
+        if self.creds is None:
+            creds, _ = default(scopes=[RUN_SCOPE])
+            if creds.requires_scopes: creds = creds.with_scopes([RUN_SCOPE])
+            self.creds = creds
+        self.creds.refresh(GARequest())
+
+    async def headers(self) -> dict:
+        if not self._fresh():
+            async with self._lock:  # one refresh for a burst of callers
+                if not self._fresh():
+                    await asyncio.to_thread(self._refresh)
+                    log.info("auth.refreshed", expiry=str(self.creds.expiry))
+        return {"Authorization": f"Bearer {self.creds.token}"}
+
+    def invalidate(self) -> None:
+        if self.creds is not None: self.creds.token = None
+
+tokens = TokenCache()
+_http: Optional[httpx.AsyncClient] = None
+
+def http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(RUN_TIMEOUT, connect=RUN_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=RUN_MAX_CONNECTIONS, max_keepalive_connections=RUN_MAX_CONNECTIONS),
+        )
+    return _http
+
+
+def hold_deadline(first: float) -> float:
+    """Monotonic time by which a push that arrived at `first` must be answered."""
+    return first + ACK_DEADLINE - ACK_MARGIN
+
+async def run_job(payload: dict, deadline: Optional[float] = None) -> httpx.Response:
+    """
+    POST jobs:run with retries on 429/502/503/504, connect failures and one stale-token 401.
+    Attempts stop at `deadline` (monotonic): none starts without RUN_CONNECT_TIMEOUT left,
+    and each one's timeouts are cut to the time remaining.
+    """
+    body = {"overrides": {"containerOverrides": [{"args": ["--payload", json.dumps(payload)]}]}}
+    budget = time.monotonic() + RUN_RETRY_BUDGET
+    deadline = budget if deadline is None else deadline
+    budget = min(budget, deadline)
+    reauthed = False; r = None; reason = "hold deadline reached"
+    for attempt in range(RUN_RETRIES + 1):
+        left = deadline - time.monotonic()
+        if left < RUN_CONNECT_TIMEOUT: break
+        try:
+            timeout = httpx.Timeout(min(RUN_TIMEOUT, left), connect=RUN_CONNECT_TIMEOUT)
+            r = await http().post(RUN_ENDPOINT, headers=await tokens.headers(), json=body, timeout=timeout)
+            if r.status_code == 401 and not reauthed:
+                tokens.invalidate(); reauthed = True; continue
+            if r.status_code not in RETRY_STATUS: return r
+            reason = r.status_code
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            r = None; reason = type(e).__name__
+        delay = min(8.0, 0.25 * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if attempt == RUN_RETRIES or time.monotonic() + delay > budget: break
+        log.warning("runjob.retry", attempt=attempt + 1, reason=reason, delay=round(delay, 2))
+        await asyncio.sleep(delay)
+    if r is None: raise HTTPException(503, f"Run API unreachable: {reason}")
+    return r
+
+def _published_at(msg: dict) -> float:
+    """Pub/Sub publishTime as epoch seconds (now when absent); survives redelivery."""
+    try: return datetime.fromisoformat(msg["publishTime"]).timestamp()
+    except (KeyError, TypeError, ValueError): return time.time()
+
+def _cost(payload: dict) -> int:
+    uris = payload.get("gcs_uris") or [payload.get("gcs_uri")]
+    return int(payload.get("size_bytes") or UNKNOWN_URI_BYTES * len(uris))
+
+class Ledger:
+    """Message id -> dispatch outcome future. Redeliveries share it; failures are forgotten so redelivery retries."""
+    def __init__(self, ttl: float = LEDGER_TTL, max_entries: int = LEDGER_MAX):
+        self.ttl, self.max = ttl, max_entries; self.entries: OrderedDict = OrderedDict()  # id -> (expires, future)
+        self.stats = {"duplicates": 0}
+
+    def get(self, mid: str) -> Optional[asyncio.Future]:
+        e = self.entries.get(mid)
+        if e is None: return None
+        if e[0] < time.monotonic(): del self.entries[mid]; return None
+        self.stats["duplicates"] += 1; return e[1]
+
+    def track(self, mid: str, fut: asyncio.Future) -> None:
+        self.entries[mid] = (time.monotonic() + self.ttl, fut)
+        while len(self.entries) > self.max: self.entries.popitem(last=False)
+        def settled(f: asyncio.Future) -> None:
+            if f.cancelled() or f.exception() is not None:
+                e = self.entries.get(mid)
+                if e and e[1] is f: del self.entries[mid]
+        fut.add_done_callback(settled)
+
+class _Ticket:
+    def __init__(self, payload: dict, cost: int, published: float):
+        self.payload, self.cost, self.published = payload, cost, published
+        self.enqueued = time.time(); self.granted = asyncio.get_running_loop().create_future()
+        self.operation: Optional[str] = None; self.started: Optional[float] = None
+
+    def priority(self, now: float) -> float:
+        return self.cost / (1 + max(0.0, now - self.published) / QUEUE_AGING_SECONDS)
+
+    def describe(self, now: float) -> dict:
+        p = self.payload
+        return {"dataset_name": p.get("dataset_name"), "uris": len(p.get("gcs_uris") or [p.get("gcs_uri")]),
+                "cost": self.cost, "age_s": round(now - self.published, 1), "priority": round(self.priority(now)),
+                **({"operation": self.operation, "running_s": round(now - self.started, 1)} if self.started else
+                   {"queued_s": round(now - self.enqueued, 1)})}
+
+class Admission:
+    """Caps running executions; waiting work is admitted lowest aged cost first."""
+    def __init__(self, limit: int = MAX_CONCURRENT_EXECUTIONS):
+        self.limit = limit; self.queue: list = []; self.running: set = set(); self.tasks: set = set()
+        self.stats = {"admitted": 0, "timed_out": 0, "released": 0}
+
+    def _pump(self) -> None:
+        now = time.time()
+        while self.queue and len(self.running) < self.limit:
+            t = min(self.queue, key=lambda t: t.priority(now))
+            self.queue.remove(t); self.running.add(t); t.started = now
+            self.stats["admitted"] += 1; t.granted.set_result(None)
+
+    async def acquire(self, payload: dict, cost: int, published: float, deadline: Optional[float] = None) -> _Ticket:
+        t = _Ticket(payload, cost, published); self.queue.append(t); self._pump()
+        wait = QUEUE_MAX_WAIT
+        if deadline is not None: wait = max(0.0, min(wait, deadline - RUN_TIMEOUT - time.monotonic()))
+        try:
+            await asyncio.wait_for(asyncio.shield(t.granted), wait)
+        except asyncio.TimeoutError:
+            if not t.granted.done():
+                self.queue.remove(t); self.stats["timed_out"] += 1
+                raise HTTPException(503, "dispatch queue full, retry later")
+        return t
+
+    def release(self, t: _Ticket) -> None:
+        if t in self.running:
+            self.running.discard(t); self.stats["released"] += 1; self._pump()
+
+    def watch(self, t: _Ticket) -> None:
+        """Hold the slot until the execution's operation reports done."""
+        task = asyncio.create_task(self._watch(t)); self.tasks.add(task); task.add_done_callback(self.tasks.discard)
+
+    async def _watch(self, t: _Ticket) -> None:
+        try:
+            while time.time() - t.started < EXEC_MAX_SECONDS:
+                await asyncio.sleep(EXEC_POLL_SECONDS)
+                try:
+                    r = await http().get(f"{RUN_API}/v2/{t.operation}", headers=await tokens.headers())
+                    if r.status_code == 404 or (r.status_code < 300 and r.json().get("done")): return
+                except (httpx.HTTPError, ValueError) as e:
+                    log.warning("execution.poll_failed", operation=t.operation, reason=type(e).__name__)
+            log.warning("execution.slot_expired", operation=t.operation)
+        finally:
+            self.release(t)
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {"limit": self.limit,
+                "running": [t.describe(now) for t in sorted(self.running, key=lambda t: t.started)],
+                "queued": [t.describe(now) for t in sorted(self.queue, key=lambda t: t.priority(now))],
+                "stats": dict(self.stats)}
+
+ledger = Ledger()
+admission = Admission()
+
+@app.on_event("shutdown")
+async def _close_http():
+    global _http
+    for t in list(admission.tasks): t.cancel()
+    await asyncio.gather(*admission.tasks, return_exceptions=True)
+    if _http is not None: await _http.aclose(); _http = None
+
+async def dispatch(payload: dict, cost: int, published: float, deadline: Optional[float] = None) -> dict:
+    """Wait for an execution slot, launch the job, keep the slot until the execution ends; all by `deadline`."""
+    t = await admission.acquire(payload, cost, published, deadline)
+    try:
+        r = await run_job(payload, deadline)
+        if r.status_code >= 300:
+            log.error("runjob.error", status=r.status_code, text=r.text); raise HTTPException(r.status_code, r.text)
+        t.operation = r.json().get("name")
+    except BaseException:
+        admission.release(t); raise
+    if t.operation: admission.watch(t)
+    else: admission.release(t)
+    return {"status": "ok", "operation": t.operation}
+
+class _Batch:
+    def __init__(self, payload: dict):
+        self.payload = payload; self.uris: dict = {}; self.waiters: list = []; self.cost = 0
+        self.first = time.monotonic(); self.published = time.time(); self.timer: Optional[asyncio.TimerHandle] = None
+
+class Coalescer:
+    """
+    Buffers pushes per (dataset_name, format) and launches one execution with the
+    merged, de-duplicated gcs_uris. add() returns the batch's shared outcome; the push
+    is held open on it, so the 2xx (ack) or error (redelivery) reflects the real outcome.
+    """
+    def __init__(self, window: float = COALESCE_WINDOW, max_wait: float = COALESCE_MAX_WAIT, max_uris: int = COALESCE_MAX_URIS):
+        self.window, self.max_wait, self.max_uris = window, max_wait, max_uris
+        self.pending: dict = {}; self.tasks: set = set(); self.stats = {"messages": 0, "executions": 0}
+
+    def add(self, payload: dict, published: float) -> asyncio.Future:
+        self.stats["messages"] += 1
+        uris = payload.get("gcs_uris") or [payload.get("gcs_uri")]
+        key = (payload.get("dataset_name"), payload.get("format", "yolo"))
+        b = self.pending.get(key)
+        if b is None: b = self.pending[key] = _Batch(payload)
+        b.uris.update(dict.fromkeys(u for u in uris if u))
+        b.cost += _cost(payload); b.published = min(b.published, published)
+        fut = asyncio.get_running_loop().create_future(); b.waiters.append(fut)
+        if b.timer: b.timer.cancel()
+        if len(b.uris) >= self.max_uris: self._flush(key)
+        else:
+            # coalescing may not eat the time admission and the first Run API attempt need
+            flush_by = min(b.first + self.max_wait, hold_deadline(b.first) - RUN_TIMEOUT)
+            delay = min(self.window, flush_by - time.monotonic())
+            b.timer = asyncio.get_running_loop().call_later(max(0.0, delay), self._flush, key)
+        return fut
+
+    def _flush(self, key) -> None:
+        b = self.pending.pop(key, None)
+        if b is None: return
+        if b.timer: b.timer.cancel()
+        t = asyncio.create_task(self._dispatch(b)); self.tasks.add(t); t.add_done_callback(self.tasks.discard)
+
+    async def _dispatch(self, b: _Batch) -> None:
+        payload = {k: v for k, v in b.payload.items() if k not in ("gcs_uri", "size_bytes")}; payload["gcs_uris"] = list(b.uris)
+        self.stats["executions"] += 1
+        log.info("dispatch.batch", dataset=payload.get("dataset_name"), messages=len(b.waiters), uris=len(b.uris))
+        try:
+            result = {**await dispatch(payload, b.cost, b.published, hold_deadline(b.first)), "coalesced": len(b.waiters)}
+        except Exception as e:
+            for w in b.waiters:
+                if not w.done(): w.set_exception(e)
+            return
+        for w in b.waiters:
+            if not w.done(): w.set_result(result)
+
+coalescer = Coalescer()
+
+def _check_token(x_dispatch_token: Optional[str]) -> None:
     if DISPATCHER_TOKEN and x_dispatch_token != DISPATCHER_TOKEN:
         raise HTTPException(status_code=401, detail="invalid token")
+
+@app.post("/pubsub/push")
+async def pubsub_push(request: Request, x_dispatch_token: Optional[str] = Header(default=None)):
+    _check_token(x_dispatch_token)
     body = await request.json(); msg = body.get("message", {}); data_b64 = msg.get("data")
     if not data_b64: raise HTTPException(400, "No data in Pub/Sub message")
     payload = json.loads(base64.b64decode(data_b64))
-    log.info("pubsub.received", payload=payload)
-    headers = _auth_headers()
-    r = requests.post(RUN_ENDPOINT, headers=headers, json={
-        "overrides": {"containerOverrides": [{"args": ["--payload", json.dumps(payload)]}]}
-    }, timeout=30)
-    if r.status_code >= 300:
-        log.error("runjob.error", status=r.status_code, text=r.text); raise HTTPException(r.status_code, r.text)
-    return {"status": "ok", "operation": r.json().get("name")}
+    mid = msg.get("messageId") or msg.get("message_id")
+    log.info("pubsub.received", payload=payload, message_id=mid)
+    if mid and (prior := ledger.get(mid)) is not None:
+        log.info("pubsub.duplicate", message_id=mid)
+        return {**await asyncio.shield(prior), "duplicate": True}
+    outcome = coalescer.add(payload, _published_at(msg))
+    if mid: ledger.track(mid, outcome)
+    return await asyncio.shield(outcome)  # a dropped push must not cancel the shared dispatch
+
+@app.get("/queue")
+async def queue_state(x_dispatch_token: Optional[str] = Header(default=None)):
+    """Running executions, admission queue (in pick order), open coalescing windows, ledger size."""
+    _check_token(x_dispatch_token)
+    return {**admission.snapshot(),
+            "coalescing": [{"dataset_name": k[0], "format": k[1], "messages": len(b.waiters), "uris": len(b.uris)}
+                           for k, b in coalescer.pending.items()],
+            "ledger": {"entries": len(ledger.entries), **ledger.stats}, "coalescer": dict(coalescer.stats)}
@@ -0,0 +1,93 @@
+"""
+Dispatch throughput against the local Run API mock: the current handler
+(cached token, pooled async client, per-dataset coalescing) vs. the previous
+one (token refresh, a blocking requests.post and one execution per push).
+`runs` is the number of job executions the mock saw, `max_running` the most
+that ran at once (capped by --max-executions).
+
+    cd dispatcher && python -m benchmarks.bench_dispatch --pushes 400 --concurrency 32 --datasets 8
+"""
+import argparse, asyncio, base64, json, os, socket, statistics, subprocess, sys, time
+import httpx, requests
+from fastapi import FastAPI, HTTPException, Request
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def _credentials(base: str):
+    from google.oauth2.credentials import Credentials
+    return Credentials(token=None, refresh_token="bench", token_uri=f"{base}/token", client_id="bench", client_secret="bench")
+
+def legacy_app(base: str, endpoint: str) -> FastAPI:
+    """The handler as it was: ADC refresh plus a synchronous POST inside the async endpoint."""
+    from google.auth.transport.requests import Request as GARequest
+    app = FastAPI()
+
+    @app.post("/pubsub/push")
+    async def pubsub_push(request: Request):
+        body = await request.json(); payload = json.loads(base64.b64decode(body["message"]["data"]))
+        creds = _credentials(base); creds.refresh(GARequest())
+        r = requests.post(endpoint, headers={"Authorization": f"Bearer {creds.token}"}, json={
+            "overrides": {"containerOverrides": [{"args": ["--payload", json.dumps(payload)]}]}
+        }, timeout=30)
+        if r.status_code >= 300: raise HTTPException(r.status_code, r.text)
+        return {"status": "ok", "operation": r.json().get("name")}
+    return app
+
+async def drive(app: FastAPI, pushes: int, concurrency: int, datasets: int) -> dict:
+    sem = asyncio.Semaphore(concurrency); lat = []; errors = 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://dispatcher", timeout=120) as c:
+        async def one(i: int):
+            nonlocal errors
+            data = base64.b64encode(json.dumps({"dataset_name": f"ds{i % datasets}", "gcs_uri": f"gs://b/{i}.zip", "format": "yolo"}).encode()).decode()
+            async with sem:
+                t0 = time.perf_counter()
+                r = await c.post("/pubsub/push", json={"message": {"data": data, "messageId": str(i)}})
+                lat.append(time.perf_counter() - t0); errors += r.status_code != 200
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(pushes)))
+        wall = time.perf_counter() - t0
+    lat.sort(); ms = lambda v: round(v * 1000, 1)
+    return {"rps": round(pushes / wall, 1), "p50_ms": ms(statistics.median(lat)),
+            "p95_ms": ms(lat[int(len(lat) * 0.95) - 1]), "errors": errors}
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pushes", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--run-ms", type=float, default=40)
+    ap.add_argument("--token-ms", type=float, default=80)
+    ap.add_argument("--datasets", type=int, default=8, help="pushes are spread over this many dataset names")
+    ap.add_argument("--window", type=float, default=0.5, help="COALESCE_WINDOW for the new handler (0 = off)")
+    ap.add_argument("--exec-ms", type=float, default=200, help="how long each mock execution runs")
+    ap.add_argument("--max-executions", type=int, default=64, help="MAX_CONCURRENT_EXECUTIONS for the new handler")
+    args = ap.parse_args()
+
+    port = _free_port(); base = f"http://127.0.0.1:{port}"
+    mock = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_run", "--port", str(port),
+                             "--run-ms", str(args.run_ms), "--token-ms", str(args.token_ms), "--exec-ms", str(args.exec_ms)])
+    try:
+        for _ in range(100):
+            try: requests.get(f"{base}/stats", timeout=1); break
+            except requests.ConnectionError: time.sleep(0.1)
+        os.environ.update(RUN_API_BASE=base, COALESCE_WINDOW=str(args.window), EXEC_POLL_SECONDS="0.05",
+                          MAX_CONCURRENT_EXECUTIONS=str(args.max_executions), QUEUE_MAX_WAIT="60", GCP_PROJECT_ID="bench", GCP_REGION="local", JOB_NAME="job")
+        os.environ.pop("DISPATCHER_TOKEN", None)
+        import app as dispatcher
+        dispatcher.tokens.creds = _credentials(base)
+
+        async def bench(target: FastAPI) -> dict:
+            try: return await drive(target, args.pushes, args.concurrency, args.datasets)
+            finally: await dispatcher._close_http()  # the shared client belongs to this loop
+
+        for name, target in (("before", legacy_app(base, dispatcher.RUN_ENDPOINT)), ("after", dispatcher.app)):
+            requests.post(f"{base}/stats/reset", timeout=5)
+            res = asyncio.run(bench(target))
+            res.update(requests.get(f"{base}/stats", timeout=5).json())
+            print(f"{name:<7} " + "  ".join(f"{k}={v}" for k, v in res.items()))
+    finally:
+        mock.terminate(); mock.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Local stand-in for the Cloud Run Admin API (jobs:run, operations.get) and an
+OAuth token endpoint, with configurable latency; executions report done
+--exec-ms after they were started:
+
+    python -m benchmarks.mock_run --port 8099 --run-ms 40 --token-ms 80 --exec-ms 500
+"""
+import argparse, asyncio, itertools, time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def build(run_ms: float, token_ms: float, fail_every: int = 0, exec_ms: float = 0) -> FastAPI:
+    app = FastAPI(); ops = itertools.count(1); started = {}
+    stats = {"runs": 0, "tokens": 0, "connections": set(), "max_running": 0}
+
+    def running() -> int:
+        now = time.monotonic()
+        return sum(1 for t in started.values() if now - t < exec_ms / 1000)
+
+    @app.post("/token")
+    async def token():
+        stats["tokens"] += 1
+        await asyncio.sleep(token_ms / 1000)
+        return {"access_token": "mock", "expires_in": 3600, "token_type": "Bearer"}
+
+    @app.post("/v2/projects/{project}/locations/{region}/jobs/{job}:run")
+    async def run(project: str, region: str, job: str, request: Request):
+        n = next(ops); stats["runs"] += 1
+        stats["connections"].add(request.client.port if request.client else None)
+        await asyncio.sleep(run_ms / 1000)
+        if fail_every and n % fail_every == 0:
+            return JSONResponse({"error": "unavailable"}, status_code=503)
+        started[n] = time.monotonic(); stats["max_running"] = max(stats["max_running"], running())
+        return {"name": f"projects/{project}/locations/{region}/operations/op-{n}"}
+
+    @app.get("/v2/projects/{project}/locations/{region}/operations/{op}")
+    async def operation(project: str, region: str, op: str):
+        t = started.get(int(op.rsplit("-", 1)[-1]))
+        if t is None: return JSONResponse({"error": "not found"}, status_code=404)
+        return {"name": op, "done": time.monotonic() - t >= exec_ms / 1000}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"runs": stats["runs"], "tokens": stats["tokens"], "connections": len(stats["connections"]),
+                "max_running": stats["max_running"]}
+
+    @app.post("/stats/reset")
+    async def reset():
+        stats.update(runs=0, tokens=0, connections=set(), max_running=0); started.clear(); return {}
+    return app
+
+def main() -> None:
+    import uvicorn
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--run-ms", type=float, default=40)
+    ap.add_argument("--token-ms", type=float, default=80)
+    ap.add_argument("--fail-every", type=int, default=0, help="answer every Nth run with 503")
+    ap.add_argument("--exec-ms", type=float, default=0, help="how long a started execution runs")
+    args = ap.parse_args()
+    uvicorn.run(build(args.run_ms, args.token_ms, args.fail_every, args.exec_ms), host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
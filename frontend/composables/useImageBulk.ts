@@ -0,0 +1,96 @@
+// Fetch a whole grid page of images in one multipart/mixed response
+// (POST /datasets/:id/images/bulk) and hand each part out as an object URL.
+// Parts arrive in completion order; every part carries its own Content-Length.
+
+type BulkPart = { path: string; status: number; type: string; body: Uint8Array }
+
+const enc = new TextEncoder()
+const dec = new TextDecoder('latin1')
+
+function indexOf(buf: Uint8Array, needle: Uint8Array, from = 0): number {
+  outer: for (let i = from; i <= buf.length - needle.length; i++) {
+    for (let j = 0; j < needle.length; j++) if (buf[i + j] !== needle[j]) continue outer
+    return i
+  }
+  return -1
+}
+
+async function* readParts(res: Response): AsyncGenerator<BulkPart> {
+  const m = (res.headers.get('Content-Type') || '').match(/boundary=([^;]+)/)
+  if (!m || !res.body) throw new Error('not a multipart response')
+  const delim = enc.encode(`--${m[1]}`)
+  const crlf2 = enc.encode('\r\n\r\n')
+  const reader = res.body.getReader()
+  let buf = new Uint8Array(0)
+  let done = false
+
+  const pull = async () => {
+    const r = await reader.read()
+    if (r.done) { done = true; return }
+    const next = new Uint8Array(buf.length + r.value.length)
+    next.set(buf); next.set(r.value, buf.length); buf = next
+  }
+
+  while (true) {
+    let at = indexOf(buf, delim)
+    while (at < 0 || buf.length < at + delim.length + 2) { if (done) return; await pull(); at = indexOf(buf, delim) }
+    if (buf[at + delim.length] === 0x2d) return // closing "--boundary--"
+    let hdrEnd = indexOf(buf, crlf2, at)
+    while (hdrEnd < 0) { if (done) return; await pull(); hdrEnd = indexOf(buf, crlf2, at) }
+    const headers: Record<string, string> = {}
+    for (const line of dec.decode(buf.subarray(at + delim.length + 2, hdrEnd)).split('\r\n')) {
+      const i = line.indexOf(':'); if (i > 0) headers[line.slice(0, i).trim().toLowerCase()] = line.slice(i + 1).trim()
+    }
+    const start = hdrEnd + crlf2.length
+    const len = Number(headers['content-length'] || 0)
+    while (buf.length < start + len + 2) { if (done) return; await pull() }
+    yield {
+      path: decodeURIComponent(headers['x-image-path'] || ''),
+      status: Number(headers['x-image-status'] || 200),
+      type: headers['content-type'] || 'application/octet-stream',
+      body: buf.slice(start, start + len),
+    }
+    buf = buf.slice(start + len + 2)
+  }
+}
+
+export function useImageBulk(base: string) {
+  const urls = reactive(new Map<string, string>())
+  const pending = ref(false)
+  let ctrl: AbortController | null = null
+
+  function clear() {
+    ctrl?.abort(); ctrl = null
+    for (const u of urls.values()) URL.revokeObjectURL(u)
+    urls.clear()
+  }
+
+  // Fills `urls` as parts stream in; paths that come back non-200 are simply left out
+  // so callers fall back to the single-image endpoint for them.
+  async function load(datasetId: string, paths: string[]) {
+    clear()
+    if (!paths.length) return
+    const c = (ctrl = new AbortController())
+    pending.value = true
+    try {
+      const res = await fetch(`${base}/datasets/${datasetId}/images/bulk`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ paths }),
+        signal: c.signal,
+      })
+      if (!res.ok) return
+      for await (const part of readParts(res)) {
+        if (c.signal.aborted) return
+        if (part.status === 200) urls.set(part.path, URL.createObjectURL(new Blob([part.body], { type: part.type })))
+      }
+    } catch (e: any) {
+      if (e?.name !== 'AbortError') console.warn('bulk image fetch failed', e)
+    } finally {
+      if (ctrl === c) pending.value = false
+    }
+  }
+
+  onBeforeUnmount(clear)
+  return { urls, pending, load, clear }
+}
@@ -0,0 +1,26 @@
+type FileSpec = { path: string, content_type: string }
+type InitItem = { path: string, upload_url: string, gcs_uri: string, object_name: string }
+type InitPage = { prefix: string, items: InitItem[] }
+type Post = <T>(path: string, body: any) => Promise<T>
+
+// Matches the backend's UPLOAD_INIT_MAX_FILES default (1000) with headroom.
+export const MANIFEST_PAGE = 500
+
+/**
+ * Initiate a large upload manifest page by page (the first page fixes the prefix),
+ * requesting page N+1 while the caller uploads page N.
+ */
+export async function* initiatePages($post: Post, endpoint: string, datasetName: string, specs: FileSpec[], pageSize = MANIFEST_PAGE): AsyncGenerator<InitPage & { offset: number }> {
+  const first = await $post<InitPage>(endpoint, { dataset_name: datasetName, files: specs.slice(0, pageSize) })
+  const prefix = first.prefix
+  let current: Promise<InitPage> = Promise.resolve(first)
+  for (let offset = 0; offset < specs.length; offset += pageSize) {
+    const page = await current
+    const nextOffset = offset + pageSize
+    if (nextOffset < specs.length) {
+      current = $post<InitPage>(endpoint, { dataset_name: datasetName, prefix, files: specs.slice(nextOffset, nextOffset + pageSize) })
+      current.catch(() => {}) // surfaced when awaited on the next iteration
+    }
+    yield { ...page, offset }
+  }
+}
@@ -28,4 +28,20 @@ resource "google_cloud_run_v2_service_iam_member" "dispatcher_invoker" {
   member = "serviceAccount:service-${data.google_project.project.number}@gcp-sa-pubsub.iam.gserviceaccount.com"
 }
 
+# Pull mode: the worker consumes ingestion-pull and checks the topic has no push subscription
+resource "google_pubsub_subscription_iam_member" "worker_pull" {
+  count        = var.ingestion_mode == "pull" ? 1 : 0
+  subscription = google_pubsub_subscription.ingestion_pull[0].name
+  role         = "roles/pubsub.subscriber"
+  member       = "serviceAccount:${google_service_account.worker_sa.email}"
+}
+
+# read-only: list the topic's subscriptions and read their push config
+resource "google_project_iam_member" "worker_pubsub_viewer" {
+  count   = var.ingestion_mode == "pull" ? 1 : 0
+  project = var.project_id
+  role    = "roles/pubsub.viewer"
+  member  = "serviceAccount:${google_service_account.worker_sa.email}"
+}
+
 data "google_project" "project" {}
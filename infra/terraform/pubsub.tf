@@ -21,6 +21,27 @@ resource "google_pubsub_subscription" "ingestion_sub" {
   }
 }
 
+# Pull mode only (job.puller). A dedicated subscription, created when switching to
+# pull mode, so the puller starts from new messages instead of a retained backlog
+# and never shares the topic with the dispatcher's push subscription.
+resource "google_pubsub_subscription" "ingestion_pull" {
+  count = var.ingestion_mode == "pull" ? 1 : 0
+  name  = "ingestion-pull"
+  topic = google_pubsub_topic.ingestion.name
+  # the puller's lease manager keeps extending this while an ingestion runs
+  ack_deadline_seconds = 60
+
+  dead_letter_policy {
+    dead_letter_topic     = google_pubsub_topic.dlq.id
+    max_delivery_attempts = 5
+  }
+
+  retry_policy {
+    minimum_backoff = "10s"
+    maximum_backoff = "600s"
+  }
+}
+
 resource "google_pubsub_subscription" "dlq_sub" {
   name  = "ingestion-dlq-sub"
   topic = google_pubsub_topic.dlq.name
@@ -27,11 +27,16 @@ resource "google_cloud_run_v2_service" "dispatcher" {
   location = var.region
   template {
     service_account = google_service_account.dispatcher_sa.email
+    # the dispatch ledger and execution cap live in process; one instance keeps them global
+    scaling {
+      max_instance_count = 1
+    }
     containers {
       image = coalesce(var.dispatcher_image, "${google_artifact_registry_repository.repo.location}-docker.pkg.dev/${var.project_id}/${google_artifact_registry_repository.repo.repository_id}/dispatcher:latest")
       env { name = "GCP_PROJECT_ID" value = var.project_id }
       env { name = "GCP_REGION" value = var.region }
       env { name = "JOB_NAME" value = google_cloud_run_v2_job.worker.name }
+      env { name = "ACK_DEADLINE" value = tostring(local.push_ack_deadline) }
     }
   }
 }
@@ -51,10 +56,18 @@ resource "google_cloud_run_v2_job" "worker" {
   }
 }
 
-# Pub/Sub push to dispatcher
+locals {
+  # the dispatcher answers every push within this (minus ACK_MARGIN); see dispatcher/app.py
+  push_ack_deadline = 60
+}
+
+# Pub/Sub push to dispatcher (push mode only; see var.ingestion_mode)
 resource "google_pubsub_subscription" "ingestion_push" {
+  count = var.ingestion_mode == "push" ? 1 : 0
   name  = "ingestion-push"
   topic = google_pubsub_topic.ingestion.name
+  # the dispatcher holds each push while it coalesces, queues and launches the job
+  ack_deadline_seconds = local.push_ack_deadline
 
   push_config {
     push_endpoint = google_cloud_run_v2_service.dispatcher.uri
@@ -17,3 +17,15 @@ variable "worker_image" {
   type    = string
   default = null
 }
+
+# How ingestion messages are consumed; the two are mutually exclusive (each would
+# receive every message). push: Pub/Sub pushes to the dispatcher, which runs a Job
+# per batch. pull: only the ingestion-pull subscription exists, for job.puller.
+variable "ingestion_mode" {
+  type    = string
+  default = "push"
+  validation {
+    condition     = contains(["push", "pull"], var.ingestion_mode)
+    error_message = "ingestion_mode must be \"push\" or \"pull\"."
+  }
+}
@@ -0,0 +1,135 @@
+"""
+Content-addressed storage for extracted dataset files.
+
+Each file's bytes are stored once per bucket under its SHA-256:
+
+    gs://<bucket>/<CAS_PREFIX>/sha256/ab/abcdef...
+
+and a run prefix (derive_target_prefix) holds only a manifest mapping relative
+paths to those objects:
+
+    gs://<bucket>/datasets/<dataset>/<run_id>/manifest.json
+
+A re-ingest or a new dataset version therefore uploads only files whose content
+is new. Hashes listed in the previous run's manifest are trusted without a GCS
+round trip; other hashes cost one metadata GET, and an upload only when the object
+is missing. Objects are never rewritten, so the name fully identifies the bytes.
+"""
+from __future__ import annotations
+import hashlib, json, os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+import structlog
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+from .gcs_io import IMAGE_EXTS, LABEL_EXTS, _ctype_for, _split_gs, object_meta, storage_client
+
+log = structlog.get_logger()
+
+CAS_PREFIX         = os.getenv("CAS_PREFIX", "cas").strip("/")
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "16"))
+MANIFEST_NAME      = "manifest.json"
+_HASH_CHUNK        = 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cas_name(digest: str) -> str:
+    return f"{CAS_PREFIX}/sha256/{digest[:2]}/{digest}"
+
+def _to_json(meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {**meta, "updated": meta["updated"].isoformat() if meta.get("updated") else None}
+
+def _from_json(meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {**meta, "updated": datetime.fromisoformat(meta["updated"]) if meta.get("updated") else None}
+
+def load_manifest(gs_prefix: str) -> Optional[Dict[str, Any]]:
+    """The manifest of a previous run, or None (no run, or a run from the copy layout)."""
+    bucket_name, key_prefix = _split_gs(gs_prefix if gs_prefix.endswith("/") else gs_prefix + "/")
+    try:
+        raw = storage_client().bucket(bucket_name).blob(key_prefix + MANIFEST_NAME).download_as_bytes()
+    except NotFound:
+        return None
+    return json.loads(raw)
+
+def _ensure_object(bucket, digest: str, local_path: str) -> Dict[str, Any]:
+    blob = bucket.blob(cas_name(digest))
+    try:
+        blob.reload()
+        uploaded = False
+    except NotFound:
+        try:
+            # if_generation_match=0: create only; a concurrent run that won the race wrote the same bytes
+            blob.upload_from_filename(local_path, content_type=_ctype_for(local_path), if_generation_match=0)
+            uploaded = True
+        except PreconditionFailed:
+            blob.reload()
+            uploaded = False
+    return {**object_meta(blob), "sha256": digest, "uploaded": uploaded}
+
+def upload_dir_to_cas(
+    local_dir: str,
+    gs_prefix: str,
+    *,
+    previous: Optional[Dict[str, Any]] = None,
+    include_exts: Iterable[str] | None = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Store files from local_dir in the bucket's content-addressed area and write
+    `<gs_prefix>manifest.json`. `previous` is an earlier run's manifest (load_manifest);
+    its objects are reused without a lookup. Returns {relative path: object metadata}
+    like gcs_io.upload_dir_to_gcs, with `name` pointing at the cas/ object and `sha256` set.
+    """
+    if not gs_prefix.endswith("/"):
+        gs_prefix += "/"
+    bucket_name, key_prefix = _split_gs(gs_prefix)
+    bucket = storage_client().bucket(bucket_name)
+    if include_exts is None:
+        include_exts = IMAGE_EXTS | LABEL_EXTS
+
+    local: Dict[str, str] = {}
+    for root, _, files in os.walk(local_dir):
+        for fn in files:
+            if os.path.splitext(fn.lower())[1] not in include_exts:
+                continue
+            lp = os.path.join(root, fn)
+            rel = os.path.relpath(lp, local_dir).replace("\\", "/").lstrip("/")
+            if rel and not rel.startswith(".."):
+                local[rel] = lp
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as pool:
+        digests = dict(zip(local, pool.map(file_sha256, local.values())))
+
+        known: Dict[str, Dict[str, Any]] = {}
+        if previous and previous.get("bucket") == bucket_name:
+            for meta in previous.get("files", {}).values():
+                known.setdefault(meta["sha256"], _from_json(meta))
+
+        # one lookup/upload per distinct new digest, however many paths share it
+        todo: Dict[str, str] = {}
+        for rel, digest in digests.items():
+            if digest not in known:
+                todo.setdefault(digest, local[rel])
+        for meta in pool.map(lambda item: _ensure_object(bucket, *item), todo.items()):
+            known[meta["sha256"]] = meta
+
+    uploaded = sum(1 for d in todo if known[d].pop("uploaded"))
+    objects = {rel: known[digest] for rel, digest in digests.items()}
+    manifest = {
+        "version": 1,
+        "layout": "cas",
+        "bucket": bucket_name,
+        "files": {rel: _to_json(meta) for rel, meta in sorted(objects.items())},
+    }
+    bucket.blob(key_prefix + MANIFEST_NAME).upload_from_string(
+        json.dumps(manifest, separators=(",", ":")), content_type="application/json",
+    )
+    log.info("cas.upload.done", files=len(objects), distinct=len(set(digests.values())),
+             checked=len(todo), uploaded=uploaded, dst_prefix=gs_prefix)
+    return objects
@@ -0,0 +1,111 @@
+"""
+Columnar image catalog for large datasets.
+
+Next to the run prefix the worker writes one Arrow IPC file (uncompressed, so
+readers can memory-map it and slice without copying):
+
+    gs://<bucket>/datasets/<dataset>/<run_id>/images.arrow
+
+one row per image, sorted by image_path:
+
+    image_path  string
+    width       int32 (null when unknown)
+    height      int32
+    classes     list<int32>     sorted distinct class ids (summary.classes)
+    box_count   int32
+    min_area    float64 (null without boxes)
+    max_area    float64
+    boxes       list<float64>   packed class_id, x_center, y_center, width, height per box;
+                                the list offsets are the per-image label offsets
+
+The backend serves listing pages, filters and counts of the dataset from it
+(backend app/services/columnar.py); Mongo stays the store of record. Only
+datasets of COLUMNAR_MIN_IMAGES or more get a catalog.
+"""
+from __future__ import annotations
+import os, tempfile
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from .gcs_io import _split_gs, storage_client
+from .mongo_io import _coalesce_path
+from .parsing import label_summary
+
+try:  # optional: the catalog is skipped without pyarrow
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+log = structlog.get_logger()
+
+COLUMNAR_MIN_IMAGES = int(os.getenv("COLUMNAR_MIN_IMAGES", "100000"))
+CATALOG_NAME        = "images.arrow"
+CATALOG_VERSION     = 1
+BOX_FIELDS          = ("class_id", "x_center", "y_center", "width", "height")
+
+def _schema():
+    return pa.schema([
+        ("image_path", pa.string()),
+        ("width", pa.int32()),
+        ("height", pa.int32()),
+        ("classes", pa.list_(pa.int32())),
+        ("box_count", pa.int32()),
+        ("min_area", pa.float64()),
+        ("max_area", pa.float64()),
+        ("boxes", pa.list_(pa.float64())),
+    ])
+
+def build_table(docs: List[Dict[str, Any]]):
+    """Catalog rows for parsed docs, deduped and sorted by path like the Mongo upsert."""
+    rows: Dict[str, Dict[str, Any]] = {}
+    for d in docs:
+        path = _coalesce_path(d)
+        if path and path not in rows:
+            rows[path] = d
+    cols: Dict[str, List[Any]] = {name: [] for name in _schema().names}
+    for path in sorted(rows):
+        d = rows[path]
+        labels = d.get("labels") or []
+        summary = label_summary(labels)
+        has_size = bool(d.get("width") and d.get("height"))
+        cols["image_path"].append(path)
+        cols["width"].append(int(d["width"]) if has_size else None)
+        cols["height"].append(int(d["height"]) if has_size else None)
+        cols["classes"].append(summary["classes"])
+        cols["box_count"].append(summary["box_count"])
+        cols["min_area"].append(summary["min_area"])
+        cols["max_area"].append(summary["max_area"])
+        cols["boxes"].append([float(l.get(f) or 0) for l in labels for f in BOX_FIELDS])
+    return pa.table(cols, schema=_schema())
+
+def write_catalog(docs: List[Dict[str, Any]], gs_prefix: str) -> Optional[Dict[str, Any]]:
+    """
+    Upload `<gs_prefix>images.arrow` for a large enough dataset. Returns what the
+    dataset doc records as `columnar` (see mongo_io.bump_dataset_version), or None.
+    """
+    if pa is None or len(docs) < COLUMNAR_MIN_IMAGES:
+        return None
+    if not gs_prefix.endswith("/"):
+        gs_prefix += "/"
+    table = build_table(docs)
+    bucket_name, key_prefix = _split_gs(gs_prefix)
+    blob = storage_client().bucket(bucket_name).blob(key_prefix + CATALOG_NAME)
+
+    fd, tmp = tempfile.mkstemp(suffix=".arrow"); os.close(fd)
+    try:
+        with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        blob.upload_from_filename(tmp, content_type="application/vnd.apache.arrow.file")
+    finally:
+        try: os.remove(tmp)
+        except FileNotFoundError: pass
+
+    log.info("columnar.written", rows=table.num_rows, bytes=blob.size, uri=f"{gs_prefix}{CATALOG_NAME}")
+    return {
+        "uri": f"{gs_prefix}{CATALOG_NAME}",
+        "generation": blob.generation,
+        "rows": table.num_rows,
+        "format": CATALOG_VERSION,
+    }
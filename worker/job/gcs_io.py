@@ -1,13 +1,27 @@
 from __future__ import annotations
-import os, tempfile, zipfile, mimetypes, re
+import os, tempfile, threading, zipfile, mimetypes, re
 from uuid import uuid4
-from typing import Iterable, Tuple
+from typing import Any, Dict, Iterable, Tuple
 from google.cloud import storage
 
+from . import shards
+
 # File types we care about
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
 LABEL_EXTS = {".txt"}  # YOLO labels
 
+_client: storage.Client | None = None
+_client_lock = threading.Lock()
+
+def storage_client() -> storage.Client:
+    """One client per process, so a warm worker (puller.py) reuses its connections."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = storage.Client()
+    return _client
+
 def is_zip_uri(uri: str) -> bool:
     return uri.lower().endswith(".zip")
 
@@ -38,10 +52,11 @@ def _safe_rel(prefix: str, name: str) -> str:
 def download_gcs_uri(gcs_uri: str) -> str:
     """
     Download a GCS ZIP / single object / folder into a temp dir.
-    For folders, also extracts any *.zip inside the prefix into that temp dir.
+    For folders, also extracts any *.zip inside the prefix into that temp dir;
+    folders of PACK_MIN_OBJECTS+ files are packed into shards and read from those.
     Returns the local directory path containing the data.
     """
-    client = storage.Client()
+    client = storage_client()
     bucket_name, key = _split_gs(gcs_uri)
     bucket = client.bucket(bucket_name)
 
@@ -74,10 +89,10 @@ def download_gcs_uri(gcs_uri: str) -> str:
     prefix = key if not key else (key if key.endswith("/") else key + "/")
     out_dir = tempfile.mkdtemp(prefix="yolofolder_")
 
-    zip_names, file_names = [], []
+    zip_names, file_blobs = [], []
     for b in client.list_blobs(bucket_name, prefix=prefix):
         name = b.name
-        if name.endswith("/"):
+        if name.endswith("/") or name.startswith(prefix + shards.SHARD_DIR):
             continue
         rel = _safe_rel(prefix, name)
         if not rel:
@@ -86,16 +101,21 @@ def download_gcs_uri(gcs_uri: str) -> str:
         if ext == ".zip":
             zip_names.append(name)
         elif ext in (IMAGE_EXTS | LABEL_EXTS):
-            file_names.append(name)
+            file_blobs.append(b)
 
-    # download images/labels directly
-    for name in file_names:
-        rel = _safe_rel(prefix, name)
-        if not rel:
-            continue
-        dst = os.path.join(out_dir, rel)
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        bucket.blob(name).download_to_filename(dst)
+    if len(file_blobs) >= shards.PACK_MIN_OBJECTS:
+        # a few compose calls + large range reads instead of one GET per file
+        index = shards.ensure_shards(bucket, prefix, file_blobs)
+        shards.read_shards(bucket, index, out_dir, _safe_rel)
+    else:
+        # download images/labels directly
+        for b in file_blobs:
+            rel = _safe_rel(prefix, b.name)
+            if not rel:
+                continue
+            dst = os.path.join(out_dir, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            bucket.blob(b.name).download_to_filename(dst)
 
     # extract all zips we found into out_dir
     for name in zip_names:
@@ -142,22 +162,24 @@ def upload_dir_to_gcs(
     gs_prefix: str,
     *,
     include_exts: Iterable[str] | None = None,
-) -> int:
+) -> Dict[str, Dict[str, Any]]:
     """
     Upload files from local_dir to gs_prefix, preserving relative paths.
     Default uploads images *and* YOLO label .txt so structure is complete.
-    Returns number of uploaded files.
+    Returns {relative path: object metadata} for every uploaded file, taken from
+    the upload response (no extra round trip), so the backend can serve
+    conditional requests and sign URLs without blob.reload().
     """
     if not gs_prefix.endswith("/"):
         gs_prefix += "/"
     bucket_name, key_prefix = _split_gs(gs_prefix)
-    client = storage.Client()
+    client = storage_client()
     bucket = client.bucket(bucket_name)
 
     if include_exts is None:
         include_exts = IMAGE_EXTS | LABEL_EXTS  # upload images + labels
 
-    uploaded = 0
+    uploaded: Dict[str, Dict[str, Any]] = {}
     for root, _, files in os.walk(local_dir):
         for fn in files:
             ext = os.path.splitext(fn.lower())[1]
@@ -170,5 +192,16 @@ def upload_dir_to_gcs(
             name = key_prefix + rel
             blob = bucket.blob(name)
             blob.upload_from_filename(lp, content_type=_ctype_for(lp))
-            uploaded += 1
+            uploaded[rel] = object_meta(blob)
     return uploaded
+
+def object_meta(blob) -> Dict[str, Any]:
+    """Subset of GCS object metadata the backend needs, from a freshly written/reloaded blob."""
+    return {
+        "name": blob.name,
+        "generation": blob.generation,
+        "etag": blob.etag,
+        "size": blob.size,
+        "content_type": blob.content_type,
+        "updated": blob.updated,
+    }
@@ -1,11 +1,16 @@
-import argparse, asyncio, json, os, structlog
+import argparse, asyncio, json, os, shutil, structlog
 from .logging_conf import setup_logging  # noqa: F401
 from .gcs_io import download_gcs_uri, derive_target_prefix, upload_dir_to_gcs
 from .parsing import parse_yolo_labels
-from .mongo_io import upsert_dataset, bulk_upsert_images
+from .mongo_io import upsert_dataset, bulk_upsert_images, bump_dataset_version, dataset_source_prefix
+from . import cas, columnar
 
 log = structlog.get_logger()
 
+# cas: bytes stored once under CAS_PREFIX, run prefix holds a manifest (see cas.py)
+# copy: every run prefix gets a full copy of the files
+EXTRACT_LAYOUT = os.getenv("EXTRACT_LAYOUT", "cas").lower()
+
 def main():
     parser = argparse.ArgumentParser(description="YOLO11n ingestion worker")
     parser.add_argument("--payload", required=True,
@@ -15,6 +20,25 @@ def main():
     asyncio.run(run(payload))
 
 async def run(payload: dict):
+    scratch: list[str] = []
+    try:
+        await _ingest(payload, scratch)
+    finally:
+        # a warm pull-mode process runs many ingestions; don't let temp dirs pile up
+        for d in scratch:
+            await asyncio.to_thread(shutil.rmtree, d, True)
+
+def _merge_into(local_root: str, local_dir: str) -> None:
+    """Move the children of local_dir into local_root."""
+    for dp, _, fns in os.walk(local_dir):
+        for fn in fns:
+            src = os.path.join(dp, fn)
+            rel = os.path.relpath(src, local_dir)
+            dst = os.path.join(local_root, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.move(src, dst)
+
+async def _ingest(payload: dict, scratch: list[str]):
     dataset_name: str = payload["dataset_name"]
     fmt: str = payload.get("format", "yolo")
     gcs_uri: str | None = payload.get("gcs_uri")
@@ -29,42 +53,48 @@ async def run(payload: dict):
 
     log.info("ingestion.start", dataset=dataset_name, gcs_uri=rep, fmt=fmt)
 
-    # Download content locally; merge if multiple inputs
+    # Download content locally; merge if multiple inputs. Blocking GCS/disk work runs in
+    # threads so the pull-mode worker (puller.py) can interleave several ingestions.
     local_root = None
     for i, u in enumerate(uris):
-        local_dir = download_gcs_uri(u)
+        local_dir = await asyncio.to_thread(download_gcs_uri, u)
+        scratch.append(local_dir)
         if local_root is None:
             local_root = local_dir
         elif local_dir != local_root:
-            # merge: move children of local_dir into local_root
-            import shutil
-            for dp, _, fns in os.walk(local_dir):
-                for fn in fns:
-                    src = os.path.join(dp, fn)
-                    rel = os.path.relpath(src, local_dir)
-                    dst = os.path.join(local_root, rel)
-                    os.makedirs(os.path.dirname(dst), exist_ok=True)
-                    shutil.move(src, dst)
+            await asyncio.to_thread(_merge_into, local_root, local_dir)
 
     assert local_root is not None
 
     # Choose a destination prefix in the *same* bucket and upload extracted data
     target_prefix = derive_target_prefix(rep, dataset_name)
-    log.info("extract.upload.start", dst_prefix=target_prefix)
-    uploaded = upload_dir_to_gcs(local_root, target_prefix)
-    log.info("extract.upload.done", files=uploaded, dst_prefix=target_prefix)
+    log.info("extract.upload.start", dst_prefix=target_prefix, layout=EXTRACT_LAYOUT)
+    if EXTRACT_LAYOUT == "cas":
+        prev_prefix = await dataset_source_prefix(dataset_name)
+        previous = await asyncio.to_thread(cas.load_manifest, prev_prefix) if prev_prefix else None
+        objects = await asyncio.to_thread(cas.upload_dir_to_cas, local_root, target_prefix, previous=previous)
+    else:
+        objects = await asyncio.to_thread(upload_dir_to_gcs, local_root, target_prefix)
+    log.info("extract.upload.done", files=len(objects), dst_prefix=target_prefix)
 
     # Parse YOLO labels and upsert dataset + images
     if fmt != "yolo":
         raise ValueError(f"Unsupported format: {fmt}")
-    docs = parse_yolo_labels(local_root)
+    docs = await asyncio.to_thread(parse_yolo_labels, local_root)
     with_labels = sum(1 for d in docs if d.get("labels"))
     log.info("ingestion.parsed", images=len(docs), with_labels=with_labels)
     log.info("ingestion.scan", files=len(docs), sample=(docs[0]["image_path"] if docs else None))
 
     # Set dataset to canonical prefix we just uploaded, then write image docs
     dataset_id = await upsert_dataset(dataset_name, target_prefix)  # sets source_prefix
-    count = await bulk_upsert_images(dataset_id, docs)
+    catalog = None
+    try:
+        count = await bulk_upsert_images(dataset_id, docs, objects=objects)
+        # large datasets: columnar catalog the backend memory-maps for listing (see columnar.py)
+        catalog = await asyncio.to_thread(columnar.write_catalog, docs, target_prefix)
+    finally:
+        # also after a partial write, so the backend never keeps serving pre-ingest pages
+        await bump_dataset_version(dataset_id, columnar=catalog)
 
     log.info("ingestion.done", dataset_id=dataset_id, images=count, source_prefix=target_prefix)
 
@@ -5,6 +5,9 @@ from typing import Any, Dict, List, Iterable
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import UpdateOne, ASCENDING
+from pymongo.errors import OperationFailure
+from .search import search_keys
+from .parsing import label_summary
 
 _client: AsyncIOMotorClient | None = None
 _db: AsyncIOMotorDatabase | None = None
@@ -49,6 +52,25 @@ async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
     if not any(spec.get("key") == [("image_path", 1)] for spec in existing.values()):
         await images.create_index([("image_path", ASCENDING)], name="ix_images_image_path", background=True)
 
+    # filename search keys (queried by the backend's /images?q=)
+    for field in ("search.grams", "search.segments"):
+        keys = [("dataset_id", 1), (field, 1)]
+        if not any(list(spec.get("key") or []) == keys for spec in existing.values()):
+            await images.create_index(keys, name=f"ix_images_{field.replace('.', '_')}", background=True)
+
+    # label summaries (backend /images?cls=&min_boxes=&min_area=...); same specs as backend app/db/indexes.py
+    for name, keys in (
+        ("ix_images_summary_classes", [("dataset_id", 1), ("summary.classes", 1), ("image_path", 1)]),
+        ("ix_images_summary_ranges", [("dataset_id", 1), ("image_path", 1), ("summary.box_count", 1),
+                                      ("summary.min_area", 1), ("summary.max_area", 1)]),
+        # led by the range field, so counts are bounded index scans
+        ("ix_images_summary_box_count", [("dataset_id", 1), ("summary.box_count", 1)]),
+        ("ix_images_summary_min_area", [("dataset_id", 1), ("summary.min_area", 1)]),
+        ("ix_images_summary_max_area", [("dataset_id", 1), ("summary.max_area", 1)]),
+    ):
+        if not any(list(spec.get("key") or []) == keys for spec in existing.values()):
+            await images.create_index(keys, name=name, background=True)
+
 async def upsert_dataset(name: str, source_uri: str | None = None) -> str:
     """
     Create/update a dataset document and record its source:
@@ -59,7 +81,7 @@ async def upsert_dataset(name: str, source_uri: str | None = None) -> str:
     db = await get_db()
     update: Dict[str, Any] = {
         "$setOnInsert": {"name": name, "created_at": _utcnow()},
-        "$set": {"updated_at": _utcnow()},
+        "$set": {"updated_at": _utcnow(), "search": search_keys(name)},
     }
     if source_uri and source_uri.startswith("gs://"):
         if source_uri.lower().endswith(".zip"):
@@ -75,14 +97,116 @@ async def upsert_dataset(name: str, source_uri: str | None = None) -> str:
     doc = await db.datasets.find_one({"name": name}, {"_id": 1})
     return str(doc["_id"])
 
+async def dataset_source_prefix(name: str) -> str | None:
+    """Current source_prefix of a dataset (the previous run's prefix during a re-ingest)."""
+    db = await get_db()
+    doc = await db.datasets.find_one({"name": name}, {"source_prefix": 1})
+    return (doc or {}).get("source_prefix")
+
 def _coalesce_path(d: Dict[str, Any]) -> str | None:
     """Accept multiple possible keys from parsers: image_path | path | file | filename."""
     return d.get("image_path") or d.get("path") or d.get("file") or d.get("filename")
 
-async def bulk_upsert_images(dataset_id: str, docs: List[Dict[str, Any]]) -> int:
+def _class_set(labels: List[Dict[str, Any]]) -> set[int]:
+    return {int(l["class_id"]) for l in labels if l.get("class_id") is not None}
+
+def _count_delta(rows: List[tuple[str, set[int]]], old: Dict[str, set[int] | None]) -> Dict[str, int]:
+    """
+    $inc document for the dataset counters given new rows and the previous class
+    sets of the same paths (None = image not stored yet).
+    class_counts.<id> counts *images* containing the class.
+    """
+    inc: Dict[str, int] = {}
+    def bump(k: str, n: int):
+        if n:
+            inc[k] = inc.get(k, 0) + n
+    for path, new in rows:
+        prev = old.get(path)
+        if prev is None:
+            bump("image_count", 1)
+            prev = set()
+            was_labeled = False
+        else:
+            was_labeled = bool(prev)
+        bump("labeled_count", int(bool(new)) - int(was_labeled))
+        for c in new - prev:
+            bump(f"class_counts.{c}", 1)
+        for c in prev - new:
+            bump(f"class_counts.{c}", -1)
+    return {k: n for k, n in inc.items() if n}
+
+def counts_pipeline(oid: ObjectId) -> List[Dict[str, Any]]:
+    """
+    image_count / labeled_count / per-class image counts for one dataset. Like
+    _class_set, null class ids don't count. The backend's migrations run the same
+    pipeline (app/services/summary.py dataset_counts_pipeline).
+    """
+    return [
+        {"$match": {"dataset_id": oid}},
+        {"$project": {"classes": {"$setUnion": [{"$filter": {
+            "input": {"$ifNull": ["$labels.class_id", []]}, "cond": {"$ne": ["$$this", None]},
+        }}, []]}}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "image_count": {"$sum": 1},
+                "labeled_count": {"$sum": {"$cond": [{"$gt": [{"$size": "$classes"}, 0]}, 1, 0]}},
+            }}],
+            "classes": [{"$unwind": "$classes"}, {"$group": {"_id": "$classes", "n": {"$sum": 1}}}],
+        }},
+    ]
+
+async def recount_dataset(db: AsyncIOMotorDatabase, oid: ObjectId, session=None) -> None:
+    """Recompute image_count / labeled_count / class_counts from the images collection."""
+    res = await db.images.aggregate(counts_pipeline(oid), session=session).to_list(length=1)
+    facet = res[0] if res else {"totals": [], "classes": []}
+    totals = facet["totals"][0] if facet["totals"] else {"image_count": 0, "labeled_count": 0}
+    await db.datasets.update_one(
+        {"_id": oid},
+        {"$set": {
+            "image_count": totals["image_count"],
+            "labeled_count": totals["labeled_count"],
+            "class_counts": {str(c["_id"]): c["n"] for c in facet["classes"]},
+        }},
+        session=session,
+    )
+
+_TXN_SUPPORTED: bool | None = None
+
+async def _in_transaction(fn) -> Any:
+    """
+    Run `fn(session)` inside a multi-document transaction when the deployment
+    supports it (replica set / mongos); standalone servers run it without one.
+    """
+    global _TXN_SUPPORTED
+    assert _client is not None
+    if _TXN_SUPPORTED is not False:
+        try:
+            async with await _client.start_session() as s:
+                result = await s.with_transaction(fn)
+            _TXN_SUPPORTED = True
+            return result
+        except OperationFailure as e:
+            # 20 = IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+            if e.code != 20 or _TXN_SUPPORTED:
+                raise
+            _TXN_SUPPORTED = False
+    return await fn(None)
+
+async def bulk_upsert_images(
+    dataset_id: str,
+    docs: List[Dict[str, Any]],
+    *,
+    objects: Dict[str, Dict[str, Any]] | None = None,
+) -> int:
     """
     Upsert image records with labels.
+    `objects` maps image_path -> GCS object metadata of the canonical copy
+    (see gcs_io.object_meta); stored as `object` on the image doc. In the cas
+    layout it also carries `sha256` and `name` is the content-addressed object.
     Ensures unique (dataset_id, image_path) so re-ingestion is idempotent.
+    Dataset counters (image_count, labeled_count, class_counts) are $inc'ed in
+    the same transaction as each chunk of image writes.
     Returns number of processed images.
     """
     db = await get_db()
@@ -93,6 +217,7 @@ async def bulk_upsert_images(dataset_id: str, docs: List[Dict[str, Any]]) -> int
     now = _utcnow()
 
     ops: List[UpdateOne] = []
+    rows: List[tuple[str, set[int]]] = []
     seen: set[str] = set()
 
     for d in docs:
@@ -104,12 +229,20 @@ async def bulk_upsert_images(dataset_id: str, docs: List[Dict[str, Any]]) -> int
             continue
         seen.add(path)
         labels = d.get("labels", [])
+        rows.append((path, _class_set(labels)))
+        fields: Dict[str, Any] = {
+            "labels": labels, "summary": label_summary(labels), "search": search_keys(path), "updated_at": now,
+        }
+        if objects and path in objects:
+            fields["object"] = objects[path]
+        if d.get("width") and d.get("height"):
+            fields["width"], fields["height"] = int(d["width"]), int(d["height"])
         ops.append(
             UpdateOne(
                 {"dataset_id": oid, "image_path": path},
                 {
                     "$setOnInsert": {"dataset_id": oid, "image_path": path, "created_at": now},
-                    "$set": {"labels": labels, "updated_at": now},
+                    "$set": fields,
                 },
                 upsert=True,
             )
@@ -118,11 +251,33 @@ async def bulk_upsert_images(dataset_id: str, docs: List[Dict[str, Any]]) -> int
     if not ops:
         return 0
 
+    # Legacy datasets ingested before counters existed: seed them once so $inc is exact
+    ds = await db.datasets.find_one({"_id": oid}, {"image_count": 1})
+    if ds is not None and "image_count" not in ds:
+        await recount_dataset(db, oid)
+
     # Chunk to keep batches reasonable
     CHUNK = 1000
     total_processed = 0
     for i in range(0, len(ops), CHUNK):
-        res = await images.bulk_write(ops[i : i + CHUNK], ordered=False)
+        chunk_ops, chunk_rows = ops[i : i + CHUNK], rows[i : i + CHUNK]
+
+        async def write_chunk(session):
+            old: Dict[str, set[int] | None] = {}
+            cur = images.find(
+                {"dataset_id": oid, "image_path": {"$in": [p for p, _ in chunk_rows]}},
+                {"_id": 0, "image_path": 1, "labels.class_id": 1},
+                session=session,
+            )
+            async for doc in cur:
+                old[doc["image_path"]] = _class_set(doc.get("labels") or [])
+            res = await images.bulk_write(chunk_ops, ordered=False, session=session)
+            inc = _count_delta(chunk_rows, old)
+            if inc:
+                await db.datasets.update_one({"_id": oid}, {"$inc": inc}, session=session)
+            return res
+
+        res = await _in_transaction(write_chunk)
         # Count how many docs we touched (approximate equals len(chunk))
         total_processed += (res.upserted_count or 0) + (res.modified_count or 0)
         # If neither modified nor upserted were reported (e.g., same content), still count them
@@ -130,3 +285,21 @@ async def bulk_upsert_images(dataset_id: str, docs: List[Dict[str, Any]]) -> int
             total_processed = len(ops)
 
     return max(total_processed, len(seen))
+
+async def bump_dataset_version(dataset_id: str, *, columnar: Dict[str, Any] | None = None) -> None:
+    """
+    End of an ingest: bump the dataset's `version` and the global datasets
+    version. The backend puts both into its list cache keys and ETags, so this
+    invalidates every cached page of the dataset (and the /datasets listing)
+    without touching Redis.
+    `columnar` (columnar.write_catalog) replaces the dataset's catalog in the same
+    update; None drops it, so a catalog never outlives the ingest that wrote it.
+    """
+    db = await get_db()
+    update: Dict[str, Any] = {"$inc": {"version": 1}}
+    if columnar:
+        update["$set"] = {"columnar": columnar}
+    else:
+        update["$unset"] = {"columnar": ""}
+    await db.datasets.update_one({"_id": ObjectId(dataset_id)}, update)
+    await db.meta.update_one({"_id": "datasets"}, {"$inc": {"version": 1}}, upsert=True)
@@ -1,13 +1,25 @@
 from __future__ import annotations
 import os
-from typing import List, Dict
+from typing import Any, List, Dict
+from PIL import Image, UnidentifiedImageError
 
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
 
+def image_size(path: str) -> Dict[str, int]:
+    """{width, height} in pixels from the image header (no full decode); {} if unreadable."""
+    try:
+        with Image.open(path) as im:
+            w, h = im.size
+    except (OSError, UnidentifiedImageError):
+        return {}
+    return {"width": int(w), "height": int(h)}
+
 def parse_yolo_labels(root: str) -> List[Dict]:
     """
-    Walk `root` and return docs: {image_path, labels}
+    Walk `root` and return docs: {image_path, labels, width?, height?}
     - image_path is relative to `root`, with forward slashes
+    - width/height (pixels) when the image header is readable; exports need them
+      to turn normalized YOLO boxes into COCO pixel boxes
     - YOLO labels are discovered with a robust set of candidates:
         * same folder: <image_stem>.txt
         * any 'images' segment mirrored to 'labels'
@@ -97,6 +109,20 @@ def parse_yolo_labels(root: str) -> List[Dict]:
                                 continue
                     break  # stop at the first found label file
 
-            docs.append({"image_path": rel_img, "labels": labels})
+            docs.append({"image_path": rel_img, "labels": labels, **image_size(img_abs)})
 
     return docs
+
+def label_summary(labels: List[Dict]) -> Dict[str, Any]:
+    """
+    Per-image label summary stored as `summary` on the image doc and indexed by
+    the backend for label-aware filters. Areas are normalized (width * height,
+    0..1); None when the image has no boxes.
+    """
+    areas = [float(l.get("width") or 0) * float(l.get("height") or 0) for l in labels]
+    return {
+        "classes": sorted({int(l["class_id"]) for l in labels if l.get("class_id") is not None}),
+        "box_count": len(labels),
+        "min_area": min(areas) if areas else None,
+        "max_area": max(areas) if areas else None,
+    }
@@ -0,0 +1,142 @@
+"""
+Pull-mode worker: one warm process that streams messages from the ingestion
+subscription and runs several ingestions concurrently, reusing its Mongo
+client, GCS client and interpreter across messages.
+
+    python -m job.puller --subscription ingestion-pull --concurrency 4
+
+Flow control leases at most --concurrency messages at a time; the client's
+lease manager keeps extending their ack deadlines (up to PULL_MAX_LEASE_SECONDS)
+while an ingestion runs. Success acks, failure nacks (Pub/Sub retries, then
+dead-letters). Messages for the same dataset run one after another. Set
+PUBSUB_EMULATOR_HOST to pull from a local emulator instead.
+
+Pull mode and the push dispatcher are mutually exclusive: each subscription on the
+topic receives every message, so both would ingest everything twice. Terraform's
+ingestion_mode = "pull" creates ingestion-pull and removes ingestion-push; the puller
+refuses to start while any push subscription is attached to its topic.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Set
+
+import structlog
+from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+
+from .logging_conf import setup_logging  # noqa: F401
+from .main import run
+from .mongo_io import get_db
+
+log = structlog.get_logger()
+
+PULL_CONCURRENCY = int(os.getenv("PULL_CONCURRENCY", "4"))
+PULL_MAX_LEASE   = int(os.getenv("PULL_MAX_LEASE_SECONDS", "7200"))  # longest ingestion we keep leasing
+PULL_DRAIN_SECONDS = float(os.getenv("PULL_DRAIN_SECONDS", "8"))    # Cloud Run gives 10 s after SIGTERM
+
+class Puller:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.locks: Dict[str, list] = {}  # dataset -> [lock, holders + waiters]; dropped at zero
+        self.running: Set[asyncio.Future] = set()
+
+    async def handle(self, payload: dict) -> None:
+        key = payload.get("dataset_name") or ""
+        entry = self.locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await run(payload)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[key]
+
+    def callback(self, message) -> None:
+        """Runs on a subscriber scheduler thread; the ingestion itself runs on the shared loop."""
+        try:
+            payload = json.loads(message.data)
+        except ValueError:
+            log.error("pull.bad_payload", message_id=message.message_id)
+            message.nack()
+            return
+        log.info("pull.received", message_id=message.message_id, dataset=payload.get("dataset_name"),
+                 attempt=message.delivery_attempt)
+        fut = asyncio.run_coroutine_threadsafe(self.handle(payload), self.loop)
+        self.running.add(fut)
+        try:
+            fut.result()
+        except Exception:
+            log.exception("pull.failed", message_id=message.message_id)
+            message.nack()
+        else:
+            message.ack()
+            log.info("pull.done", message_id=message.message_id)
+        finally:
+            self.running.discard(fut)
+
+def _subscription_path(name: str) -> str:
+    if name.startswith("projects/"):
+        return name
+    project = os.getenv("GCP_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+    if not project:
+        raise RuntimeError("GCP_PROJECT_ID not set (or pass a full projects/.../subscriptions/... path)")
+    return pubsub_v1.SubscriberClient.subscription_path(project, name)
+
+def ensure_exclusive(subscriber, path: str) -> None:
+    """Refuse to pull next to a push subscription on the same topic (every message would run twice)."""
+    sub = subscriber.get_subscription(subscription=path)
+    if sub.push_config.push_endpoint:
+        raise RuntimeError(f"{path} is a push subscription; pull mode needs a pull subscription")
+    for name in pubsub_v1.PublisherClient().list_topic_subscriptions(request={"topic": sub.topic}):
+        if name == path:
+            continue
+        other = subscriber.get_subscription(subscription=name)
+        if other.push_config.push_endpoint:
+            raise RuntimeError(
+                f"{name} pushes {sub.topic} to {other.push_config.push_endpoint}; the dispatcher would "
+                f"ingest every message too. Switch to pull mode (terraform ingestion_mode = \"pull\") first."
+            )
+
+async def serve(subscription: str, concurrency: int) -> None:
+    loop = asyncio.get_running_loop()
+    await get_db()  # connect + ping once for the life of the process
+
+    puller = Puller(loop)
+    subscriber = pubsub_v1.SubscriberClient()
+    path = _subscription_path(subscription)
+    await asyncio.to_thread(ensure_exclusive, subscriber, path)
+    flow = pubsub_v1.types.FlowControl(max_messages=concurrency, max_lease_duration=PULL_MAX_LEASE)
+    scheduler = ThreadScheduler(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pull"))
+    streaming = subscriber.subscribe(path, callback=puller.callback, flow_control=flow, scheduler=scheduler)
+    log.info("pull.start", subscription=path, concurrency=concurrency)
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    stream_done = loop.run_in_executor(None, streaming.result)
+    await asyncio.wait({asyncio.ensure_future(stop.wait()), stream_done}, return_when=asyncio.FIRST_COMPLETED)
+    stream_failed = stream_done.done() and not stop.is_set()
+
+    # stop leasing new messages; let in-flight ingestions finish within the drain budget.
+    # Anything cut off is redelivered, and ingestion is idempotent.
+    streaming.cancel()
+    if puller.running:
+        log.info("pull.drain", in_flight=len(puller.running))
+        await asyncio.wait([asyncio.wrap_future(f) for f in list(puller.running)], timeout=PULL_DRAIN_SECONDS)
+    subscriber.close()
+    if stream_failed:
+        stream_done.result()  # re-raise the stream error so the process exits non-zero
+    log.info("pull.stop")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pull-mode YOLO ingestion worker")
+    parser.add_argument("--subscription", default=os.getenv("PUBSUB_SUBSCRIPTION", "ingestion-pull"),
+                        help="subscription name or full projects/.../subscriptions/... path")
+    parser.add_argument("--concurrency", type=int, default=PULL_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(serve(args.subscription, args.concurrency))
+
+if __name__ == "__main__":
+    main()
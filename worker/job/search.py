@@ -0,0 +1,23 @@
+from __future__ import annotations
+from typing import Dict, List
+
+# Keep in sync with backend/app/services/search.py (the query side).
+NGRAM = 3
+
+def ngrams(s: str, n: int = NGRAM) -> List[str]:
+    """Distinct n-grams of `s` (the whole string when shorter than n)."""
+    if len(s) <= n:
+        return [s] if s else []
+    return sorted({s[i:i + n] for i in range(len(s) - n + 1)})
+
+def search_keys(path: str) -> Dict[str, object]:
+    """
+    Normalized, indexable search keys for an image path (or dataset name):
+      name:     lowercase basename
+      segments: lowercase path segments (basename included)
+      grams:    n-grams of the basename, for substring lookups
+    """
+    p = (path or "").replace("\\", "/").lower()
+    segments = [s for s in p.split("/") if s]
+    name = segments[-1] if segments else ""
+    return {"name": name, "segments": segments, "grams": ngrams(name)}
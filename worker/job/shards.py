@@ -0,0 +1,186 @@
+"""
+Shard packing for folder uploads with many small objects.
+
+Uploads land as one object per file under uploads/<dataset>/<uuid>/. Fetching
+100k of them costs 100k GETs. Instead, the objects are concatenated server-side
+with GCS compose (32 sources per call, at most 1024 components per object)
+into a few large shard objects, and a member index records where each file
+starts. The worker then reads the shards with a handful of large range reads.
+
+    <prefix>_shards/index.json
+    <prefix>_shards/shard-00000 ...
+
+The index carries a fingerprint of the source listing (names + generations), so
+a re-ingest of the same upload reuses the shards instead of composing again.
+"""
+from __future__ import annotations
+import hashlib, json, os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import structlog
+from google.api_core.exceptions import NotFound
+
+log = structlog.get_logger()
+
+PACK_MIN_OBJECTS  = int(os.getenv("PACK_MIN_OBJECTS", "500"))                # smaller uploads are fetched directly
+SHARD_MAX_BYTES   = int(os.getenv("SHARD_MAX_BYTES", str(256 * 1024 * 1024)))
+SHARD_MAX_MEMBERS = min(1024, int(os.getenv("SHARD_MAX_MEMBERS", "1024")))   # GCS composite component limit
+SHARD_READ_BYTES  = int(os.getenv("SHARD_READ_BYTES", str(64 * 1024 * 1024)))  # per range read (streamed, not buffered)
+PACK_CONCURRENCY  = int(os.getenv("PACK_CONCURRENCY", "16"))
+COMPOSE_FANIN     = 32
+SHARD_DIR         = "_shards/"
+
+def fingerprint(blobs: List[Any]) -> str:
+    h = hashlib.sha1()
+    for b in blobs:
+        h.update(f"{b.name}\0{b.generation}\n".encode())
+    return h.hexdigest()
+
+def plan_shards(blobs: List[Any], prefix: str) -> List[Dict[str, Any]]:
+    """Group listed blobs (in name order) into shards; member offsets follow from sizes."""
+    shards: List[Dict[str, Any]] = []
+    cur: Optional[Dict[str, Any]] = None
+    for b in sorted(blobs, key=lambda b: b.name):
+        size = int(b.size or 0)
+        if cur is None or len(cur["members"]) >= SHARD_MAX_MEMBERS or (cur["size"] and cur["size"] + size > SHARD_MAX_BYTES):
+            cur = {"name": f"{prefix}{SHARD_DIR}shard-{len(shards):05d}", "size": 0, "members": [], "sources": []}
+            shards.append(cur)
+        cur["members"].append({"path": b.name[len(prefix):], "offset": cur["size"], "size": size})
+        cur["sources"].append((b.name, b.generation))
+        cur["size"] += size
+    return shards
+
+def _compose(bucket, shard: Dict[str, Any]) -> int:
+    """Build one shard by a compose tree; returns the shard's generation."""
+    level = [(bucket.blob(name), gen) for name, gen in shard["sources"]]
+    temps: List[Any] = []
+    depth = 0
+    while len(level) > 1 or depth == 0:
+        nxt = []
+        for i in range(0, len(level), COMPOSE_FANIN):
+            group = level[i:i + COMPOSE_FANIN]
+            last = len(level) <= COMPOSE_FANIN
+            target = bucket.blob(shard["name"] if last else f"{shard['name']}.part-{depth}-{i // COMPOSE_FANIN}")
+            target.content_type = "application/octet-stream"
+            # pin the generations the offsets were computed from
+            target.compose([b for b, _ in group], if_source_generation_match=[g for _, g in group])
+            nxt.append((target, target.generation))
+            if not last:
+                temps.append(target)
+        level, depth = nxt, depth + 1
+    for t in temps:
+        try:
+            t.delete()
+        except NotFound:
+            pass
+    return level[0][1]
+
+def load_index(bucket, prefix: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(bucket.blob(f"{prefix}{SHARD_DIR}index.json").download_as_bytes())
+    except NotFound:
+        return None
+
+def ensure_shards(bucket, prefix: str, blobs: List[Any]) -> Dict[str, Any]:
+    """Return the shard index for `blobs` under `prefix`, composing shards unless a current index exists."""
+    fp = fingerprint(sorted(blobs, key=lambda b: b.name))
+    index = load_index(bucket, prefix)
+    if index and index.get("fingerprint") == fp:
+        log.info("shards.reuse", prefix=prefix, shards=len(index["shards"]))
+        return index
+
+    shards = plan_shards(blobs, prefix)
+    log.info("shards.pack.start", prefix=prefix, objects=len(blobs), shards=len(shards))
+    with ThreadPoolExecutor(max_workers=PACK_CONCURRENCY) as pool:
+        generations = list(pool.map(lambda s: _compose(bucket, s), shards))
+    index = {
+        "version": 1,
+        "fingerprint": fp,
+        "objects": len(blobs),
+        "bytes": sum(s["size"] for s in shards),
+        "shards": [
+            {"name": s["name"], "generation": g, "size": s["size"], "members": s["members"]}
+            for s, g in zip(shards, generations)
+        ],
+    }
+    bucket.blob(f"{prefix}{SHARD_DIR}index.json").upload_from_string(
+        json.dumps(index, separators=(",", ":")), content_type="application/json",
+    )
+    log.info("shards.pack.done", prefix=prefix, shards=len(shards), bytes=index["bytes"])
+    return index
+
+class _MemberSink:
+    """
+    File-like target for one range read: the shard's bytes are the members' bytes
+    back to back, so the stream is split into member files as it arrives and never
+    held in memory. Zero-byte members are created as the stream passes them.
+    """
+    def __init__(self, members: List[Dict[str, Any]], out_dir: str, safe_rel):
+        self.members, self.out_dir, self.safe_rel = iter(members), out_dir, safe_rel
+        self.fh = None
+        self.left = 0
+        self.written = 0
+        self._next()
+
+    def _next(self) -> None:
+        while True:
+            self.close()
+            m = next(self.members, None)
+            if m is None:
+                return
+            rel = self.safe_rel("", m["path"])
+            if rel:
+                dst = os.path.join(self.out_dir, rel)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                self.fh = open(dst, "wb")
+                self.written += 1
+            self.left = m["size"]
+            if self.left:
+                return
+
+    def write(self, data) -> int:
+        view = memoryview(data)
+        while view:
+            if not self.left:
+                raise ValueError("range read returned more bytes than its members hold")
+            n = min(self.left, len(view))
+            if self.fh:
+                self.fh.write(view[:n])
+            view, self.left = view[n:], self.left - n
+            if not self.left:
+                self._next()
+        return len(data)
+
+    def close(self) -> None:
+        if self.fh:
+            self.fh.close()
+            self.fh = None
+
+def _read_shard(bucket, shard: Dict[str, Any], out_dir: str, safe_rel) -> int:
+    """Range-read one shard in runs of whole members (~SHARD_READ_BYTES each), streaming them to files."""
+    blob = bucket.blob(shard["name"])
+    members = shard["members"]
+    written = 0
+    i = 0
+    while i < len(members):
+        j, start = i, members[i]["offset"]
+        while j < len(members) and (j == i or members[j]["offset"] + members[j]["size"] - start <= SHARD_READ_BYTES):
+            j += 1
+        end = members[j - 1]["offset"] + members[j - 1]["size"]
+        sink = _MemberSink(members[i:j], out_dir, safe_rel)
+        try:
+            if end > start:
+                blob.download_to_file(sink, start=start, end=end - 1, if_generation_match=shard["generation"])
+            if sink.left:
+                raise ValueError(f"short range read from {shard['name']}")
+        finally:
+            sink.close()
+        written += sink.written
+        i = j
+    return written
+
+def read_shards(bucket, index: Dict[str, Any], out_dir: str, safe_rel) -> int:
+    """Materialize every member of `index` under out_dir; returns files written."""
+    with ThreadPoolExecutor(max_workers=PACK_CONCURRENCY) as pool:
+        return sum(pool.map(lambda s: _read_shard(bucket, s, out_dir, safe_rel), index["shards"]))
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from job import shards
+
+PREFIX = "uploads/ds/u1/"
+
+class _Blob:
+    """Just enough of google.cloud.storage.Blob for compose and streamed range reads."""
+    def __init__(self, bucket, name, data=None, generation=1):
+        self.bucket, self.name, self.content_type = bucket, name, None
+        if data is not None:
+            bucket.objects[name] = (data, generation)
+
+    @property
+    def size(self): return len(self.bucket.objects[self.name][0])
+    @property
+    def generation(self): return self.bucket.objects[self.name][1]
+
+    def compose(self, sources, if_source_generation_match=None):
+        assert [s.generation for s in sources] == if_source_generation_match
+        self.bucket.composes += 1
+        self.bucket.objects[self.name] = (b"".join(self.bucket.objects[s.name][0] for s in sources), 100)
+
+    def download_to_file(self, fh, start, end, if_generation_match=None):
+        data, gen = self.bucket.objects[self.name]
+        assert gen == if_generation_match
+        self.bucket.reads.append((self.name, start, end))
+        chunk = data[start:end + 1]
+        for i in range(0, len(chunk), 3):  # small chunks, so members straddle writes
+            fh.write(chunk[i:i + 3])
+
+    def download_as_bytes(self):
+        if self.name not in self.bucket.objects:
+            raise shards.NotFound(self.name)
+        return self.bucket.objects[self.name][0]
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.objects[self.name] = (data.encode(), 1)
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+class _Bucket:
+    def __init__(self):
+        self.objects, self.reads, self.composes = {}, [], 0
+    def blob(self, name):
+        return _Blob(self, name)
+
+def _upload(bucket, files):
+    return [_Blob(bucket, PREFIX + path, data) for path, data in files.items()]
+
+def _safe_rel(base, path):
+    return None if ".." in path else path
+
+def test_plan_splits_at_member_and_byte_limits(monkeypatch):
+    monkeypatch.setattr(shards, "SHARD_MAX_MEMBERS", 3)
+    monkeypatch.setattr(shards, "SHARD_MAX_BYTES", 10)
+    bucket = _Bucket()
+    blobs = _upload(bucket, {"a": b"1234", "b": b"", "c": b"123456", "d": b"1", "e": b"", "f": b"", "g": b"12345678901"})
+    plan = shards.plan_shards(blobs, PREFIX)
+    assert [[m["path"] for m in s["members"]] for s in plan] == [["a", "b", "c"], ["d", "e", "f"], ["g"]]
+    assert [s["size"] for s in plan] == [10, 1, 11]  # an oversized member still gets a shard of its own
+    assert [m["offset"] for m in plan[0]["members"]] == [0, 4, 4]
+
+def test_pack_and_read_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, "SHARD_MAX_MEMBERS", 40)
+    monkeypatch.setattr(shards, "SHARD_READ_BYTES", 16)
+    monkeypatch.setattr(shards, "COMPOSE_FANIN", 4)  # exercise the compose tree
+    bucket = _Bucket()
+    files = {f"images/{i:02d}.jpg": bytes([65 + i % 26]) * (i % 7) for i in range(40)}  # every 7th is empty
+    files["../escape.txt"] = b"nope"
+    index = shards.ensure_shards(bucket, PREFIX, _upload(bucket, files))
+    assert [len(s["members"]) for s in index["shards"]] == [40, 1] and index["objects"] == 41
+    assert not [n for n in bucket.objects if ".part-" in n]  # temporaries removed
+
+    out = str(tmp_path / "out")
+    assert shards.read_shards(bucket, index, out, _safe_rel) == 40
+    for path, data in files.items():
+        if ".." not in path:
+            with open(os.path.join(out, path), "rb") as fh:
+                assert fh.read() == data
+    assert not os.path.exists(tmp_path / "escape.txt")
+    # contiguous runs of whole members, split at SHARD_READ_BYTES
+    for s in index["shards"]:
+        spans = sorted((start, end) for name, start, end in bucket.reads if name == s["name"])
+        assert all(end - start + 1 <= 16 for start, end in spans)
+        assert spans[0][0] == 0 and spans[-1][1] == s["size"] - 1
+        assert all(a[1] + 1 == b[0] for a, b in zip(spans, spans[1:]))
+
+def test_short_read_fails(tmp_path):
+    bucket = _Bucket()
+    index = shards.ensure_shards(bucket, PREFIX, _upload(bucket, {"a": b"abc", "b": b"defg"}))
+    shard = index["shards"][0]
+    data, gen = bucket.objects[shard["name"]]
+    bucket.objects[shard["name"]] = (data[:5], gen)
+    with pytest.raises(ValueError):
+        shards.read_shards(bucket, index, str(tmp_path), _safe_rel)
+
+def test_index_reused_by_fingerprint():
+    bucket = _Bucket()
+    files = {"a": b"1", "b": b"22"}
+    first = shards.ensure_shards(bucket, PREFIX, _upload(bucket, files))
+    composes = bucket.composes
+    listing = [bucket.blob(PREFIX + p) for p in reversed(list(files))]  # listing order doesn't matter
+    assert shards.ensure_shards(bucket, PREFIX, listing) == first and bucket.composes == composes
+
+    _Blob(bucket, PREFIX + "b", b"33", generation=2)  # overwritten: new generation
+    again = shards.ensure_shards(bucket, PREFIX, listing)
+    assert again["fingerprint"] != first["fingerprint"] and bucket.composes > composes